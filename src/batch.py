@@ -0,0 +1,216 @@
+"""Solve many data/settings pairs concurrently, writing one JSON line per job as it finishes.
+
+The jobs come either from a directory (each JSON file in it is a data file) or from a manifest
+file, with one job per line in the form:
+
+    {"ID": "db-1", "Data": "db-1/data.json", "Settings": "db-1/settings.json", "Time Limit": 10}
+
+where "ID", "Settings", "Time Limit" (for each goal) and "Time Budget" (for the whole job) are
+optional, and relative paths are relative to the
+manifest. Each finished job is written as a line in the form:
+
+    {"ID": "db-1", "Status": "OK", "Results": {...}, "Time": {"Read": ..., "Solve": ..., ...}}
+
+and a throughput summary is written to the standard error at the end.
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json
+import os
+import sys
+import time
+
+import cache
+import cli
+import modelize
+import utils
+
+
+def read_jobs(path, settings=None, time_limit=None, time_budget=None):
+    """Return the jobs of a manifest file or of a directory of data files.
+
+    Args:
+      path: Path of the manifest file or of the directory.
+      settings: Path of the settings file of the jobs that do not provide one.
+      time_limit: Time limit in seconds of the jobs that do not provide one.
+      time_budget: Time budget in seconds of the jobs that do not provide one.
+
+    Returns:
+      A list of jobs, each one a dictionary with an ID, a Data path, a Settings path (or None), a
+      Time Limit, and a Time Budget (or None).
+    """
+    jobs = []
+
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            if name.endswith(".json"):
+                jobs.append({"ID": name, "Data": os.path.join(path, name)})
+    else:
+        directory = os.path.dirname(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                job = json.loads(line)
+                assert "Data" in job, f"Missing data in job: {line.strip()}"
+                for key in ("Data", "Settings"):
+                    if job.get(key) is not None:
+                        job[key] = os.path.join(directory, job[key])
+                jobs.append(job)
+
+    for position, job in enumerate(jobs):
+        job.setdefault("ID", position)
+        job.setdefault("Settings", settings)
+        job.setdefault("Time Limit", time_limit)
+        job.setdefault("Time Budget", time_budget)
+
+    return jobs
+
+
+def split_cores(num_cores, num_jobs, concurrency=None):
+    """Divide the cores between the jobs solved at the same time and the workers of each solver.
+
+    Args:
+      num_cores: Number of cores available.
+      num_jobs: Number of jobs to solve.
+      concurrency: Number of jobs solved at the same time (chosen from the number of cores if
+        None).
+
+    Returns:
+      A tuple (number of jobs solved at the same time, number of solver workers per job).
+    """
+    if concurrency is None:
+        # Solvers with a few workers each make the most of the cores, CP-SAT gaining less and
+        # less from each additional worker
+        concurrency = max(1, num_cores // 4)
+    concurrency = max(1, min(concurrency, num_jobs))
+
+    return concurrency, max(1, num_cores // concurrency)
+
+
+def _initialize_worker():
+    """Prepare a worker process (the standard output is reserved for the results)."""
+    sys.stdout = sys.stderr
+
+
+def run_job(job, num_workers, problem_cache=None):
+    """Solve a job and return its result line (dictionary)."""
+    start = time.perf_counter()
+    timings = {}
+
+    result = {"ID": job["ID"]}
+    try:
+        settings_json = None
+        if job["Settings"] is not None:
+            with open(job["Settings"], "r", encoding="utf-8") as f:
+                settings_json = f.read()
+
+        with open(job["Data"], "r", encoding="utf-8") as data_json:
+            results = utils.run(data_json,
+                                job["Time Limit"],
+                                settings_json,
+                                jobs=1,
+                                cache=problem_cache,
+                                solver_parameters={"Workers": num_workers},
+                                timings=timings,
+                                time_budget=job["Time Budget"])
+
+        result["Status"] = "OK"
+        result["Results"] = json.loads(results)
+    except Exception as e:
+        result["Status"] = "Error"
+        result["Error"] = f"{type(e).__name__}: {e}"
+
+    timings["Total"] = time.perf_counter() - start
+    result["Time"] = {phase: round(seconds, 3) for phase, seconds in timings.items()}
+
+    return result
+
+
+def run_batch(jobs, output, num_cores=None, concurrency=None, problem_cache=None):
+    """Solve the jobs in a pool of processes and write each result to a file as it finishes.
+
+    Args:
+      jobs: The jobs returned by read_jobs().
+      output: Text file object the result lines are written to.
+      num_cores: Number of cores to use (the number of CPUs if None).
+      concurrency: Number of jobs solved at the same time (see split_cores()).
+      problem_cache: ProblemCache used to avoid reading the same data again (no caching if None).
+
+    Returns:
+      A dictionary of statistics on the batch, in the form:
+      - Jobs: Number of jobs.
+      - Errors: Number of jobs that failed.
+      - Concurrency: Number of jobs solved at the same time.
+      - Workers: Number of solver workers per job.
+      - Time: Wall time in seconds.
+      - Jobs per Minute: Throughput.
+      - Phases: Time in seconds spent in each phase, summed over the jobs.
+    """
+    start = time.perf_counter()
+
+    if num_cores is None:
+        num_cores = modelize.get_num_cpus()
+    concurrency, num_workers = split_cores(num_cores, max(1, len(jobs)), concurrency)
+
+    summary = {"Jobs": len(jobs),
+               "Errors": 0,
+               "Concurrency": concurrency,
+               "Workers": num_workers,
+               "Time": 0,
+               "Jobs per Minute": 0,
+               "Phases": {phase: 0 for phase in ("Read", "Solve", "Output", "Total")}}
+
+    with ProcessPoolExecutor(max_workers=concurrency, initializer=_initialize_worker) as executor:
+        futures = [executor.submit(run_job, job, num_workers, problem_cache) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+
+            if result["Status"] != "OK":
+                summary["Errors"] += 1
+            for phase, seconds in result["Time"].items():
+                summary["Phases"][phase] += seconds
+
+    summary["Time"] = time.perf_counter() - start
+    if summary["Time"] > 0:
+        summary["Jobs per Minute"] = 60 * len(jobs) / summary["Time"]
+
+    return summary
+
+
+def format_summary(summary):
+    """Return the statistics of a batch as text."""
+    lines = [f"Jobs: {summary['Jobs']} ({summary['Errors']} failed)",
+             f"Concurrency: {summary['Concurrency']} jobs, {summary['Workers']} solver workers each",
+             f"Time: {summary['Time']:.3f}s ({summary['Jobs per Minute']:.1f} jobs/min)"]
+    for phase, seconds in summary["Phases"].items():
+        lines.append(f"{phase}: {seconds:.3f}s in total, "
+                     f"{seconds / max(1, summary['Jobs']):.3f}s per job")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    cli_args = cli.get_batch_args()
+
+    problem_cache = None
+    if cli_args["Cache Directory"] is not None:
+        problem_cache = cache.ProblemCache(cli_args["Cache Directory"],
+                                           round(cli_args["Cache Size"] * 1024 * 1024))
+
+    jobs = read_jobs(cli_args["Manifest"],
+                     cli_args["Settings JSON"],
+                     cli_args["Time Limit"],
+                     cli_args["Time Budget"])
+
+    if cli_args["Output"] is None:
+        summary = run_batch(jobs, sys.stdout, cli_args["Cores"], cli_args["Concurrency"],
+                            problem_cache)
+    else:
+        with open(cli_args["Output"], "w", encoding="utf-8") as output:
+            summary = run_batch(jobs, output, cli_args["Cores"], cli_args["Concurrency"],
+                                problem_cache)
+
+    print(format_summary(summary), file=sys.stderr)
@@ -0,0 +1,284 @@
+"""Measure how the phases of a run scale with the size of the problem.
+
+Seeded instances are generated by datagen.py over a grid of sizes (number of scans, of possible
+indexes and of existing indexes, and fraction of the scans covered by each index), then each one is
+solved by the full pipeline (utils.run()) in a new process, so that its peak memory is its own. The
+report is a JSON object meant to be compared across commits:
+
+    {"Tier": "quick", "Commit": "...", "Python": "3.11.7", "OR-Tools": "9.15.6755",
+     "Time Limit": 5, "Settings": null, "Workers": 1, "Formulation": null, "Instances": [...]}
+
+with, for each instance:
+
+    {"Instance": {"Scans": 1000, "Possible Indexes": 100, "Coverage": 0.1, "Existing Indexes": 2,
+                  "Seed": 0},
+     "Entries": 4017, "Status": "OK",
+     "Time": {"Generate": ..., "Read": ..., "Solve": ..., "Output": ..., "Total": ...,
+              "Presolve": ..., "Build": ..., "Search": ...},
+     "Peak Memory (MB)": ..., "Model Size": {"Variables": ..., "Constraints": ..., "Terms": ...},
+     "Goals": [{"Minimal Cost": ...}, ...], "Solver Status": [...],
+     "Solver Statistics": [{"Step": 1, "Goal": "Minimal Cost", "Gap": ..., "Branches": ..., ...}]}
+
+Read, Solve and Output are the phases of the run, the phases of the solving process (e.g.,
+Presolve, Build and Search) being those of its diagnostics (see diagnostics.py).
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import ortools
+
+import cli
+import datagen
+import diagnostics
+import utils
+
+
+# Sizes of the instances: every combination of the values is generated
+TIERS = {"quick": {"Scans": [100, 1000],
+                   "Possible Indexes": [100, 1000],
+                   "Coverage": [0.02, 0.1],
+                   "Existing Indexes": [2]},
+         "full": {"Scans": [1000, 5000, 20000],
+                  "Possible Indexes": [500, 2000, 5000],
+                  "Coverage": [0.01, 0.05],
+                  "Existing Indexes": [0, 20]}}
+
+
+def get_instances(tier, seed=0):
+    """Return the instances of a tier, in the form {"Scans": ..., ..., "Seed": ...}."""
+    grid = TIERS[tier]
+    return [dict(zip(grid, sizes), Seed=seed) for sizes in itertools.product(*grid.values())]
+
+
+def generate(instance, filename):
+    """Generate the data file of an instance and return the number of index costs (entries)."""
+    datagen.generate_instance(filename,
+                              instance["Seed"],
+                              instance["Scans"],
+                              instance["Scans"],
+                              datagen.SCAN_INDEX_COST_MIN,
+                              datagen.SCAN_INDEX_COST_MAX,
+                              datagen.SCAN_READ_COST_MIN,
+                              datagen.SCAN_READ_COST_MAX,
+                              instance["Possible Indexes"],
+                              instance["Possible Indexes"],
+                              instance["Existing Indexes"],
+                              instance["Existing Indexes"],
+                              datagen.IWO_MIN,
+                              datagen.IWO_MAX,
+                              instance["Coverage"],
+                              instance["Coverage"])
+
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return sum(len(scan["Existing Index Costs"]) + len(scan["Possible Index Costs"])
+               for scan in data["Scans"])
+
+
+def measure(filename, time_limit, settings_json=None, num_workers=None, formulation=None):
+    """Solve a data file and measure the run (meant to be called in a new process).
+
+    Returns:
+      A dictionary with the Time of each phase, the Peak Memory (MB), the Model Size (of the first
+      model built, None if the problem was decomposed), the Goals and Solver Status of the results,
+      and the Solver Statistics of each goal.
+    """
+    timings = {}
+    run_diagnostics = diagnostics.Diagnostics()
+    start = time.perf_counter()
+    with open(filename, "r", encoding="utf-8") as data_json:
+        results = json.loads(utils.run(data_json,
+                                       time_limit,
+                                       settings_json,
+                                       jobs=1,
+                                       solver_parameters=None if num_workers is None else
+                                       {"Workers": num_workers},
+                                       timings=timings,
+                                       formulation=formulation,
+                                       diagnostics=run_diagnostics))
+    timings["Total"] = time.perf_counter() - start
+
+    report = results["Diagnostics"]
+    for phase, seconds in report["Phases"].items():
+        if phase not in ("Read", "Results"):
+            timings[phase] = seconds
+
+    return {"Time": {phase: round(seconds, 3) for phase, seconds in timings.items()},
+            "Peak Memory (MB)": report["Peak Memory (MB)"],
+            "Model Size": {name: value for name, value in report["Models"][0].items() if name != "Step"}
+                          if report["Models"] else None,
+            "Goals": results["Goals"],
+            "Solver Status": results["Solver Status"],
+            "Solver Statistics": report["Goals"]}
+
+
+def _get_commit():
+    """Return the current git commit of the repository (None if unknown)."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True,
+                              text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(tier,
+                  time_limit,
+                  settings_json=None,
+                  num_workers=None,
+                  seed=0,
+                  log=None,
+                  formulation=None):
+    """Generate and solve the instances of a tier.
+
+    Args:
+      tier: The name of the tier ("quick" or "full", see TIERS).
+      time_limit: The time limit in seconds for each goal.
+      settings_json: The serialized optimizer settings JSON object (string).
+      num_workers: Number of solver workers (the number of CPUs if None).
+      seed: The seed of the generated instances.
+      log: Text file object a line is written to after each instance (nothing written if None).
+      formulation: The formulation of the model (that of the settings if None, see
+        modelize.FORMULATIONS).
+
+    Returns:
+      The report of the benchmark (see the module documentation).
+    """
+    report = {"Tier": tier,
+              "Commit": _get_commit(),
+              "Python": platform.python_version(),
+              "OR-Tools": ortools.__version__,
+              "Time Limit": time_limit,
+              "Settings": None if settings_json is None else json.loads(settings_json),
+              "Workers": num_workers,
+              "Formulation": formulation,
+              "Instances": []}
+
+    # A new process for each instance: the peak memory of a process never decreases
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        for instance in get_instances(tier, seed):
+            filename = os.path.join(directory, "data.json")
+            start = time.perf_counter()
+            entry = {"Instance": instance, "Entries": generate(instance, filename)}
+            generate_time = time.perf_counter() - start
+
+            try:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    measures = executor.submit(measure,
+                                               filename,
+                                               time_limit,
+                                               settings_json,
+                                               num_workers,
+                                               formulation).result()
+                entry["Status"] = "OK"
+                entry.update(measures)
+                entry["Time"] = {"Generate": round(generate_time, 3), **entry["Time"]}
+            except Exception as e:
+                entry["Status"] = "Error"
+                entry["Error"] = f"{type(e).__name__}: {e}"
+
+            report["Instances"].append(entry)
+            if log is not None:
+                log.write(format_entry(entry) + "\n")
+                log.flush()
+
+    return report
+
+
+def format_entry(entry):
+    """Return the measures of an instance as one line of text."""
+    instance = entry["Instance"]
+    line = (f"{instance['Scans']} scans, {instance['Possible Indexes']} indexes, "
+            f"{instance['Coverage']:g} coverage, {instance['Existing Indexes']} existing "
+            f"({entry['Entries']} entries): ")
+    if entry["Status"] != "OK":
+        return line + entry["Error"]
+
+    phases = ", ".join(f"{phase.lower()} {seconds:.3f}s" for phase, seconds in entry["Time"].items())
+    goals = ", ".join(f"{name} {value:g} ({status['Status'].lower()})"
+                      for goal, status in zip(entry["Goals"], entry["Solver Status"])
+                      for name, value in goal.items())
+    return f"{line}{phases}, {entry['Peak Memory (MB)']} MB, {goals}"
+
+
+def compare(baseline, report):
+    """Compare the instances of two reports and return the differences as text, one line per
+    instance found in both (time and memory ratios, and differences of the goals, of their status,
+    gap and search time)."""
+    def _key(entry):
+        return json.dumps(entry["Instance"], sort_keys=True)
+
+    previous = {_key(entry): entry for entry in baseline["Instances"] if entry["Status"] == "OK"}
+
+    def _describe(report):
+        return report["Commit"] if report["Formulation"] is None else \
+            f"{report['Commit']} ({report['Formulation']})"
+
+    lines = [f"{_describe(baseline)} -> {_describe(report)}"]
+    for entry in report["Instances"]:
+        old = previous.get(_key(entry))
+        if old is None or entry["Status"] != "OK":
+            continue
+
+        instance = entry["Instance"]
+        changes = [f"total x{entry['Time']['Total'] / max(old['Time']['Total'], 1e-3):.2f}",
+                   f"solve x{entry['Time']['Solve'] / max(old['Time']['Solve'], 1e-3):.2f}"]
+        if entry["Peak Memory (MB)"] is not None and old["Peak Memory (MB)"] is not None:
+            changes.append(f"memory x{entry['Peak Memory (MB)'] / old['Peak Memory (MB)']:.2f}")
+        for goal, old_goal in zip(entry["Goals"], old["Goals"]):
+            for name, value in goal.items():
+                if value != old_goal.get(name):
+                    changes.append(f"{name} {old_goal.get(name):g} -> {value:g}")
+        for goal, old_goal in zip(entry["Solver Statistics"], old["Solver Statistics"]):
+            if goal["Status"] != old_goal["Status"]:
+                changes.append(f"{goal['Goal']} {old_goal['Status'].lower()} -> "
+                               f"{goal['Status'].lower()}")
+            if round(goal["Gap"], 4) != round(old_goal["Gap"], 4):
+                changes.append(f"{goal['Goal']} gap {old_goal['Gap']:.4f} -> {goal['Gap']:.4f}")
+            if goal["Time"] is not None and old_goal["Time"] is not None:
+                changes.append(f"{goal['Goal']} search x{goal['Time'] / max(old_goal['Time'], 1e-3):.2f}")
+
+        lines.append(f"{instance['Scans']}/{instance['Possible Indexes']}/{instance['Coverage']:g}/"
+                     f"{instance['Existing Indexes']}: {', '.join(changes)}")
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    cli_args = cli.get_benchmark_args()
+
+    settings_json = None
+    if cli_args["Settings JSON"] is not None:
+        with open(cli_args["Settings JSON"], "r", encoding="utf-8") as f:
+            settings_json = f.read()
+
+    report = run_benchmark(cli_args["Tier"],
+                           cli_args["Time Limit"],
+                           settings_json,
+                           cli_args["Workers"],
+                           cli_args["Seed"],
+                           sys.stderr,
+                           cli_args["Formulation"])
+
+    if cli_args["Output"] is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(cli_args["Output"], "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if cli_args["Compare"] is not None:
+        with open(cli_args["Compare"], "r", encoding="utf-8") as f:
+            print(compare(json.load(f), report), file=sys.stderr)
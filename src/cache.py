@@ -0,0 +1,271 @@
+"""On-disk cache of the problems read by the Reader, and memo of the goals optimized on them."""
+
+
+from array import array
+import hashlib
+import json
+import os
+import struct
+import tempfile
+
+import costs
+
+
+# Version of the cache file format, to be increased whenever the format or the content changes
+FORMAT_VERSION = 2
+
+_MAGIC = b"IDXSEL"
+_HEADER_LENGTH = struct.Struct("<Q")
+
+
+class ProblemCache:
+    """Cache of the problems read by the Reader, keyed by a hash of their data.
+
+    Each problem is stored in its own file, as a JSON header followed by the raw bytes of its
+    arrays. The least recently used files are evicted once the cache grows beyond its size.
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+        """Initialize the cache.
+
+        Args:
+          directory: Directory holding the cache files (created if needed).
+          max_bytes: Maximum combined size of the cache files.
+        """
+        assert max_bytes >= 0
+
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+        os.makedirs(self._directory, exist_ok=True)
+
+    def get_key(self, problem, multiplier):
+        """Return the key of a problem, or None if it cannot be hashed without consuming it.
+
+        Args:
+          problem: The serialized problem (string), or a seekable binary or text file object.
+          multiplier: The multiplier used by the Reader, which changes the stored values.
+        """
+        digest = hashlib.sha256()
+
+        if isinstance(problem, str):
+            digest.update(problem.encode("utf-8"))
+        else:
+            if not problem.seekable():
+                return None
+            position = problem.tell()
+            for chunk in iter(lambda: problem.read(1 << 20), problem.read(0)):
+                digest.update(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            problem.seek(position)
+
+        return f"{digest.hexdigest()}-v{FORMAT_VERSION}-m{multiplier}"
+
+    def _path(self, key):
+        """Return the path of the cache file of a key."""
+        return os.path.join(self._directory, f"{key}.bin")
+
+    def load(self, key):
+        """Return the cached (problem, scan IDs, index OIDs, groups) of a key, or None if it is not
+        cached (see store())."""
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+
+        try:
+            assert content.startswith(_MAGIC)
+            start = len(_MAGIC) + _HEADER_LENGTH.size
+            (header_length,) = _HEADER_LENGTH.unpack_from(content, len(_MAGIC))
+            header = json.loads(content[start:start + header_length])
+            assert header["Key"] == key
+
+            arrays = {}
+            position = start + header_length
+            for name, typecode, length in header["Arrays"]:
+                values = array(typecode)
+                values.frombytes(content[position:position + length * values.itemsize])
+                assert len(values) == length
+                arrays[name] = values
+                position += length * values.itemsize
+        except (AssertionError, ValueError, KeyError, struct.error):
+            # Corrupted or written by another version: drop it
+            self._remove(path)
+            return None
+
+        # Mark the file as recently used
+        os.utime(path)
+
+        groups = None
+        if header["Group Names"] is not None:
+            groups = (header["Group Names"], arrays.pop("Scan Groups"), arrays.pop("Index Groups"))
+
+        problem = {}
+        problem["Number of Existing Indexes"] = header["Number of Existing Indexes"]
+        problem["Number of Possible Indexes"] = header["Number of Possible Indexes"]
+        problem["Sequential Scan Costs"] = arrays.pop("Sequential Scan Costs").tolist()
+        problem["Index IWOs"] = arrays.pop("Index IWOs").tolist()
+        problem["Index Costs"] = costs.CostMatrix.from_arrays(len(problem["Index IWOs"]),
+                                                              len(problem["Sequential Scan Costs"]),
+                                                              arrays)
+
+        return problem, header["Scan IDs"], header["Index OIDs"], groups
+
+    def store(self, key, problem, scan_ids, index_oids, groups=None):
+        """Store a problem (as read by the Reader) and its translation under a key.
+
+        The groups, if any, are a tuple (group names, group of each scan, group of each index), the
+        groups being positions in the names.
+        """
+        arrays = {"Sequential Scan Costs": array("q", problem["Sequential Scan Costs"]),
+                  "Index IWOs": array("q", problem["Index IWOs"])}
+        if groups is not None:
+            arrays["Scan Groups"] = array("I", groups[1])
+            arrays["Index Groups"] = array("I", groups[2])
+        arrays.update(problem["Index Costs"].get_arrays())
+
+        header = json.dumps({"Key": key,
+                             "Number of Existing Indexes": problem["Number of Existing Indexes"],
+                             "Number of Possible Indexes": problem["Number of Possible Indexes"],
+                             "Scan IDs": list(scan_ids),
+                             "Index OIDs": list(index_oids),
+                             "Group Names": None if groups is None else list(groups[0]),
+                             "Arrays": [(name, values.typecode, len(values))
+                                        for name, values in arrays.items()]}).encode("utf-8")
+
+        # Write to a temporary file first, so that readers never see a partial file
+        descriptor, temporary_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(_MAGIC)
+                f.write(_HEADER_LENGTH.pack(len(header)))
+                f.write(header)
+                for values in arrays.values():
+                    values.tofile(f)
+            os.replace(temporary_path, self._path(key))
+        except OSError:
+            self._remove(temporary_path)
+            return
+
+        self._evict()
+
+    def _remove(self, path):
+        """Remove a file, ignoring errors (e.g., if another process removed it first)."""
+        _remove(path)
+
+    def _evict(self):
+        """Remove the least recently used files until the cache fits in its size."""
+        _evict(self._directory, ".bin", self._max_bytes)
+
+
+class GoalMemo:
+    """Memo of the goals optimized by previous runs, so that a run can start after the first goals
+    it shares with them.
+
+    A goal is keyed by the problem, the context of the run (e.g., the rules) and the goals up to it
+    in order (e.g., with their strictness and solver parameters). Each goal is stored in its own
+    file, as a JSON object with its value and the selected indexes. The least recently used files
+    are evicted once the memo grows beyond its size.
+    """
+
+    def __init__(self, directory, max_bytes=64 << 20):
+        """Initialize the memo.
+
+        Args:
+          directory: Directory holding the memo files (created if needed).
+          max_bytes: Maximum combined size of the memo files.
+        """
+        assert max_bytes >= 0
+
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+        os.makedirs(self._directory, exist_ok=True)
+
+    def get_keys(self, problem_key, context, goals):
+        """Return the key of each goal, given the goals before it.
+
+        Args:
+          problem_key: The key of the problem (see ProblemCache.get_key()).
+          context: What else the optimization of the goals depends on, serializable to JSON.
+          goals: The goals in order (e.g., their name, strictness and solver parameters), each
+            serializable to JSON.
+        """
+        digest = hashlib.sha256(json.dumps([problem_key, context], sort_keys=True).encode("utf-8"))
+
+        keys = []
+        for gl in goals:
+            # Each JSON value ends where the next one starts, so the prefixes cannot collide
+            digest.update(json.dumps(gl, sort_keys=True).encode("utf-8"))
+            keys.append(f"{digest.copy().hexdigest()}-v{FORMAT_VERSION}")
+        return keys
+
+    def _path(self, key):
+        """Return the path of the memo file of a key."""
+        return os.path.join(self._directory, f"{key}.json")
+
+    def load(self, key):
+        """Return the goal stored under a key, or None if it is not memoized (see store())."""
+        path = self._path(key)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+            assert content.pop("Key") == key
+        except (OSError, AssertionError, ValueError, KeyError):
+            _remove(path)
+            return None
+
+        # Mark the file as recently used
+        os.utime(path)
+
+        return content
+
+    def store(self, key, step):
+        """Store an optimized goal under a key.
+
+        Args:
+          key: The key of the goal (see get_keys()).
+          step: Dictionary serializable to JSON (e.g., the value of the goal and the indexes
+            selected).
+        """
+        content = json.dumps({"Key": key, **step})
+
+        # Write to a temporary file first, so that readers never see a partial file
+        descriptor, temporary_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(temporary_path, self._path(key))
+        except OSError:
+            _remove(temporary_path)
+            return
+
+        _evict(self._directory, ".json", self._max_bytes)
+
+
+def _remove(path):
+    """Remove a file, ignoring errors (e.g., if another process removed it first)."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _evict(directory, suffix, max_bytes):
+    """Remove the least recently used files of a directory ending with a suffix, until they fit in
+    a size."""
+    files = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(suffix) and entry.is_file():
+            stat = entry.stat()
+            files.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_bytes = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total_bytes <= max_bytes:
+            break
+        _remove(path)
+        total_bytes -= size
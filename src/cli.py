@@ -28,6 +28,14 @@ def get_cli_args():
         type=str,
         help="JSON settings file")
 
+    parser.add_argument(
+        "--warm-start",
+        metavar="RESULTS",
+        default=None,
+        type=str,
+        help="JSON results file of a previous run, whose selected indexes the first goal starts "
+             "from (the indexes that no longer exist are ignored)")
+
     parser.add_argument(
         "-t",
         "--timelimit",
@@ -37,6 +45,151 @@ def get_cli_args():
         type=float,
         help="time limit allowed for each goal (seconds)")
 
+    parser.add_argument(
+        "-b",
+        "--budget",
+        metavar="SECONDS",
+        default=None,
+        type=float,
+        help="wall time allowed for the whole run, divided between the goals (seconds)")
+
+    parser.add_argument(
+        "-c",
+        "--cache-dir",
+        metavar="DIRECTORY",
+        default=None,
+        type=str,
+        help="directory caching the problems read from data files, to load them faster next time")
+
+    parser.add_argument(
+        "--cache-size",
+        metavar="MB",
+        default=1024.0,
+        type=float,
+        help="maximum size of the cache directory (megabytes, default: 1024)")
+
+    parser.add_argument(
+        "--memo-size",
+        metavar="MB",
+        default=64.0,
+        type=float,
+        help="maximum size of the memo of the goals optimized by previous runs, kept in the cache "
+             "directory (megabytes, default: 64)")
+
+    parser.add_argument(
+        "--no-memo",
+        default=False,
+        action="store_true",
+        help="optimize every goal, even if a previous run with the same problem, rules and first "
+             "goals optimized it already (the memo is only kept with --cache-dir)")
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        default=None,
+        type=int,
+        help="number of processes solving independent sub-problems (default: number of CPUs)")
+
+    parser.add_argument(
+        "--workers",
+        metavar="N",
+        default=None,
+        type=int,
+        help="number of parallel search workers of the solver (default: number of CPUs)")
+
+    parser.add_argument(
+        "--seed",
+        metavar="N",
+        default=None,
+        type=int,
+        help="random seed of the solver (default: 0)")
+
+    parser.add_argument(
+        "--relative-gap",
+        metavar="RATIO",
+        default=None,
+        type=float,
+        help="stop a goal once it is proven within this ratio of the optimum (default: 0)")
+
+    parser.add_argument(
+        "--absolute-gap",
+        metavar="VALUE",
+        default=None,
+        type=float,
+        help="stop a goal once it is proven within this value of the optimum (default: 0)")
+
+    parser.add_argument(
+        "--presolve-level",
+        metavar="LEVEL",
+        default=None,
+        type=int,
+        choices=(0, 1, 2, 3),
+        help="presolve effort of the solver, 0 disabling it (default: 3)")
+
+    parser.add_argument(
+        "--linearization-level",
+        metavar="LEVEL",
+        default=None,
+        type=int,
+        choices=(0, 1, 2),
+        help="linearization effort of the solver (default: 1)")
+
+    parser.add_argument(
+        "--engine",
+        default="exact",
+        type=str,
+        choices=("exact", "heuristic", "hybrid"),
+        help="optimize the goals with the solver (exact), with a greedy construction and a local "
+             "search for the largest problems (heuristic), or with the solver warm started by the "
+             "heuristic (hybrid) (default: exact)")
+
+    parser.add_argument(
+        "--formulation",
+        default=None,
+        type=str,
+        choices=("minimum", "assignment"),
+        help="formulation of the cost of the scans in the model: minimum over the indexes, or "
+             "assignment to one index, with a tighter relaxation (default: that of the settings, "
+             "or minimum)")
+
+    parser.add_argument(
+        "--polish",
+        default=False,
+        action="store_true",
+        help="improve the solutions of the solver that are not proven optimal with a local "
+             "search, given 10%% of the time limit of each goal")
+
+    parser.add_argument(
+        "-n",
+        "--no-presolve",
+        default=False,
+        action="store_true",
+        help="model the problem as is, without reducing it first")
+
+    parser.add_argument(
+        "-r",
+        "--rebuild",
+        default=False,
+        action="store_true",
+        help="build a new model for each goal instead of reusing the same model")
+
+    parser.add_argument(
+        "-e",
+        "--events",
+        metavar="FILE",
+        default=None,
+        type=str,
+        help="file each improving solution is written to as a JSON line, as soon as it is found "
+             "('-' for the standard error)")
+
+    parser.add_argument(
+        "--diagnostics",
+        default=False,
+        action="store_true",
+        help="add the time of each phase, the peak memory, the model sizes and the statistics of "
+             "the solver to the results (and to the events, if written)")
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -47,8 +200,462 @@ def get_cli_args():
     args = parser.parse_args()
 
     assert isinstance(args.timelimit, float) and args.timelimit >= 0
+    assert args.jobs is None or args.jobs >= 1
+    assert args.cache_size >= 0
+    assert args.memo_size >= 0
+    assert args.workers is None or args.workers >= 1
+    assert args.budget is None or args.budget > 0
 
-    return {"Data JSON": args.data[0],
+    # Only the solver parameters that are provided take precedence over the settings
+    solver_parameters = {}
+    for name, value in (("Workers", args.workers),
+                        ("Seed", args.seed),
+                        ("Relative Gap", args.relative_gap),
+                        ("Absolute Gap", args.absolute_gap),
+                        ("Presolve Level", args.presolve_level),
+                        ("Linearization Level", args.linearization_level)):
+        if value is not None:
+            solver_parameters[name] = value
+
+    return {"Cache Directory": args.cache_dir,
+            "Cache Size": args.cache_size,
+            "Memo": not args.no_memo,
+            "Memo Size": args.memo_size,
+            "Data JSON": args.data[0],
+            "Events": args.events,
+            "Diagnostics": args.diagnostics,
             "Settings JSON": None if args.settings is None else args.settings[0],
             "Time Limit": args.timelimit,
+            "Jobs": args.jobs,
+            "Presolve": not args.no_presolve,
+            "Time Budget": args.budget,
+            "Engine": args.engine,
+            "Formulation": None if args.formulation is None else args.formulation.capitalize(),
+            "Polish": args.polish,
+            "Warm Start": args.warm_start,
+            "Rebuild": args.rebuild,
+            "Solver Parameters": solver_parameters,
             "Verbose": args.verbose}
+
+
+def get_server_args():
+    """Return a dictionary of the CLI arguments of the solver service (server.py)."""
+    parser = argparse.ArgumentParser(
+        prog="server.py",
+        description="Solver service answering the requests read as JSON lines on the standard input")
+
+    parser.add_argument(
+        "-t",
+        "--timelimit",
+        metavar="SECONDS",
+        default=999999.0,
+        type=float,
+        help="time limit allowed for each goal, unless a request provides one (seconds)")
+
+    parser.add_argument(
+        "-p",
+        "--concurrency",
+        metavar="N",
+        default=None,
+        type=int,
+        help="maximum number of requests solved at the same time (default: number of CPUs)")
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        default=1,
+        type=int,
+        help="number of processes solving independent sub-problems of each request (default: 1)")
+
+    parser.add_argument(
+        "-c",
+        "--cache-dir",
+        metavar="DIRECTORY",
+        default=None,
+        type=str,
+        help="directory caching the problems of the requests, to load them faster next time")
+
+    parser.add_argument(
+        "--cache-size",
+        metavar="MB",
+        default=1024.0,
+        type=float,
+        help="maximum size of the cache directory (megabytes, default: 1024)")
+
+    args = parser.parse_args()
+
+    assert args.timelimit >= 0
+    assert args.concurrency is None or args.concurrency >= 1
+    assert args.jobs >= 1
+    assert args.cache_size >= 0
+
+    return {"Cache Directory": args.cache_dir,
+            "Cache Size": args.cache_size,
+            "Time Limit": args.timelimit,
+            "Concurrency": args.concurrency,
+            "Jobs": args.jobs}
+
+
+def get_batch_args():
+    """Return a dictionary of the CLI arguments of the batch mode (batch.py)."""
+    parser = argparse.ArgumentParser(
+        prog="batch.py",
+        description="Solve many data/settings pairs concurrently, one JSON result line per job")
+
+    parser.add_argument(
+        "manifest",
+        metavar="PATH",
+        type=str,
+        help="manifest file (one JSON job per line) or directory of JSON data files")
+
+    parser.add_argument(
+        "-s",
+        "--settings",
+        metavar="FILE",
+        default=None,
+        type=str,
+        help="JSON settings file of the jobs that do not provide one")
+
+    parser.add_argument(
+        "-t",
+        "--timelimit",
+        metavar="SECONDS",
+        default=999999.0,
+        type=float,
+        help="time limit allowed for each goal, unless a job provides one (seconds)")
+
+    parser.add_argument(
+        "-b",
+        "--budget",
+        metavar="SECONDS",
+        default=None,
+        type=float,
+        help="wall time allowed for each job, unless a job provides one (seconds)")
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        default=None,
+        type=str,
+        help="file the result lines are written to (default: standard output)")
+
+    parser.add_argument(
+        "-w",
+        "--cores",
+        metavar="N",
+        default=None,
+        type=int,
+        help="number of cores shared by the jobs (default: number of CPUs)")
+
+    parser.add_argument(
+        "-p",
+        "--concurrency",
+        metavar="N",
+        default=None,
+        type=int,
+        help="number of jobs solved at the same time (default: a quarter of the cores)")
+
+    parser.add_argument(
+        "-c",
+        "--cache-dir",
+        metavar="DIRECTORY",
+        default=None,
+        type=str,
+        help="directory caching the problems read from data files, to load them faster next time")
+
+    parser.add_argument(
+        "--cache-size",
+        metavar="MB",
+        default=1024.0,
+        type=float,
+        help="maximum size of the cache directory (megabytes, default: 1024)")
+
+    args = parser.parse_args()
+
+    assert args.timelimit >= 0
+    assert args.budget is None or args.budget > 0
+    assert args.cores is None or args.cores >= 1
+    assert args.concurrency is None or args.concurrency >= 1
+    assert args.cache_size >= 0
+
+    return {"Cache Directory": args.cache_dir,
+            "Cache Size": args.cache_size,
+            "Concurrency": args.concurrency,
+            "Cores": args.cores,
+            "Manifest": args.manifest,
+            "Output": args.output,
+            "Settings JSON": args.settings,
+            "Time Budget": args.budget,
+            "Time Limit": args.timelimit}
+
+
+def get_sweep_args():
+    """Return a dictionary of the CLI arguments of the sweep mode (sweep.py)."""
+    parser = argparse.ArgumentParser(
+        prog="sweep.py",
+        description="Compute the trade-off curve between the goals, for several strictnesses of "
+                    "the first goal or several values of a rule")
+
+    parser.add_argument(
+        "-d",
+        "--data",
+        required=True,
+        metavar="FILE",
+        type=str,
+        help="JSON data file")
+
+    parser.add_argument(
+        "-s",
+        "--settings",
+        metavar="FILE",
+        default=None,
+        type=str,
+        help="JSON settings file")
+
+    parser.add_argument(
+        "-t",
+        "--timelimit",
+        metavar="SECONDS",
+        default=999999.0,
+        type=float,
+        help="time limit allowed for each goal of each point (seconds)")
+
+    group = parser.add_mutually_exclusive_group(required=True)
+
+    group.add_argument(
+        "--strictness",
+        metavar="VALUES",
+        default=None,
+        type=str,
+        help="comma-separated strictnesses of the first goal (e.g., 1,0.95,0.9,0.8)")
+
+    group.add_argument(
+        "--max-indexes",
+        metavar="VALUES",
+        default=None,
+        type=str,
+        help="comma-separated values of the Maximum Number of Possible Indexes rule (e.g., 1,2,4,8)")
+
+    group.add_argument(
+        "--max-iwo",
+        metavar="VALUES",
+        default=None,
+        type=str,
+        help="comma-separated values of the Maximum IWO rule")
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        default=1,
+        type=int,
+        help="number of processes solving the points, each one a run of neighbor points "
+             "(default: 1)")
+
+    parser.add_argument(
+        "-n",
+        "--no-presolve",
+        default=False,
+        action="store_true",
+        help="model the problem as is, without reducing it first")
+
+    parser.add_argument(
+        "--json",
+        default=False,
+        action="store_true",
+        help="output the points as JSON instead of a table")
+
+    args = parser.parse_args()
+
+    assert args.timelimit >= 0
+    assert args.jobs >= 1
+
+    for sweep, values, value_type in (("Strictness", args.strictness, float),
+                                      ("Maximum Number of Possible Indexes", args.max_indexes, int),
+                                      ("Maximum IWO", args.max_iwo, float)):
+        if values is not None:
+            break
+
+    return {"Data JSON": args.data,
+            "Settings JSON": args.settings,
+            "Time Limit": args.timelimit,
+            "Sweep": sweep,
+            "Values": [value_type(value) for value in values.split(",")],
+            "Jobs": args.jobs,
+            "Presolve": not args.no_presolve,
+            "JSON": args.json}
+
+
+def get_benchmark_args():
+    """Return a dictionary of the CLI arguments of the benchmark (benchmark.py)."""
+    parser = argparse.ArgumentParser(
+        prog="benchmark.py",
+        description="Measure how the phases of a run scale on generated instances of growing sizes")
+
+    parser.add_argument(
+        "--tier",
+        choices=["quick", "full"],
+        default="quick",
+        help="grid of instance sizes: quick (a couple of minutes) or full (default: quick)")
+
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="FILE",
+        default=None,
+        type=str,
+        help="JSON file the report is written to (default: standard output)")
+
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        default=None,
+        type=str,
+        help="JSON report of a previous benchmark (e.g., of another commit) to compare with")
+
+    parser.add_argument(
+        "-s",
+        "--settings",
+        metavar="FILE",
+        default=None,
+        type=str,
+        help="JSON settings file")
+
+    parser.add_argument(
+        "-t",
+        "--timelimit",
+        metavar="SECONDS",
+        default=5.0,
+        type=float,
+        help="time limit allowed for each goal (seconds, default: 5)")
+
+    parser.add_argument(
+        "-w",
+        "--workers",
+        metavar="N",
+        default=None,
+        type=int,
+        help="number of solver workers (default: number of CPUs)")
+
+    parser.add_argument(
+        "--seed",
+        metavar="N",
+        default=0,
+        type=int,
+        help="seed of the generated instances (default: 0)")
+
+    parser.add_argument(
+        "--formulation",
+        default=None,
+        type=str,
+        choices=("minimum", "assignment"),
+        help="formulation of the model (default: that of the settings, or minimum)")
+
+    args = parser.parse_args()
+
+    assert args.timelimit >= 0
+    assert args.workers is None or args.workers >= 1
+
+    return {"Tier": args.tier,
+            "Output": args.output,
+            "Compare": args.compare,
+            "Settings JSON": args.settings,
+            "Time Limit": args.timelimit,
+            "Workers": args.workers,
+            "Seed": args.seed,
+            "Formulation": None if args.formulation is None else args.formulation.capitalize()}
+
+
+def get_datagen_args():
+    """Return a dictionary of the CLI arguments of the instance generator (datagen.py).
+
+    The options that are not provided are None (the constants of datagen.py apply), and the ranges
+    are tuples (minimum, maximum).
+    """
+    parser = argparse.ArgumentParser(
+        prog="datagen.py",
+        description="Generate a JSON data file (ranges take a value or a minimum and a maximum, "
+                    "the constants of the script being used for the missing options)")
+
+    parser.add_argument(
+        "output",
+        metavar="FILE",
+        type=str,
+        help="JSON data file to create ('-' for the standard output)")
+
+    parser.add_argument(
+        "--seed",
+        metavar="N",
+        default=None,
+        type=int,
+        help="random seed (the same seed and options give the same instance)")
+
+    for option, metavar, value_type, help_text in (
+            ("--scans", "N", int, "number of scans"),
+            ("--possible-indexes", "N", int, "number of possible indexes"),
+            ("--existing-indexes", "N", int, "number of existing indexes"),
+            ("--read-cost", "COST", float, "sequential cost of a scan"),
+            ("--index-cost", "COST", float, "cost offered by an index to a scan"),
+            ("--iwo", "IWO", float, "index write overhead of an index"),
+            ("--coverage", "FRACTION", float, "fraction of the scans of its table covered by an index")):
+        parser.add_argument(
+            option,
+            metavar=metavar,
+            nargs="+",
+            default=None,
+            type=value_type,
+            help=help_text)
+
+    parser.add_argument(
+        "--tables",
+        metavar="N",
+        default=None,
+        type=int,
+        help="number of tables the scans and indexes are divided between (an index only covering "
+             "scans of its table)")
+
+    parser.add_argument(
+        "--zipf",
+        metavar="EXPONENT",
+        default=None,
+        type=float,
+        help="skew of the coverage of the scans of a table (0 for a uniform coverage, 1 for a "
+             "Zipf distribution)")
+
+    parser.add_argument(
+        "--iwo-correlation",
+        metavar="WEIGHT",
+        default=None,
+        type=float,
+        help="weight between 0 and 1 of the write rate of its table in the IWO of an index")
+
+    parser.add_argument(
+        "--groups",
+        default=False,
+        action="store_true",
+        help="name the table of each scan and index as its group, so that the optimizer solves "
+             "the tables separately")
+
+    args = parser.parse_args()
+
+    def _range(values):
+        if values is None:
+            return None
+        assert len(values) in (1, 2), "A range takes a value, or a minimum and a maximum"
+        return (values[0], values[-1])
+
+    return {"Output": args.output,
+            "Seed": args.seed,
+            "Scans": _range(args.scans),
+            "Possible Indexes": _range(args.possible_indexes),
+            "Existing Indexes": _range(args.existing_indexes),
+            "Read Cost": _range(args.read_cost),
+            "Index Cost": _range(args.index_cost),
+            "IWO": _range(args.iwo),
+            "Coverage": _range(args.coverage),
+            "Tables": args.tables,
+            "Zipf Exponent": args.zipf,
+            "IWO Correlation": args.iwo_correlation,
+            "Groups": args.groups}
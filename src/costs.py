@@ -0,0 +1,265 @@
+"""Sparse storage of the costs offered by the indexes to the scans."""
+
+
+from array import array
+from bisect import bisect_left
+
+
+def _compress(major, minor, values, num_major):
+    """Group the (major, minor, value) entries by major position (stable).
+
+    Returns:
+      A tuple (pointers, minor positions, values) where the entries of major position m are found
+      between pointers[m] and pointers[m + 1].
+    """
+    pointers = array("q", [0] * (num_major + 1))
+    for m in major:
+        pointers[m + 1] += 1
+    for m in range(num_major):
+        pointers[m + 1] += pointers[m]
+
+    grouped_minor = array(minor.typecode, bytes(minor.itemsize * len(minor)))
+    grouped_values = array(values.typecode, bytes(values.itemsize * len(values)))
+    next_free = array("q", pointers[:-1])
+    for k, m in enumerate(major):
+        position = next_free[m]
+        grouped_minor[position] = minor[k]
+        grouped_values[position] = values[k]
+        next_free[m] += 1
+
+    return pointers, grouped_minor, grouped_values
+
+
+def _expand(pointers):
+    """Return the major position of every entry of a compressed layout."""
+    major = array("I")
+    for m in range(len(pointers) - 1):
+        major.extend([m] * (pointers[m + 1] - pointers[m]))
+    return major
+
+
+class CostMatrix:
+    """Costs offered by the indexes to the scans.
+
+    Only the entries where an index covers a scan are stored, both per index (CSR layout, scans in
+    increasing order) and per scan (CSC layout, indexes in increasing order), so the memory used
+    grows with the number of entries rather than with the number of indexes times scans.
+    """
+
+    def __init__(self, num_indexes, num_scans, indexes, scans, costs):
+        """Initialize the matrix from its entries.
+
+        Args:
+          num_indexes: Number of indexes (rows).
+          num_scans: Number of scans (columns).
+          indexes: Index position of each entry (array of unsigned integers).
+          scans: Scan position of each entry (array of unsigned integers).
+          costs: Cost of each entry (array of integers). An (index, scan) pair appears at most once.
+        """
+        assert len(indexes) == len(scans) == len(costs)
+
+        self._num_indexes = num_indexes
+        self._num_scans = num_scans
+
+        # Grouping the entries by index, then by scan, then by index again sorts both layouts
+        pointers, by_index_scans, by_index_costs = _compress(indexes, scans, costs, num_indexes)
+        self._scan_pointers, self._scan_indexes, self._scan_costs = \
+            _compress(by_index_scans, _expand(pointers), by_index_costs, num_scans)
+        self._index_pointers, self._index_scans, self._index_costs = \
+            _compress(self._scan_indexes, _expand(self._scan_pointers), self._scan_costs,
+                      num_indexes)
+
+    @classmethod
+    def from_arrays(cls, num_indexes, num_scans, arrays):
+        """Return a matrix holding the arrays of another one (see get_arrays())."""
+        matrix = cls.__new__(cls)
+        matrix._num_indexes = num_indexes
+        matrix._num_scans = num_scans
+        for name, values in arrays.items():
+            setattr(matrix, f"_{name}", values)
+        return matrix
+
+    def get_arrays(self):
+        """Return the arrays holding the matrix, by name."""
+        return {"scan_pointers": self._scan_pointers,
+                "scan_indexes": self._scan_indexes,
+                "scan_costs": self._scan_costs,
+                "index_pointers": self._index_pointers,
+                "index_scans": self._index_scans,
+                "index_costs": self._index_costs}
+
+    def get_num_indexes(self):
+        """Return the number of indexes."""
+        return self._num_indexes
+
+    def get_num_scans(self):
+        """Return the number of scans."""
+        return self._num_scans
+
+    def get_num_entries(self):
+        """Return the number of (index, scan) entries."""
+        return len(self._index_costs)
+
+    def get_index_entries(self, index):
+        """Return the scans covered by an index and their costs, as two arrays."""
+        start, end = self._index_pointers[index], self._index_pointers[index + 1]
+        return self._index_scans[start:end], self._index_costs[start:end]
+
+    def get_scan_entries(self, scan):
+        """Return the indexes covering a scan and their costs, as two arrays."""
+        start, end = self._scan_pointers[scan], self._scan_pointers[scan + 1]
+        return self._scan_indexes[start:end], self._scan_costs[start:end]
+
+    def get_cost(self, index, scan):
+        """Return the cost offered by an index to a scan, None if the scan is not covered."""
+        start, end = self._index_pointers[index], self._index_pointers[index + 1]
+        position = bisect_left(self._index_scans, scan, start, end)
+        if position < end and self._index_scans[position] == scan:
+            return self._index_costs[position]
+        return None
+
+
+def _set_entry(keys, values, key, value):
+    """Return copies of sorted entries (keys and values arrays) where `key` has `value`, or is
+    missing if `value` is None."""
+    keys, values = array(keys.typecode, keys), array(values.typecode, values)
+    position = bisect_left(keys, key)
+    found = position < len(keys) and keys[position] == key
+    if value is None:
+        if found:
+            del keys[position]
+            del values[position]
+    elif found:
+        values[position] = value
+    else:
+        keys.insert(position, key)
+        values.insert(position, value)
+    return keys, values
+
+
+class PatchedCostMatrix:
+    """CostMatrix whose entries can change after it is built, with the same read methods.
+
+    The entries of the indexes and scans that changed are stored apart from the matrix they were
+    read from, so a change costs as much as the entries of its index and scan rather than a rebuild
+    of the whole matrix.
+    """
+
+    def __init__(self, matrix):
+        """Initialize the matrix with the entries of a CostMatrix."""
+        self._matrix = matrix
+        self._num_indexes = matrix.get_num_indexes()
+        self._num_scans = matrix.get_num_scans()
+        self._num_entries = matrix.get_num_entries()
+
+        # Entries of the changed indexes and scans, as returned by get_*_entries()
+        self._changed_indexes = {}
+        self._changed_scans = {}
+
+    def get_num_indexes(self):
+        """Return the number of indexes."""
+        return self._num_indexes
+
+    def get_num_scans(self):
+        """Return the number of scans."""
+        return self._num_scans
+
+    def get_num_entries(self):
+        """Return the number of (index, scan) entries."""
+        return self._num_entries
+
+    def get_index_entries(self, index):
+        """Return the scans covered by an index and their costs, as two arrays."""
+        if index in self._changed_indexes:
+            return self._changed_indexes[index]
+        return self._matrix.get_index_entries(index)
+
+    def get_scan_entries(self, scan):
+        """Return the indexes covering a scan and their costs, as two arrays."""
+        if scan in self._changed_scans:
+            return self._changed_scans[scan]
+        return self._matrix.get_scan_entries(scan)
+
+    def get_cost(self, index, scan):
+        """Return the cost offered by an index to a scan, None if the scan is not covered."""
+        scans, scan_costs = self.get_index_entries(index)
+        position = bisect_left(scans, scan)
+        if position < len(scans) and scans[position] == scan:
+            return scan_costs[position]
+        return None
+
+    def add_index(self):
+        """Add an index covering no scan, and return its position."""
+        self._changed_indexes[self._num_indexes] = (array("I"), array("q"))
+        self._num_indexes += 1
+        return self._num_indexes - 1
+
+    def add_scan(self):
+        """Add a scan covered by no index, and return its position."""
+        self._changed_scans[self._num_scans] = (array("I"), array("q"))
+        self._num_scans += 1
+        return self._num_scans - 1
+
+    def set_cost(self, index, scan, cost):
+        """Set the cost offered by an index to a scan (None if the index does not cover it)."""
+        previous = self.get_cost(index, scan)
+        self._num_entries += (cost is not None) - (previous is not None)
+
+        self._changed_indexes[index] = _set_entry(*self.get_index_entries(index), scan, cost)
+        self._changed_scans[scan] = _set_entry(*self.get_scan_entries(scan), index, cost)
+
+
+class CostMatrixView:
+    """Read-only dense view over a CostMatrix, indexed as view[index][scan].
+
+    Two kinds of views are available:
+    - "B": A covered scan has a cost of 1, an uncovered scan has a cost of 0.
+    - "R": A covered scan has the cost provided by the index, an uncovered scan has its sequential
+      cost.
+    """
+
+    def __init__(self, matrix, kind, read_costs=None):
+        """Initialize the view.
+
+        Args:
+          matrix: The CostMatrix to look into.
+          kind: Kind of view ("B" or "R").
+          read_costs: Sequential costs of the scans (only needed for views of kind "R").
+        """
+        assert kind in ("B", "R")
+        assert kind == "B" or read_costs is not None
+
+        self._matrix = matrix
+        self._kind = kind
+        self._read_costs = read_costs
+
+    def __len__(self):
+        return self._matrix.get_num_indexes()
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return _CostMatrixViewRow(self, index)
+
+    def _value(self, index, scan):
+        """Return the value of the view for an index and a scan."""
+        cost = self._matrix.get_cost(index, scan)
+        if self._kind == "B":
+            return 0 if cost is None else 1
+        return self._read_costs[scan] if cost is None else cost
+
+
+class _CostMatrixViewRow:
+    """Row of a CostMatrixView (all the scans for one index)."""
+
+    def __init__(self, view, index):
+        self._view = view
+        self._index = index
+
+    def __len__(self):
+        return self._view._matrix.get_num_scans()
+
+    def __getitem__(self, scan):
+        if not 0 <= scan < len(self):
+            raise IndexError(scan)
+        return self._view._value(self._index, scan)
@@ -1,10 +1,27 @@
-"""Generate custom instances."""
+"""Generate custom instances.
+
+The instances are generated in vectorized batches (one per table) and written as a stream, so that
+instances with hundreds of thousands of scans take seconds rather than minutes. Besides the uniform
+instances, some realistic shapes can be generated:
+- Tables: the scans and the indexes are divided between tables, an index only covering scans of
+  its own table.
+- Skewed coverage: the scans of a table are covered with a Zipf-distributed popularity, a few of
+  them being covered by most indexes.
+- Correlated IWO: each table gets a write rate, the IWO of its indexes being drawn around it.
+The table of each scan and index can also be written as its "Group", for the optimizer to solve the
+tables separately.
+
+The default values are those of the constants below, the command-line options override them (see
+python3 datagen.py -h).
+"""
 
 
-import json
-import random
 import sys
 
+import numpy as np
+
+import cli
+
 
 SEED = None                   # Leave to None to get a random seed every time
 
@@ -20,8 +37,64 @@ NUM_EXISTING_INDEXES_MIN = 1  # Minimum number of existing indexes
 NUM_EXISTING_INDEXES_MAX = 3  # Maximum number of existing indexes
 IWO_MIN = 0.01                # Minimum IWO of an index
 IWO_MAX = 1                   # Maximum IWO of an index
-FRAC_SCANS_COV_MIN = 0.1      # Minimum fraction of the scans covered by an index
-FRAC_SCANS_COV_MAX = 0.25     # Maximum fraction of the scans covered by an index
+FRAC_SCANS_COV_MIN = 0.1      # Minimum fraction of the scans (of its table) covered by an index
+FRAC_SCANS_COV_MAX = 0.25     # Maximum fraction of the scans (of its table) covered by an index
+NUM_TABLES = 1                # Number of tables the scans and indexes are divided between
+ZIPF_EXPONENT = 0.0           # Skew of the coverage of the scans (0 for a uniform coverage)
+IWO_CORRELATION = 0.0         # Weight of the write rate of the table in the IWO of its indexes
+
+# Sampling rounds after which an index covers fewer scans than drawn (only with a strong skew)
+_MAX_SAMPLING_ROUNDS = 50
+
+
+def _split(rng, total, weights):
+    """Return a random division of `total` items into parts of expected sizes proportional to the
+    weights."""
+    return rng.multinomial(total, np.asarray(weights, dtype=float) / np.sum(weights))
+
+
+def _sample_covered(rng, counts, num_scans, cdf=None):
+    """Draw distinct scans for each index of a table.
+
+    Args:
+      rng: The numpy random generator.
+      counts: The number of scans to cover for each index (array).
+      num_scans: The number of scans of the table.
+      cdf: The cumulative distribution of the popularity of the scans (uniform if None).
+
+    Returns:
+      A tuple of arrays (indexes, scans), the positions within the table of the pairs covered,
+      sorted by index.
+    """
+    keys = np.empty(0, dtype=np.int64)
+    pending = counts
+    for _ in range(_MAX_SAMPLING_ROUNDS):
+        total = int(pending.sum())
+        if total == 0:
+            break
+        owners = np.repeat(np.arange(len(counts), dtype=np.int64), pending)
+        if cdf is None:
+            scans = rng.integers(0, num_scans, total)
+        else:
+            scans = np.minimum(np.searchsorted(cdf, rng.random(total), side="right"), num_scans - 1)
+        # Duplicates are drawn again in the next round (sorting is faster than np.unique())
+        keys = np.sort(np.concatenate((keys, owners * num_scans + scans)))
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        pending = counts - np.bincount(keys // num_scans, minlength=len(counts))
+
+    return keys // num_scans, keys % num_scans
+
+
+def _format_costs(oids, costs):
+    """Return the JSON array of the costs offered to a scan."""
+    return ", ".join(f'{{"Index OID": {oid}, "Cost": {cost}}}' for oid, cost in zip(oids, costs))
+
+
+def _format_indexes(oids, iwos, groups):
+    """Return the JSON array elements of indexes, one per line (see generate_instance() for the
+    groups)."""
+    return ",\n".join(f'        {{"Index": {{"Index OID": {oid}}}, "Index Write Overhead": {iwo}{group}}}'
+                      for oid, iwo, group in zip(oids, iwos, groups))
 
 
 def generate_instance(filename,
@@ -39,11 +112,20 @@ def generate_instance(filename,
                       iwo_min,
                       iwo_max,
                       frac_scans_cov_min,
-                      frac_scans_cov_max):
-    """Generate an instance and save it to a file."""
-    if seed is not None:
-        random.seed(seed)
+                      frac_scans_cov_max,
+                      num_tables=NUM_TABLES,
+                      zipf_exponent=ZIPF_EXPONENT,
+                      iwo_correlation=IWO_CORRELATION,
+                      groups=False):
+    """Generate an instance and save it to a file ("-" for the standard output).
 
+    The scans are divided between `num_tables` tables, and the indexes between the tables in
+    proportion to their scans. Each index covers a fraction of the scans of its table, each scan
+    being drawn with a probability proportional to 1 / rank^zipf_exponent (its rank in a random
+    order of the scans of the table). The IWO of an index is drawn from its range, with a weight of
+    `iwo_correlation` (between 0 and 1) given to the write rate of its table (itself drawn at
+    random). With `groups`, the table of each scan and index is written as its "Group".
+    """
     assert isinstance(num_scans_min, int)
     assert isinstance(num_scans_max, int)
     assert isinstance(scan_index_cost_min, (float, int))
@@ -56,6 +138,7 @@ def generate_instance(filename,
     assert isinstance(num_existing_indexes_max, int)
     assert isinstance(iwo_min, (float, int))
     assert isinstance(iwo_max, (float, int))
+    assert isinstance(num_tables, int)
 
     assert 0 < num_scans_min <= num_scans_max
     assert 0 < scan_index_cost_min <= scan_index_cost_max
@@ -65,74 +148,119 @@ def generate_instance(filename,
     assert 0 <= num_existing_indexes_min <= num_existing_indexes_max
     assert 0 < iwo_min <= iwo_max
     assert 0 < frac_scans_cov_min <= frac_scans_cov_max <= 1
+    assert 1 <= num_tables <= num_scans_min
+    assert zipf_exponent >= 0
+    assert 0 <= iwo_correlation <= 1
+
+    rng = np.random.default_rng(seed)
+
+    num_scans = int(rng.integers(num_scans_min, num_scans_max, endpoint=True))
+    num_possible_indexes = int(rng.integers(num_indexes_min, num_indexes_max, endpoint=True))
+    num_existing_indexes = int(rng.integers(num_existing_indexes_min,
+                                            num_existing_indexes_max,
+                                            endpoint=True))
+    num_indexes = num_possible_indexes + num_existing_indexes
+
+    # Tables of the scans (each one has at least one scan) and of the indexes. The possible indexes
+    # come first, the OID of an index being its position
+    table_sizes = 1 + _split(rng, num_scans - num_tables, rng.dirichlet(np.ones(num_tables)))
+    table_starts = np.concatenate(([0], np.cumsum(table_sizes)[:-1]))
+    index_tables = np.concatenate((np.repeat(np.arange(num_tables),
+                                             _split(rng, num_possible_indexes, table_sizes)),
+                                   np.repeat(np.arange(num_tables),
+                                             _split(rng, num_existing_indexes, table_sizes))))
+
+    read_costs = np.round(rng.uniform(scan_read_cost_min, scan_read_cost_max, num_scans), 2)
+
+    write_rates = rng.random(num_tables)
+    iwos = np.round(iwo_min + (iwo_max - iwo_min) *
+                    (iwo_correlation * write_rates[index_tables] +
+                     (1 - iwo_correlation) * rng.random(num_indexes)), 2)
 
-    data = {"Scans": [],
-            "Existing Indexes": [],
-            "Possible Indexes": []}
-
-    num_scans = random.randint(num_scans_min, num_scans_max)
-
-    for scan in range(num_scans):
-        data["Scans"].append({"Scan ID": f"Scan {scan}",
-                              "Sequential Scan Cost": round(random.uniform(scan_read_cost_min,
-                                                                           scan_read_cost_max), 2),
-                              "Existing Index Costs": [],
-                              "Possible Index Costs": []})
-
-    def _add_index(index, index_type):
-        """Add index `index` of type "Possible" or "Existing"."""
-        assert index_type in ("Possible", "Existing")
-        data[f"{index_type} Indexes"].append({"Index": {"Index OID": index},
-                                              "Index Write Overhead": round(random.uniform(iwo_min,
-                                                                                           iwo_max), 2)})
-
-        # Scans covered by this index
-        covered = random.sample(range(num_scans),
-                                round(num_scans * round(random.uniform(frac_scans_cov_min,
-                                                                       frac_scans_cov_max), 2)))
-        for scan in covered:
-            # The read cost should always be strictly worse than the cost of the index
-            read_cost = data["Scans"][scan]["Sequential Scan Cost"]
-            if read_cost <= scan_index_cost_max:
-                max_cost = read_cost - 1
-            else:
-                max_cost = scan_index_cost_max
-
-            data["Scans"][scan][f"{index_type} Index Costs"].append(
-                {"Index OID": index,
-                 "Cost": round(random.uniform(scan_index_cost_min,
-                                              max_cost), 2)})
-
-    # Add possible indexes
-    num_possible_indexes = random.randint(num_indexes_min, num_indexes_max)
-    for index in range(num_possible_indexes):
-        _add_index(index, "Possible")
-
-    # Add existing indexes
-    for index in range(num_possible_indexes, num_possible_indexes +
-                       random.randint(num_existing_indexes_min, num_existing_indexes_max)):
-        _add_index(index, "Existing")
-
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4)
+    # Scans covered by each index, one table at a time
+    fractions = np.round(rng.uniform(frac_scans_cov_min, frac_scans_cov_max, num_indexes), 2)
+    entry_indexes = []
+    entry_scans = []
+    for table in range(num_tables):
+        indexes = np.flatnonzero(index_tables == table)
+        size = int(table_sizes[table])
+        cdf = None
+        if zipf_exponent > 0:
+            popularity = (rng.permutation(size) + 1.0) ** -zipf_exponent
+            cdf = np.cumsum(popularity) / popularity.sum()
+        counts = np.round(size * fractions[indexes]).astype(np.int64)
+        owners, scans = _sample_covered(rng, counts, size, cdf)
+        entry_indexes.append(indexes[owners])
+        entry_scans.append(table_starts[table] + scans)
+    entry_indexes = np.concatenate(entry_indexes)
+    entry_scans = np.concatenate(entry_scans)
+
+    # The read cost should always be strictly worse than the cost of the index
+    max_costs = np.where(read_costs <= scan_index_cost_max, read_costs - 1, scan_index_cost_max)
+    entry_costs = np.round(rng.uniform(scan_index_cost_min, max_costs[entry_scans]), 2)
+
+    # Grouped by scan, possible indexes first
+    order = np.lexsort((entry_indexes, entry_scans))
+    entry_indexes = entry_indexes[order].tolist()
+    entry_costs = entry_costs[order].tolist()
+    bounds = np.searchsorted(entry_scans[order], np.arange(num_scans + 1)).tolist()
+
+    # Group of each scan and index, as the end of its JSON object
+    scan_groups = [""] * num_scans
+    index_groups = [""] * num_indexes
+    if groups:
+        scan_groups = [f', "Group": "Table {table}"'
+                       for table in np.repeat(np.arange(num_tables), table_sizes).tolist()]
+        index_groups = [f', "Group": "Table {table}"' for table in index_tables.tolist()]
+
+    f = sys.stdout if filename == "-" else open(filename, "w", encoding="utf-8")
+    try:
+        f.write('{\n    "Scans": [')
+        for scan, read_cost in enumerate(read_costs.tolist()):
+            start, end = bounds[scan], bounds[scan + 1]
+            split = start
+            while split < end and entry_indexes[split] < num_possible_indexes:
+                split += 1
+            f.write(f'{"," if scan > 0 else ""}\n        {{"Scan ID": "Scan {scan}", '
+                    f'"Sequential Scan Cost": {read_cost}, '
+                    f'"Existing Index Costs": [{_format_costs(entry_indexes[split:end], entry_costs[split:end])}], '
+                    f'"Possible Index Costs": [{_format_costs(entry_indexes[start:split], entry_costs[start:split])}]'
+                    f'{scan_groups[scan]}}}')
+
+        iwos = iwos.tolist()
+        f.write('\n    ],\n    "Existing Indexes": [\n')
+        f.write(_format_indexes(range(num_possible_indexes, num_indexes),
+                                iwos[num_possible_indexes:],
+                                index_groups[num_possible_indexes:]))
+        f.write('\n    ],\n    "Possible Indexes": [\n')
+        f.write(_format_indexes(range(num_possible_indexes),
+                                iwos[:num_possible_indexes],
+                                index_groups[:num_possible_indexes]))
+        f.write('\n    ]\n}\n')
+    finally:
+        if f is not sys.stdout:
+            f.close()
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) == 2
-
-    generate_instance(sys.argv[1],
-                      SEED,
-                      NUM_SCANS_MIN,
-                      NUM_SCANS_MAX,
-                      SCAN_INDEX_COST_MIN,
-                      SCAN_INDEX_COST_MAX,
-                      SCAN_READ_COST_MIN,
-                      SCAN_READ_COST_MAX,
-                      NUM_INDEXES_MIN,
-                      NUM_INDEXES_MAX,
-                      NUM_EXISTING_INDEXES_MIN,
-                      NUM_EXISTING_INDEXES_MAX,
-                      IWO_MIN,
-                      IWO_MAX,
-                      FRAC_SCANS_COV_MIN,
-                      FRAC_SCANS_COV_MAX)
+    cli_args = cli.get_datagen_args()
+
+    # The ranges that are not provided are those of the constants
+    def _range(name, default_min, default_max):
+        return cli_args[name] if cli_args[name] is not None else (default_min, default_max)
+
+    generate_instance(cli_args["Output"],
+                      cli_args["Seed"] if cli_args["Seed"] is not None else SEED,
+                      *_range("Scans", NUM_SCANS_MIN, NUM_SCANS_MAX),
+                      *_range("Index Cost", SCAN_INDEX_COST_MIN, SCAN_INDEX_COST_MAX),
+                      *_range("Read Cost", SCAN_READ_COST_MIN, SCAN_READ_COST_MAX),
+                      *_range("Possible Indexes", NUM_INDEXES_MIN, NUM_INDEXES_MAX),
+                      *_range("Existing Indexes", NUM_EXISTING_INDEXES_MIN, NUM_EXISTING_INDEXES_MAX),
+                      *_range("IWO", IWO_MIN, IWO_MAX),
+                      *_range("Coverage", FRAC_SCANS_COV_MIN, FRAC_SCANS_COV_MAX),
+                      num_tables=cli_args["Tables"] if cli_args["Tables"] is not None else NUM_TABLES,
+                      zipf_exponent=cli_args["Zipf Exponent"] if cli_args["Zipf Exponent"] is not None
+                      else ZIPF_EXPONENT,
+                      iwo_correlation=cli_args["IWO Correlation"] if cli_args["IWO Correlation"] is not None
+                      else IWO_CORRELATION,
+                      groups=cli_args["Groups"])
@@ -0,0 +1,514 @@
+"""Decomposition of a reduced problem into independent sub-problems."""
+
+
+from array import array
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import heapq
+import itertools
+import time
+
+import costs
+import goal
+import heuristic
+import modelize
+
+
+def find_components(problem):
+    """Return the connected components of the scan-index graph of a reduced problem.
+
+    The problem must not contain existing indexes (see presolve.reduce_problem()), otherwise they
+    would connect all the scans they cover.
+
+    Returns:
+      A list of components, each one a tuple (indexes, scans) of sorted positions. Scans that are
+      not covered by any index are left out.
+    """
+    assert problem["Number of Existing Indexes"] == 0
+
+    matrix = problem["Index Costs"]
+    num_indexes = matrix.get_num_indexes()
+
+    # Union-find over the indexes, two indexes being connected when they cover the same scan
+    parent = list(range(num_indexes))
+
+    def _find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for scan in range(matrix.get_num_scans()):
+        indexes, _ = matrix.get_scan_entries(scan)
+        if len(indexes) == 0:
+            continue
+        root = _find(indexes[0])
+        for index in indexes[1:]:
+            other = _find(index)
+            if other != root:
+                parent[other] = root
+
+    components = {}
+    for index in range(num_indexes):
+        indexes, scans = components.setdefault(_find(index), ([], set()))
+        indexes.append(index)
+        scans.update(matrix.get_index_entries(index)[0])
+
+    return [(indexes, sorted(scans)) for indexes, scans in components.values()]
+
+
+def find_groups(problem, index_groups, num_groups):
+    """Return the groups of the input (e.g., tables) of a reduced problem.
+
+    Args:
+      problem: The reduced problem (see presolve.reduce_problem()).
+      index_groups: The group of each index of the reduced problem (a position below num_groups).
+      num_groups: The number of groups.
+
+    Returns:
+      A list with, for each group, a tuple (indexes, scans) of sorted positions, as returned by
+      find_components(). A scan is part of the group of the indexes covering it.
+    """
+    matrix = problem["Index Costs"]
+    groups = [([], set()) for _ in range(num_groups)]
+    for index, group in enumerate(index_groups):
+        indexes, scans = groups[group]
+        indexes.append(index)
+        scans.update(matrix.get_index_entries(index)[0])
+
+    return [(indexes, sorted(scans)) for indexes, scans in groups]
+
+
+def split_problem(problem, component):
+    """Return the sub-problem of a reduced problem made of one of its components.
+
+    The sub-problem has the same format as the reduced problem, without offsets, and its
+    "Original Indexes" are the positions of its indexes in the reduced problem.
+    """
+    indexes, scans = component
+    scan_position = {scan: position for position, scan in enumerate(scans)}
+    matrix = problem["Index Costs"]
+
+    entry_indexes = array("I")
+    entry_scans = array("I")
+    entry_costs = array("q")
+    for position, index in enumerate(indexes):
+        index_scans, index_costs = matrix.get_index_entries(index)
+        entry_indexes.extend([position] * len(index_scans))
+        entry_scans.extend(scan_position[scan] for scan in index_scans)
+        entry_costs.extend(index_costs)
+
+    sub_problem = {}
+    sub_problem["Number of Existing Indexes"] = 0
+    sub_problem["Number of Possible Indexes"] = len(indexes)
+    sub_problem["Sequential Scan Costs"] = [problem["Sequential Scan Costs"][scan] for scan in scans]
+    sub_problem["Always Covered Scans"] = [problem["Always Covered Scans"][scan] for scan in scans]
+    sub_problem["Index IWOs"] = [problem["Index IWOs"][index] for index in indexes]
+    sub_problem["Index Costs"] = costs.CostMatrix(len(indexes),
+                                                  len(scans),
+                                                  entry_indexes,
+                                                  entry_scans,
+                                                  entry_costs)
+    sub_problem["Index Costs (B)"] = costs.CostMatrixView(sub_problem["Index Costs"], "B")
+    sub_problem["Index Costs (R)"] = costs.CostMatrixView(sub_problem["Index Costs"],
+                                                          "R",
+                                                          sub_problem["Sequential Scan Costs"])
+    sub_problem["Offsets"] = {"Cost": 0, "Coverage": 0, "IWO": 0, "Indexes": 0}
+    sub_problem["Original Indexes"] = array("I", indexes)
+
+    return sub_problem
+
+
+def is_separable(goals):
+    """Return a boolean indicating if the goals can be optimized separately on each component.
+
+    Each goal but the last one becomes a constraint. With a strictness of 1, that constraint
+    forces every component to stay optimal for the goal, so the components do not interact.
+    """
+    return all(gl.get("Strictness", 1) == 1 for gl in goals[:-1])
+
+
+def solve_goals(problem,
+                settings,
+                time_limit,
+                parameters=None,
+                warm_start=None,
+                polish=False,
+                interrupt=None,
+                stall_time=None):
+    """Optimize the goals in order on a problem, reusing one model.
+
+    Args:
+      problem: The problem data (e.g., a sub-problem from split_problem()).
+      settings: The optimizer settings (goals and rule values).
+      time_limit: The time limit in seconds for each goal.
+      parameters: The solver parameters of each goal (see modelize.solve_model()).
+      warm_start: Solution to warm start the first goal from (none if None).
+      polish: If the solutions not proven optimal should be improved by a local search (see
+        heuristic.polish()).
+      interrupt, stall_time: See modelize.solve_model() (once `interrupt` is set, the remaining
+        goals keep the solution found so far).
+
+    Returns:
+      A list with, for each goal, a dictionary in the form:
+      - Objective Value: The value found for the goal.
+      - Best Bound: The best bound proven on the value of the goal.
+      - Status: The solver status.
+      - Indexes: A 0-1 tuple of the selected indexes once the goal is optimized.
+      - Time, Branches, Conflicts: The statistics of the solver (see modelize.solve_model()).
+    """
+    goals = [goal.Goal(gl["Name"], gl.get("Strictness", 1)) for gl in settings["Goals"]]
+    if parameters is None:
+        parameters = [None for _ in goals]
+    model = modelize.build_basic_model(problem, settings)
+
+    steps = []
+    solution = warm_start
+    for i, gl in enumerate(goals):
+        if i > 0:
+            modelize.reset_objective(model)
+            goals[i - 1].add_as_constraint(model)
+        gl.add_as_objective(model)
+
+        polish_time = heuristic.POLISH_SHARE * time_limit if polish else 0
+        results = modelize.solve_model(model,
+                                       time_limit - polish_time,
+                                       solution,
+                                       parameters[i],
+                                       interrupt=interrupt,
+                                       stall_time=stall_time)
+        if polish and results["Status"] != "Optimal" and not (interrupt and interrupt.is_set()):
+            results = heuristic.polish_results(problem,
+                                               settings,
+                                               goals[:i + 1],
+                                               results,
+                                               polish_time,
+                                               (parameters[i] or {}).get("Seed", 0))
+        solution = tuple(results["Indexes"])
+        gl.update_value(results["Objective Value"])
+        steps.append({"Objective Value": results["Objective Value"],
+                      "Best Bound": results["Best Bound"],
+                      "Status": results["Status"],
+                      "Indexes": solution,
+                      "Time": results["Time"],
+                      "Branches": results["Branches"],
+                      "Conflicts": results["Conflicts"]})
+
+    return steps
+
+
+def _solve_goals_star(arguments):
+    """Call solve_goals() with a tuple of arguments (for process pools)."""
+    return solve_goals(*arguments)
+
+
+def _get_size(problem):
+    """Return the size of a problem, by which the time of _solve_all() is shared."""
+    return problem["Number of Possible Indexes"] + problem["Index Costs"].get_num_entries()
+
+
+def _solve_all(arguments,
+               time_limit,
+               jobs,
+               parameters,
+               warm_starts=None,
+               polish=False,
+               interrupt=None,
+               stall_time=None):
+    """Call solve_goals() on each (problem, settings) pair, using up to `jobs` processes, each
+    call being warm started from its solution of `warm_starts` (if provided) and polishing its
+    solutions if `polish` is set.
+
+    Solving all the calls takes about as long as a single call with the full time limit. Each call
+    gets a share of the time left to the processes, among itself and the calls not yet started, in
+    proportion to its size (see _get_size()) plus the mean size (so that the smallest calls still
+    get about half of an even share), and at most the full time limit. The calls start from the
+    smallest, so that the time left unused by the small ones goes to the large ones. Likewise, the
+    solver workers are divided between the processes.
+
+    Once `interrupt` is set, the calls not started yet get no time, and keep their warm starts. The
+    other processes do not share the event, so the calls they are running finish within their time
+    limits (the search of the calls run in this process stops at once).
+    """
+    num_processes = min(jobs, len(arguments))
+
+    if parameters is not None and num_processes > 1:
+        parameters = [dict(goal_parameters) for goal_parameters in parameters]
+        for goal_parameters in parameters:
+            goal_parameters["Workers"] = max(1, goal_parameters["Workers"] // num_processes)
+
+    if warm_starts is None:
+        warm_starts = [None for _ in arguments]
+
+    # The time limit applies to each goal, so the calls share it for all the goals
+    num_goals = max((len(settings["Goals"]) for _, settings in arguments), default=1)
+    deadline = time.perf_counter() + time_limit * num_goals
+    sizes = [_get_size(problem) for problem, _ in arguments]
+    sizes = [size + sum(sizes) / len(sizes) for size in sizes]
+    remaining_size = sum(sizes)  # Of the calls not yet started
+    granted = {}                 # Time granted to each running call, and when it started
+
+    def _start(call, in_process):
+        """Return the arguments of solve_goals() for a call, with its share of the time left."""
+        nonlocal remaining_size
+        now = time.perf_counter()
+        available = num_processes * (deadline - now) - sum(max(0, granted_time - (now - start))
+                                                           for granted_time, start in granted.values())
+        share = available * sizes[call] / remaining_size
+        remaining_size -= sizes[call]
+
+        call_time_limit = max(0.0, min(time_limit, share / num_goals, (deadline - now) / num_goals))
+        if interrupt is not None and interrupt.is_set():
+            call_time_limit = 0.0
+        granted[call] = (call_time_limit * num_goals, now)
+        problem, settings = arguments[call]
+        return (problem,
+                settings,
+                call_time_limit,
+                parameters,
+                warm_starts[call],
+                polish,
+                interrupt if in_process else None,
+                stall_time)
+
+    order = iter(sorted(range(len(arguments)), key=lambda call: sizes[call]))
+    results = [None for _ in arguments]
+
+    if num_processes <= 1:
+        for call in order:
+            results[call] = _solve_goals_star(_start(call, True))
+            del granted[call]
+        return results
+
+    with ProcessPoolExecutor(max_workers=num_processes) as executor:
+        running = {executor.submit(_solve_goals_star, _start(call, False)): call
+                   for call in itertools.islice(order, num_processes)}
+        while running:
+            # The interrupt is checked between the calls, since the processes do not share it
+            done, _ = wait(running,
+                           timeout=None if interrupt is None else 0.1,
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                call = running.pop(future)
+                results[call] = future.result()
+                del granted[call]
+            if interrupt is not None and interrupt.is_set():
+                break
+            for call in itertools.islice(order, len(done)):
+                running[executor.submit(_solve_goals_star, _start(call, False))] = call
+
+        # Once interrupted, the calls not started yet are solved in this process, with no time
+        for future, call in list(running.items()):
+            if future.cancel():
+                del running[future]
+                del granted[call]
+                order = itertools.chain([call], order)
+        for call in order:
+            results[call] = _solve_goals_star(_start(call, True))
+            del granted[call]
+        for future, call in running.items():
+            results[call] = future.result()
+
+    return results
+
+
+def _relax_rules(settings, sub_problem, num_indexes=None, maximum_iwo=None):
+    """Return the settings for a sub-problem, with at most `num_indexes` possible indexes and an
+    IWO of at most `maximum_iwo` (unconstrained if None)."""
+    sub_settings = dict(settings)
+    if num_indexes is None:
+        num_indexes = sub_problem["Number of Possible Indexes"]
+    if maximum_iwo is None:
+        maximum_iwo = sum(sub_problem["Index IWOs"])
+    sub_settings["Maximum Number of Possible Indexes"] = num_indexes
+    sub_settings["Maximum IWO"] = maximum_iwo
+    return sub_settings
+
+
+def solve_components(sub_problems,
+                     settings,
+                     time_limit,
+                     jobs=1,
+                     parameters=None,
+                     warm_starts=None,
+                     polish=False,
+                     interrupt=None,
+                     stall_time=None):
+    """Optimize the goals on each sub-problem, using up to `jobs` processes.
+
+    The rules of the settings are relaxed, so the settings must not contain binding rules (and any
+    solution of `warm_starts`, one per sub-problem if provided, satisfies them). Once `interrupt`
+    is set, the sub-problems keep the solutions found so far (see _solve_all()).
+
+    Returns:
+      A list with the result of solve_goals() for each sub-problem.
+    """
+    return _solve_all([(sub_problem, _relax_rules(settings, sub_problem))
+                       for sub_problem in sub_problems],
+                      time_limit,
+                      jobs,
+                      parameters,
+                      warm_starts,
+                      polish,
+                      interrupt,
+                      stall_time)
+
+
+def solve_with_budgets(sub_problems,
+                       settings,
+                       budgets,
+                       time_limit,
+                       jobs=1,
+                       parameters=None,
+                       warm_starts=None,
+                       polish=False,
+                       interrupt=None,
+                       stall_time=None):
+    """Optimize the goals on each sub-problem under its own rules, using up to `jobs` processes.
+
+    Args:
+      sub_problems: The sub-problems (see split_problem()).
+      settings: The optimizer settings (goals).
+      budgets: For each sub-problem, a tuple (maximum number of possible indexes, maximum IWO),
+        either being None if unconstrained.
+      time_limit, jobs, parameters, warm_starts, polish, interrupt, stall_time: See
+        solve_components().
+
+    Returns:
+      A list with the result of solve_goals() for each sub-problem.
+    """
+    return _solve_all([(sub_problem, _relax_rules(settings, sub_problem, *budget))
+                       for sub_problem, budget in zip(sub_problems, budgets)],
+                      time_limit,
+                      jobs,
+                      parameters,
+                      warm_starts,
+                      polish,
+                      interrupt,
+                      stall_time)
+
+
+def build_tradeoff_tables(sub_problems,
+                          settings,
+                          time_limit,
+                          budget,
+                          jobs=1,
+                          parameters=None,
+                          polish=False,
+                          interrupt=None,
+                          stall_time=None):
+    """Optimize the goals on each sub-problem for every budget of possible indexes (see
+    solve_components() for the arguments).
+
+    Returns:
+      A list with, for each sub-problem, a list indexed by the number of possible indexes allowed
+      (from 0 to the budget, or to the number needed without any budget if it is lower) of the
+      results of solve_goals().
+    """
+    unconstrained = solve_components(sub_problems,
+                                     settings,
+                                     time_limit,
+                                     jobs,
+                                     parameters,
+                                     polish=polish,
+                                     interrupt=interrupt,
+                                     stall_time=stall_time)
+
+    # Allowing more indexes than the unconstrained solution uses cannot improve it
+    sizes = [min(budget, sum(steps[-1]["Indexes"]) - 1) + 1 for steps in unconstrained]
+
+    arguments = []
+    for sub_problem, size in zip(sub_problems, sizes):
+        for num_indexes in range(size):
+            arguments.append((sub_problem, _relax_rules(settings, sub_problem, num_indexes)))
+    constrained = iter(_solve_all(arguments,
+                                  time_limit,
+                                  jobs,
+                                  parameters,
+                                  polish=polish,
+                                  interrupt=interrupt,
+                                  stall_time=stall_time))
+
+    tables = []
+    for steps, size in zip(unconstrained, sizes):
+        table = [next(constrained) for _ in range(size)]
+        if size <= budget:
+            table.append(steps)
+        tables.append(table)
+
+    return tables
+
+
+def allocate_budget(tables, goals, budget):
+    """Divide a budget of possible indexes between the sub-problems.
+
+    The goals are compared lexicographically, which is exact when is_separable() holds.
+
+    Args:
+      tables: The trade-off tables returned by build_tradeoff_tables().
+      goals: The goals of the settings.
+      budget: The maximum number of possible indexes.
+
+    Returns:
+      The number of possible indexes allocated to each sub-problem.
+    """
+    signs = [-1 if gl["Name"] == "Maximal Coverage" else 1 for gl in goals]
+
+    def _key(steps):
+        return tuple(sign * step["Objective Value"] for sign, step in zip(signs, steps))
+
+    # best[b] == (key, allocation) for the sub-problems seen so far, using at most b indexes
+    best = [(tuple(0 for _ in goals), []) for _ in range(budget + 1)]
+    for table in tables:
+        new_best = []
+        for total in range(budget + 1):
+            candidates = []
+            for num_indexes in range(min(total, len(table) - 1) + 1):
+                key, allocation = best[total - num_indexes]
+                candidates.append((tuple(a + b for a, b in zip(key, _key(table[num_indexes]))),
+                                   allocation + [num_indexes]))
+            new_best.append(min(candidates, key=lambda candidate: candidate[0]))
+        best = new_best
+
+    return best[budget][1]
+
+
+def divide_budgets(curves, weights, maximum_num_indexes, maximum_iwo):
+    """Divide a budget of possible indexes and of IWO between sub-problems, from the marginal
+    benefits of their indexes.
+
+    The steps of all the curves are taken greedily by decreasing benefit per resource used, each
+    curve in its own order, until the budget is spent. A curve whose next step does not fit in the
+    budget gets no more steps.
+
+    Args:
+      curves: The marginal-benefit curve of each sub-problem (see heuristic.get_benefit_curve()).
+      weights: The weights giving the resource used by a step (see heuristic.get_benefit_curve()).
+      maximum_num_indexes: The maximum number of possible indexes of all the sub-problems.
+      maximum_iwo: The maximum IWO of all the sub-problems.
+
+    Returns:
+      For each sub-problem, the number of steps of its curve taken, which give its budget.
+    """
+    def _priority(curve, position):
+        _, benefit, iwo = curve[position]
+        return -benefit / (weights[0] + weights[1] * iwo)
+
+    heap = [(_priority(curve, 0), group, 0) for group, curve in enumerate(curves) if curve]
+    heapq.heapify(heap)
+
+    num_steps = [0 for _ in curves]
+    num_indexes = 0
+    iwo = 0
+    while heap and num_indexes < maximum_num_indexes:
+        _, group, position = heapq.heappop(heap)
+        step_iwo = curves[group][position][2]
+        if iwo + step_iwo > maximum_iwo:
+            continue
+
+        num_steps[group] += 1
+        num_indexes += 1
+        iwo += step_iwo
+        if position + 1 < len(curves[group]):
+            heapq.heappush(heap, (_priority(curves[group], position + 1), group, position + 1))
+
+    return num_steps
@@ -0,0 +1,116 @@
+"""Diagnostics of a run: time of each phase, peak memory, model sizes and solver statistics."""
+
+
+import contextlib
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def get_peak_memory():
+    """Return the peak resident memory of the process in megabytes (None if unknown)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+class Diagnostics:
+    """Collect the diagnostics of a run, and pass each record to a hook as soon as it is made."""
+
+    def __init__(self, on_record=None):
+        """Initialize the diagnostics.
+
+        Args:
+          on_record: Function called with a dictionary for each record (e.g., to forward it to a
+            metrics system), possibly from a thread of the solver. The record is in the form:
+            - Record: The kind of record ("Phase", "Model" or "Goal").
+            - For a Phase: the Phase name and its Time in seconds.
+            - For a Model: the Step of the goal it was built for, and its size (Variables,
+              Constraints, Terms).
+            - For a Goal: its Step and statistics (see add_goal()).
+        """
+        self._on_record = on_record
+        self._phases = {}  # Time in seconds spent in each phase, summed over its occurrences
+        self._models = []
+        self._goals = []
+
+    def _record(self, kind, record):
+        """Pass a record to the hook, if one was provided."""
+        if self._on_record is not None:
+            self._on_record({"Record": kind, **record})
+
+    def add_phase(self, phase, seconds):
+        """Record the time spent in a phase (added to its previous occurrences)."""
+        self._phases[phase] = self._phases.get(phase, 0) + seconds
+        self._record("Phase", {"Phase": phase, "Time": seconds})
+
+    @contextlib.contextmanager
+    def measure(self, phase):
+        """Record the time spent in a phase, as a context manager."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(phase, time.perf_counter() - start)
+
+    def add_model(self, step, size):
+        """Record the size of a model built for a goal (see modelize.get_model_size())."""
+        model = {"Step": step, **size}
+        self._models.append(model)
+        self._record("Model", model)
+
+    def add_goal(self,
+                 step,
+                 goal_name,
+                 status,
+                 objective_value,
+                 best_bound,
+                 time_spent,
+                 branches=None,
+                 conflicts=None):
+        """Record the statistics of a goal once optimized.
+
+        Args:
+          step: The position of the goal (starting from 1).
+          goal_name: The name of the goal.
+          status: The status of the solver.
+          objective_value: The value of the goal (in the units of the problem).
+          best_bound: The best bound proven on the value of the goal (in the units of the problem).
+          time_spent: The time in seconds spent optimizing the goal.
+          branches: The number of branches explored by the solver (None without a solver).
+          conflicts: The number of conflicts met by the solver (None without a solver).
+        """
+        goal = {"Step": step,
+                "Goal": goal_name,
+                "Status": status,
+                "Objective Value": objective_value,
+                "Best Bound": best_bound,
+                "Gap": abs(objective_value - best_bound) / max(1, abs(objective_value)),
+                "Time": time_spent,
+                "Branches": branches,
+                "Conflicts": conflicts}
+        self._goals.append(goal)
+        self._record("Goal", goal)
+
+    def get_report(self):
+        """Return the diagnostics collected so far.
+
+        Returns:
+          A dictionary in the form:
+          - Phases: The time in seconds spent in each phase (e.g., Read, Presolve, Build, Search,
+            Results), summed over its occurrences.
+          - Peak Memory (MB): The peak resident memory of the process (None if unknown).
+          - Models: The size of each model built (see add_model()).
+          - Goals: The statistics of each goal (see add_goal()).
+        """
+        peak_memory = get_peak_memory()
+        return {"Phases": {phase: round(seconds, 6) for phase, seconds in self._phases.items()},
+                "Peak Memory (MB)": None if peak_memory is None else round(peak_memory, 1),
+                "Models": list(self._models),
+                "Goals": list(self._goals)}
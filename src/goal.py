@@ -19,6 +19,12 @@ class Goal:
               "Minimal Indexes",
               "Minimal Cost")
 
+    # Offset of the problem (see presolve.reduce_problem()) measured by each goal
+    _offsets = {"Maximal Coverage": "Coverage",
+                "Minimal IWO": "IWO",
+                "Minimal Indexes": "Indexes",
+                "Minimal Cost": "Cost"}
+
     def __init__(self, name, strictness=1):
         """Intialize the goal.
 
@@ -53,44 +59,67 @@ class Goal:
         """Update the value of the goal after it has been optimized."""
         self._value = value
 
-    def add_as_objective(self, model):
-        """Add the goal as an objective to the model."""
+    def _get_expression(self, model):
+        """Return the linear expression measured by the goal (including the model offsets)."""
+        offset = self.get_offset(model.offsets)
+
         if self._name == "Maximal Coverage":
-            model.Add(model.objective == cp_model.LinearExpr.Sum(model.is_covered))
-            model.Maximize(model.objective)
+            return cp_model.LinearExpr.Sum(model.is_covered) + offset
 
-        elif self._name == "Minimal IWO":
-            model.Add(model.objective ==
-                      cp_model.LinearExpr.WeightedSum(model.x, model.index_iwo))
-            model.Minimize(model.objective)
+        if self._name == "Minimal IWO":
+            return cp_model.LinearExpr.WeightedSum(model.x, model.index_iwo) + offset
 
-        elif self._name == "Minimal Indexes":
-            model.Add(model.objective == cp_model.LinearExpr.Sum(model.x))
-            model.Minimize(model.objective)
+        if self._name == "Minimal Indexes":
+            return cp_model.LinearExpr.Sum(model.x) + offset
 
-        elif self._name == "Minimal Cost":
-            model.Add(model.objective == cp_model.LinearExpr.Sum(model.scan_cost))
-            model.Minimize(model.objective)
+        return cp_model.LinearExpr.Sum(model.scan_cost) + offset  # Minimal Cost
 
-    def add_as_constraint(self, model):
-        """Add the goal as a constraint to the model."""
-        assert self.is_optimized()
+    def get_measure(self):
+        """Return the quantity measured by the goal, as named in the offsets of a problem."""
+        return self._offsets[self._name]
 
-        if self._name == "Maximal Coverage":
-            model.Add(cp_model.LinearExpr.Sum([model.is_covered[j] for j in range(model.num_scans)])
-                      >= ceil(self.get_value() * self._strictness))
+    def get_offset(self, offsets):
+        """Return the offset measured by the goal among the offsets of a problem."""
+        return offsets[self.get_measure()]
 
-        elif self._name == "Minimal IWO":
-            model.Add(cp_model.LinearExpr.WeightedSum(model.x, model.index_iwo)
-                      <= floor(self.get_value() * (2 - self._strictness)))
+    def is_maximized(self):
+        """Return a boolean indicating if the goal is maximized (otherwise, it is minimized)."""
+        return self._name == "Maximal Coverage"
 
-        elif self._name == "Minimal Indexes":
-            model.Add(cp_model.LinearExpr.Sum(model.x)
-                      <= floor(self.get_value() * (2 - self._strictness)))
+    def add_as_objective(self, model, bound=None):
+        """Add the goal as an objective to the model.
 
-        elif self._name == "Minimal Cost":
-            model.Add(cp_model.LinearExpr.Sum(model.scan_cost)
-                      <= floor(self.get_value() * (2 - self._strictness)))
+        Args:
+          model: The model.
+          bound: Value of a known solution for this goal, which the objective must at least match
+            (None if no such value is known).
+        """
+        model.Add(model.objective == self._get_expression(model))
+
+        if self.is_maximized():
+            if bound is not None:
+                model.Add(model.objective >= bound)
+            model.Maximize(model.objective)
+        else:
+            if bound is not None:
+                model.Add(model.objective <= bound)
+            model.Minimize(model.objective)
+
+    def get_constraint_bound(self):
+        """Return the bound that the goal imposes once optimized (a lower bound if the goal is
+        maximized, otherwise an upper bound)."""
+        assert self.is_optimized()
+
+        if self.is_maximized():
+            return ceil(self.get_value() * self._strictness)
+        return floor(self.get_value() * (2 - self._strictness))
+
+    def add_as_constraint(self, model):
+        """Add the goal as a constraint to the model."""
+        if self.is_maximized():
+            model.Add(self._get_expression(model) >= self.get_constraint_bound())
+        else:
+            model.Add(self._get_expression(model) <= self.get_constraint_bound())
 
     def get_objective_description(self):
         """Return the description of the objective."""
@@ -0,0 +1,608 @@
+"""Heuristic optimization of the goals, for problems too large to be modeled in time, and
+polishing of the solutions of the solver."""
+
+
+import heapq
+import random
+import time
+
+import goal
+
+
+# Number of replacement candidates tried for each selected index during a swap pass
+_SWAP_CANDIDATES = 32
+
+# Large neighborhood search: number of selected indexes dropped by each move, and number of
+# unselected indexes (sharing the most scans with them) considered to repair the constraints
+_LNS_DESTROYED = 4
+_LNS_CANDIDATES = 64
+
+# Share of the time limit of a goal kept to polish the solution of the solver (see polish())
+POLISH_SHARE = 0.1
+
+
+class Selection:
+    """Selection of indexes, with the values of all the goals kept up to date.
+
+    The values are in the units of the model (upscaled, including the offsets of the problem).
+    """
+
+    def __init__(self, problem, solution=None):
+        """Initialize the selection.
+
+        Args:
+          problem: The problem data (possibly reduced, see presolve.reduce_problem()).
+          solution: A 0-1 sequence of the indexes initially selected (only the existing indexes if
+            None, which are always selected).
+        """
+        self._matrix = problem["Index Costs"]
+        self._read_costs = problem["Sequential Scan Costs"]
+        self._always_covered = problem.get("Always Covered Scans",
+                                           [False for _ in self._read_costs])
+        self._index_iwo = problem["Index IWOs"]
+        self._num_eind = problem["Number of Existing Indexes"]
+        self._offsets = problem.get("Offsets", {"Cost": 0, "Coverage": 0, "IWO": 0, "Indexes": 0})
+
+        self._selected = [0 for _ in self._index_iwo]
+        # For each scan, the best cost offered by the selected indexes (or its read cost), the
+        # index offering it (None for the read cost), and the best cost offered without that index
+        self._best_costs = list(self._read_costs)
+        self._best_indexes = [None for _ in self._read_costs]
+        self._second_costs = list(self._read_costs)
+        self._num_covering = [0 for _ in self._read_costs]  # Selected indexes covering each scan
+        self._values = {"Cost": sum(self._read_costs),
+                        "Coverage": sum(1 for covered in self._always_covered if covered),
+                        "IWO": 0,
+                        "Indexes": 0}
+
+        if solution is None:
+            solution = [int(index < self._num_eind) for index in range(len(self._index_iwo))]
+        for index, used in enumerate(solution):
+            if used:
+                self.add(index)
+
+    def get_solution(self):
+        """Return the selection as a 0-1 tuple."""
+        return tuple(self._selected)
+
+    def is_selected(self, index):
+        """Return a boolean indicating if an index is selected."""
+        return self._selected[index] == 1
+
+    def get_num_indexes(self):
+        """Return the number of indexes (selected or not)."""
+        return len(self._selected)
+
+    def get_num_eind(self):
+        """Return the number of existing indexes (which are always selected)."""
+        return self._num_eind
+
+    def get_values(self):
+        """Return the value of each goal (by offset name, e.g., "Cost")."""
+        return {name: value + self._offsets[name] for name, value in self._values.items()}
+
+    def get_add_delta(self, index):
+        """Return the change of the value of each goal if an unselected index were added."""
+        delta_cost = 0
+        delta_coverage = 0
+        scans, costs = self._matrix.get_index_entries(index)
+        for scan, cost in zip(scans, costs):
+            if cost < self._best_costs[scan]:
+                delta_cost += cost - self._best_costs[scan]
+            if self._num_covering[scan] == 0 and not self._always_covered[scan]:
+                delta_coverage += 1
+        return {"Cost": delta_cost,
+                "Coverage": delta_coverage,
+                "IWO": self._index_iwo[index],
+                "Indexes": 1}
+
+    def _update_best_costs(self, scan):
+        """Compute the best and second-best costs offered to a scan by the selected indexes."""
+        best_cost = second_cost = self._read_costs[scan]
+        best_index = None
+        indexes, costs = self._matrix.get_scan_entries(scan)
+        for index, cost in zip(indexes, costs):
+            if not self._selected[index]:
+                continue
+            if cost < best_cost:
+                best_cost, second_cost, best_index = cost, best_cost, index
+            elif cost < second_cost:
+                second_cost = cost
+        self._best_costs[scan] = best_cost
+        self._best_indexes[scan] = best_index
+        self._second_costs[scan] = second_cost
+
+    def get_drop_delta(self, index):
+        """Return the change of the value of each goal if a selected index were dropped.
+
+        Only the scans covered by the index are visited: a scan it offers the best cost to falls
+        back to its second-best cost.
+        """
+        delta_cost = 0
+        delta_coverage = 0
+        scans, costs = self._matrix.get_index_entries(index)
+        for scan, cost in zip(scans, costs):
+            if self._num_covering[scan] == 1 and not self._always_covered[scan]:
+                delta_coverage -= 1
+            if self._best_indexes[scan] == index:
+                delta_cost += self._second_costs[scan] - cost
+        return {"Cost": delta_cost,
+                "Coverage": delta_coverage,
+                "IWO": -self._index_iwo[index],
+                "Indexes": -1}
+
+    def get_flip_delta(self, index):
+        """Return the change of the value of each goal if an index were added (if unselected) or
+        dropped (if selected)."""
+        if self._selected[index]:
+            return self.get_drop_delta(index)
+        return self.get_add_delta(index)
+
+    def add(self, index):
+        """Select an index."""
+        assert not self._selected[index]
+
+        self._selected[index] = 1
+        scans, costs = self._matrix.get_index_entries(index)
+        for scan, cost in zip(scans, costs):
+            self._num_covering[scan] += 1
+            if self._num_covering[scan] == 1 and not self._always_covered[scan]:
+                self._values["Coverage"] += 1
+            if cost < self._best_costs[scan]:
+                self._values["Cost"] += cost - self._best_costs[scan]
+                self._second_costs[scan] = self._best_costs[scan]
+                self._best_costs[scan] = cost
+                self._best_indexes[scan] = index
+            elif cost < self._second_costs[scan]:
+                self._second_costs[scan] = cost
+        self._values["IWO"] += self._index_iwo[index]
+        self._values["Indexes"] += 1
+
+    def drop(self, index):
+        """Unselect an index.
+
+        The scans it offered the best or the second-best cost to are computed again from the
+        indexes covering them.
+        """
+        assert self._selected[index] and index >= self._num_eind
+
+        self._selected[index] = 0
+        scans, costs = self._matrix.get_index_entries(index)
+        for scan, cost in zip(scans, costs):
+            self._num_covering[scan] -= 1
+            if self._num_covering[scan] == 0 and not self._always_covered[scan]:
+                self._values["Coverage"] -= 1
+            if self._best_indexes[scan] == index or cost == self._second_costs[scan]:
+                best_cost = self._best_costs[scan]
+                self._update_best_costs(scan)
+                self._values["Cost"] += self._best_costs[scan] - best_cost
+        self._values["IWO"] -= self._index_iwo[index]
+        self._values["Indexes"] -= 1
+
+
+class _Step:
+    """Optimization of one goal, under the rules and the constraints of the previous goals."""
+
+    def __init__(self, gl, constraints, maximum_num_indexes, maximum_iwo):
+        """Initialize the step.
+
+        Args:
+          gl: The Goal optimized.
+          constraints: The previous goals (Goal objects, already optimized).
+          maximum_num_indexes: Maximum number of indexes (existing and possible) selected, including
+            the offset.
+          maximum_iwo: Maximum IWO of the selected indexes, including the offset.
+        """
+        self._measure = gl.get_measure()
+        self._sign = -1 if gl.is_maximized() else 1
+        self._constraints = [(previous.get_measure(),
+                              -1 if previous.is_maximized() else 1,
+                              previous.get_constraint_bound())
+                             for previous in constraints]
+        self._constraints.append(("Indexes", 1, maximum_num_indexes))
+        self._constraints.append(("IWO", 1, maximum_iwo))
+
+    def get_key(self, values):
+        """Return the key of the values of a selection (lower is better).
+
+        Ties on the goal are broken by using fewer indexes, then less IWO.
+        """
+        return self._sign * values[self._measure], values["Indexes"], values["IWO"]
+
+    def is_feasible(self, values):
+        """Return a boolean indicating if the values of a selection satisfy the constraints."""
+        return all(sign * values[name] <= sign * bound for name, sign, bound in self._constraints)
+
+    def get_violation(self, values):
+        """Return how much the values of a selection break the constraints (0 if they satisfy
+        them), each constraint counting relatively to its bound."""
+        return sum(max(0, sign * (values[name] - bound)) / max(1, abs(bound))
+                   for name, sign, bound in self._constraints)
+
+    def get_gain(self, delta):
+        """Return how much a change improves the goal (higher is better)."""
+        return -self._sign * delta[self._measure]
+
+
+def _apply(values, delta):
+    """Return the values of the goals after a change."""
+    return {name: value + delta[name] for name, value in values.items()}
+
+
+def _add_greedily(selection, step, deadline, per_iwo=False):
+    """Add the indexes improving the goal the most while the constraints allow it (lazy greedy).
+
+    The gain of an index can only decrease as other indexes are added, so a gain computed earlier is
+    an upper bound of its current gain.
+
+    Args:
+      selection: The Selection to add indexes to.
+      step: The _Step being optimized.
+      deadline: Time (time.perf_counter()) after which no more indexes are added.
+      per_iwo: If the gain of an index should be divided by its IWO.
+    """
+    def _priority(index, delta):
+        gain = step.get_gain(delta)
+        if per_iwo:
+            gain /= max(1, delta["IWO"])
+        return -gain
+
+    heap = []
+    for index in range(selection.get_num_eind(), selection.get_num_indexes()):
+        if not selection.is_selected(index):
+            priority = _priority(index, selection.get_add_delta(index))
+            if priority < 0:
+                heap.append((priority, index))
+    heapq.heapify(heap)
+
+    while heap and time.perf_counter() < deadline:
+        _, index = heapq.heappop(heap)
+        delta = selection.get_add_delta(index)
+        priority = _priority(index, delta)
+        if priority >= 0:
+            continue
+        if heap and priority > heap[0][0]:
+            heapq.heappush(heap, (priority, index))
+            continue
+
+        # Adding indexes only makes the constraints harder to satisfy, so an index that cannot be
+        # added now never will
+        if step.is_feasible(_apply(selection.get_values(), delta)):
+            selection.add(index)
+
+
+def _get_swap_candidates(matrix, selection, index, scores):
+    """Return the unselected indexes most likely to replace a selected index.
+
+    These are the indexes sharing the most scans with it, and the indexes with the best scores.
+    """
+    shared = {}
+    for scan in matrix.get_index_entries(index)[0]:
+        for other in matrix.get_scan_entries(scan)[0]:
+            if other >= selection.get_num_eind() and not selection.is_selected(other):
+                shared[other] = shared.get(other, 0) + 1
+
+    candidates = sorted(shared, key=lambda other: -shared[other])[:_SWAP_CANDIDATES]
+    candidates.extend(other for other in scores[:_SWAP_CANDIDATES]
+                      if not selection.is_selected(other) and other not in shared)
+    return candidates
+
+
+def _improve_locally(matrix, selection, step, deadline):
+    """Improve the selection with drop, add, and swap moves until none improves it.
+
+    Only the moves keeping the selection feasible and decreasing its key are made.
+    """
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        values = selection.get_values()
+        key = step.get_key(values)
+
+        # Drops
+        for index in range(selection.get_num_eind(), selection.get_num_indexes()):
+            if not selection.is_selected(index):
+                continue
+            new_values = _apply(values, selection.get_drop_delta(index))
+            if step.is_feasible(new_values) and step.get_key(new_values) < key:
+                selection.drop(index)
+                values, key = new_values, step.get_key(new_values)
+                improved = True
+
+        # Adds
+        add_deltas = {}
+        for index in range(selection.get_num_eind(), selection.get_num_indexes()):
+            if selection.is_selected(index):
+                continue
+            add_deltas[index] = selection.get_add_delta(index)
+            new_values = _apply(values, add_deltas[index])
+            if step.is_feasible(new_values) and step.get_key(new_values) < key:
+                selection.add(index)
+                values, key = new_values, step.get_key(new_values)
+                improved = True
+        scores = sorted(add_deltas, key=lambda index: -step.get_gain(add_deltas[index]))
+
+        # Swaps
+        for index in range(selection.get_num_eind(), selection.get_num_indexes()):
+            if time.perf_counter() >= deadline:
+                break
+            if not selection.is_selected(index):
+                continue
+
+            selection.drop(index)
+            dropped_values = selection.get_values()
+            best = None
+            for other in _get_swap_candidates(matrix, selection, index, scores):
+                new_values = _apply(dropped_values, selection.get_add_delta(other))
+                new_key = step.get_key(new_values)
+                if step.is_feasible(new_values) and new_key < key \
+                        and (best is None or new_key < best[0]):
+                    best = (new_key, other)
+
+            if best is None:
+                selection.add(index)
+            else:
+                selection.add(best[1])
+                values, key = selection.get_values(), best[0]
+                improved = True
+
+
+def _get_rules(problem, settings):
+    """Return the rules (maximum number of indexes, maximum IWO) as constraints on the values of a
+    Selection, which include the offsets."""
+    offsets = problem.get("Offsets", {"Cost": 0, "Coverage": 0, "IWO": 0, "Indexes": 0})
+    maximum_num_indexes = settings["Maximum Number of Possible Indexes"] + \
+        problem["Number of Existing Indexes"] + offsets["Indexes"]
+    return maximum_num_indexes, settings["Maximum IWO"]
+
+
+def get_benefit_curve(problem, gl, weights, limits):
+    """Return the marginal benefits of the possible indexes of a problem for a goal, in the order a
+    greedy selection adds them (lazy greedy, see _add_greedily()).
+
+    Args:
+      problem: The problem data (possibly reduced, see presolve.reduce_problem()).
+      gl: The Goal the indexes improve (e.g., Minimal Cost).
+      weights: A tuple (weight of an index, weight of a unit of IWO) giving the resource used by an
+        index, the indexes being added by decreasing benefit per resource used.
+      limits: A tuple (maximum number of possible indexes, maximum IWO) beyond which no index is
+        added.
+
+    Returns:
+      A list of tuples (index, benefit, IWO) where the benefit is the improvement of the goal (in
+      the units of the model) from adding the index after the ones before it.
+    """
+    selection = Selection(problem)
+    sign = 1 if gl.is_maximized() else -1
+
+    def _priority(index, delta):
+        return -sign * delta[gl.get_measure()] / (weights[0] + weights[1] * delta["IWO"])
+
+    heap = []
+    for index in range(selection.get_num_eind(), selection.get_num_indexes()):
+        priority = _priority(index, selection.get_add_delta(index))
+        if priority < 0:
+            heap.append((priority, index))
+    heapq.heapify(heap)
+
+    curve = []
+    iwo = 0
+    while heap and len(curve) < limits[0]:
+        _, index = heapq.heappop(heap)
+        delta = selection.get_add_delta(index)
+        priority = _priority(index, delta)
+        if priority >= 0 or iwo + delta["IWO"] > limits[1]:
+            continue
+        if heap and priority > heap[0][0]:
+            heapq.heappush(heap, (priority, index))
+            continue
+
+        selection.add(index)
+        iwo += delta["IWO"]
+        curve.append((index, sign * delta[gl.get_measure()], delta["IWO"]))
+
+    return curve
+
+
+def get_bound(problem, settings, gl):
+    """Return a bound on the value of a goal, in the units of the model.
+
+    The bound only considers the rule on the number of possible indexes: no selection can do better
+    than the indexes offering the best individual gains, since the gain of an index only decreases
+    as other indexes are added. Nor can it do better than selecting all the indexes.
+    """
+    selection = Selection(problem)
+    values = selection.get_values()
+    measure = gl.get_measure()
+
+    # Minimizing the IWO or the number of indexes: the existing indexes alone are optimal
+    if measure in ("IWO", "Indexes"):
+        return values[measure]
+
+    gains = []
+    for index in range(selection.get_num_eind(), selection.get_num_indexes()):
+        delta = selection.get_add_delta(index)
+        gains.append(delta[measure] if gl.is_maximized() else -delta[measure])
+    gains.sort(reverse=True)
+    gain = sum(gains[:settings["Maximum Number of Possible Indexes"]])
+
+    all_indexes = Selection(problem, [1 for _ in range(selection.get_num_indexes())])
+    if gl.is_maximized():
+        return min(values[measure] + gain, all_indexes.get_values()[measure])
+    return max(values[measure] - gain, all_indexes.get_values()[measure])
+
+
+def solve_goals(problem, settings, time_limit, warm_start=None, values=()):
+    """Optimize the goals in order on a problem with a greedy construction and a local search.
+
+    Args:
+      problem: The problem data (possibly reduced, see presolve.reduce_problem()).
+      settings: The optimizer settings (goals and rule values).
+      time_limit: The time limit in seconds for each goal.
+      warm_start: Solution to start from (only the existing indexes if None).
+      values: The values of the first goals, if they are already optimized (the warm start then
+        being their solution).
+
+    Returns:
+      A list with, for each goal after those already optimized, a dictionary in the form (see decompose.solve_goals()):
+      - Objective Value: The value found for the goal.
+      - Best Bound: A bound on the value of the goal (see get_bound()).
+      - Status: Optimal if the value meets the bound, Feasible otherwise.
+      - Indexes: A 0-1 tuple of the selected indexes once the goal is optimized.
+    """
+    goals = [goal.Goal(gl["Name"], gl.get("Strictness", 1)) for gl in settings["Goals"]]
+    maximum_num_indexes, maximum_iwo = _get_rules(problem, settings)
+    for gl, value in zip(goals, values):
+        gl.update_value(value)
+
+    solution = warm_start
+    steps = []
+    for i, gl in enumerate(goals[len(values):], len(values)):
+        deadline = time.perf_counter() + time_limit
+        step = _Step(gl, goals[:i], maximum_num_indexes, maximum_iwo)
+
+        # The previous solution satisfies the constraints of the previous goals
+        candidates = [Selection(problem, solution)]
+        if gl.get_name() in ("Minimal Cost", "Maximal Coverage"):
+            _add_greedily(candidates[0], step, deadline)
+            if i == 0 and solution is None:
+                # Under a binding IWO rule, the indexes with the best gain per IWO may do better
+                candidates.append(Selection(problem))
+                _add_greedily(candidates[1], step, deadline, per_iwo=True)
+
+        for selection in candidates:
+            _improve_locally(problem["Index Costs"], selection, step, deadline)
+        selection = min(candidates, key=lambda candidate: step.get_key(candidate.get_values()))
+
+        value = selection.get_values()[gl.get_measure()]
+        bound = get_bound(problem, settings, gl)
+        solution = selection.get_solution()
+        gl.update_value(value)
+        steps.append({"Objective Value": value,
+                      "Best Bound": bound,
+                      "Status": "Optimal" if value == bound else "Feasible",
+                      "Indexes": solution})
+
+    return steps
+
+
+def _get_neighborhood(matrix, selection, index, rng):
+    """Return a selected index and up to _LNS_DESTROYED - 1 other selected indexes covering some of
+    the same scans, along with the unselected indexes sharing the most scans with them."""
+    neighbors = set()
+    shared = {}
+    for scan in matrix.get_index_entries(index)[0]:
+        for other in matrix.get_scan_entries(scan)[0]:
+            if other < selection.get_num_eind() or other == index:
+                continue
+            if selection.is_selected(other):
+                neighbors.add(other)
+            else:
+                shared[other] = shared.get(other, 0) + 1
+
+    destroyed = [index] + rng.sample(sorted(neighbors), min(len(neighbors), _LNS_DESTROYED - 1))
+    for other in destroyed[1:]:
+        for scan in matrix.get_index_entries(other)[0]:
+            for candidate in matrix.get_scan_entries(scan)[0]:
+                if candidate >= selection.get_num_eind() and not selection.is_selected(candidate):
+                    shared[candidate] = shared.get(candidate, 0) + 1
+
+    candidates = sorted(shared, key=lambda candidate: -shared[candidate])[:_LNS_CANDIDATES]
+    return destroyed, candidates
+
+
+def _repair(selection, step, candidates, deadline):
+    """Add candidates until the selection satisfies the constraints again, each time the one
+    reducing their violation the most (ties broken by the key of the step).
+
+    Returns:
+      A boolean indicating if the selection satisfies the constraints.
+    """
+    values = selection.get_values()
+    violation = step.get_violation(values)
+    while violation > 0 and time.perf_counter() < deadline:
+        best = None
+        for index in candidates:
+            if selection.is_selected(index):
+                continue
+            new_values = _apply(values, selection.get_add_delta(index))
+            rank = (step.get_violation(new_values), step.get_key(new_values))
+            if rank[0] < violation and (best is None or rank < best[0]):
+                best = (rank, index, new_values)
+        if best is None:
+            return False
+        selection.add(best[1])
+        violation, values = best[0][0], best[2]
+
+    return violation == 0
+
+
+def polish(problem, settings, goals, solution, time_limit, seed=0):
+    """Improve the solution of a goal (e.g., found by the solver within its time limit) with a local
+    search and a large neighborhood search.
+
+    Each move of the large neighborhood search drops a few selected indexes covering common scans,
+    repairs the constraints of the previous goals with indexes covering the same scans, then adds,
+    drops and swaps indexes until no move improves the selection (see _improve_locally()). A move
+    is kept only if it improves the selection.
+
+    Args:
+      problem: The problem data (possibly reduced, see presolve.reduce_problem()).
+      settings: The optimizer settings (rule values).
+      goals: The goals up to the one improved (Goal objects), the previous ones being optimized.
+      solution: A 0-1 sequence of the selected indexes, satisfying the rules and the constraints of
+        the previous goals.
+      time_limit: The time limit in seconds.
+      seed: The seed of the random choices of the moves.
+
+    Returns:
+      A tuple (solution, value) with the best selection found as a 0-1 tuple, and its value for
+      the goal (in the units of the model).
+    """
+    deadline = time.perf_counter() + time_limit
+    matrix = problem["Index Costs"]
+    gl = goals[-1]
+    step = _Step(gl, goals[:-1], *_get_rules(problem, settings))
+
+    selection = Selection(problem, solution)
+    if not step.is_feasible(selection.get_values()):
+        return tuple(solution), selection.get_values()[gl.get_measure()]
+
+    _improve_locally(matrix, selection, step, deadline)
+    best_solution = selection.get_solution()
+    best_values = selection.get_values()
+
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        selected = [index for index in range(selection.get_num_eind(), selection.get_num_indexes())
+                    if selection.is_selected(index)]
+        if not selected:
+            break
+
+        destroyed, candidates = _get_neighborhood(matrix, selection, rng.choice(selected), rng)
+        for index in destroyed:
+            selection.drop(index)
+        if _repair(selection, step, candidates, deadline):
+            _add_greedily(selection, step, deadline)
+            _improve_locally(matrix, selection, step, deadline)
+
+        values = selection.get_values()
+        if step.is_feasible(values) and step.get_key(values) < step.get_key(best_values):
+            best_solution, best_values = selection.get_solution(), values
+        else:
+            selection = Selection(problem, best_solution)
+
+    return best_solution, best_values[gl.get_measure()]
+
+
+def polish_results(problem, settings, goals, results, time_limit, seed=0):
+    """Return the results of the solver for the last of the goals (see modelize.solve_model()), its
+    solution being improved by polish() if possible."""
+    solution, value = polish(problem, settings, goals, results["Indexes"], time_limit, seed)
+    if solution == tuple(results["Indexes"]):
+        return results
+
+    return dict(results,
+                **{"Objective Value": value,
+                   "Indexes": solution,
+                   "Status": "Optimal" if value == results["Best Bound"] else "Feasible"})
@@ -0,0 +1,112 @@
+"""Stream the arrays of a large JSON object without loading the whole document."""
+
+
+import json
+import re
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DELIMITER = re.compile(r"[,\]}]")
+
+
+class _Buffer:
+    """Text read from a file, consumed from left to right and refilled on demand."""
+
+    def __init__(self, file, chunk_size):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._text = ""
+        self._pos = 0
+        self._eof = False
+
+    def _refill(self):
+        """Read more text, return False if the end of the file is reached."""
+        if self._eof:
+            return False
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._text = self._text[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _error(self, message):
+        """Return a decoding error at the current position."""
+        return json.JSONDecodeError(message, self._text, self._pos)
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it ("" at the end)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._text, self._pos).end()
+            if self._pos < len(self._text):
+                return self._text[self._pos]
+            if not self._refill():
+                return ""
+
+    def expect(self, characters):
+        """Consume and return the next non-whitespace character, which must be in `characters`."""
+        character = self.peek()
+        if not character or character not in characters:
+            raise self._error(f"Expecting one of {characters!r}")
+        self._pos += 1
+        return character
+
+    def decode(self, decoder):
+        """Consume and return the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self._text, self._pos)
+            except json.JSONDecodeError:
+                if self._refill():
+                    continue
+                raise
+
+            # A value must be followed by a delimiter, otherwise it may continue in the next chunk
+            # (e.g., "2." being the beginning of "2.5")
+            if not _DELIMITER.search(self._text, end) and self._refill():
+                continue
+
+            self._pos = end
+            return value
+
+
+def iter_arrays(file, chunk_size=1 << 16):
+    """Yield the elements of the arrays found at the top level of a JSON object, in file order.
+
+    Only one element is held in memory at a time. Top-level values that are not arrays are skipped.
+
+    Args:
+      file: A text file object containing a JSON object.
+      chunk_size: Number of characters read at a time.
+
+    Yields:
+      Tuples (key, element), where key is the key of the array containing the element.
+    """
+    decoder = json.JSONDecoder()
+    buffer = _Buffer(file, chunk_size)
+
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        buffer.expect("}")
+        return
+
+    while True:
+        key = buffer.decode(decoder)
+        buffer.expect(":")
+
+        if buffer.peek() == "[":
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                buffer.expect("]")
+            else:
+                while True:
+                    yield key, buffer.decode(decoder)
+                    if buffer.expect(",]") == "]":
+                        break
+        else:
+            buffer.decode(decoder)
+
+        if buffer.expect(",}") == "}":
+            return
@@ -1,9 +1,12 @@
 "Main program."
 
 
+import cache
 import cli
+import diagnostics
 import reader
 import utils
+import os
 import sys
 
 
@@ -13,12 +16,12 @@ if __name__ == "__main__":
     use_stdin_for_data = False
     use_stdin_for_settings = False
 
+    # The data file is streamed by the Reader rather than read at once
     data_json = None
     if cli_args["Data JSON"] == "-":
         use_stdin_for_data = True
     else:
-        with open(cli_args["Data JSON"], "r", encoding="utf-8") as f:
-            data_json = f.read()
+        data_json = open(cli_args["Data JSON"], "r", encoding="utf-8")
 
     settings_json = None
     if cli_args["Settings JSON"] is not None:
@@ -29,12 +32,19 @@ if __name__ == "__main__":
                 settings_json = f.read()
 
     if use_stdin_for_data and use_stdin_for_settings:
-        data_json, settings_json = sys.stdin.read().split("\n", 2)
+        # The data and the settings are each serialized on a single line
+        data_json = sys.stdin.readline()
+        settings_json = sys.stdin.read()
     elif use_stdin_for_data:
-        data_json = sys.stdin.read()
+        data_json = sys.stdin
     elif use_stdin_for_settings:
         settings_json = sys.stdin.read()
 
+    warm_start_json = None
+    if cli_args["Warm Start"] is not None:
+        with open(cli_args["Warm Start"], "r", encoding="utf-8") as f:
+            warm_start_json = f.read()
+
     time_limit = cli_args["Time Limit"]
 
     verbose = cli_args["Verbose"]
@@ -43,10 +53,52 @@ if __name__ == "__main__":
     if verbose:
         log_level = 2
 
+    problem_cache = None
+    if cli_args["Cache Directory"] is not None:
+        problem_cache = cache.ProblemCache(cli_args["Cache Directory"],
+                                           round(cli_args["Cache Size"] * 1024 * 1024))
+
+    goal_memo = None
+    if cli_args["Cache Directory"] is not None and cli_args["Memo"]:
+        goal_memo = cache.GoalMemo(os.path.join(cli_args["Cache Directory"], "goals"),
+                                   round(cli_args["Memo Size"] * 1024 * 1024))
+
+    events_file = None
+    on_event = None
+    if cli_args["Events"] is not None:
+        if cli_args["Events"] == "-":
+            events_file = sys.stderr
+        else:
+            events_file = open(cli_args["Events"], "w", encoding="utf-8")
+        on_event = utils.write_events(events_file)
+
+    run_diagnostics = None
+    if cli_args["Diagnostics"]:
+        # The records of the diagnostics are written along with the events
+        run_diagnostics = diagnostics.Diagnostics(on_event)
+
     results = utils.run(data_json,
                         time_limit,
                         settings_json,
                         print_input_data=verbose,
-                        log_level=log_level)
+                        log_level=log_level,
+                        incremental=not cli_args["Rebuild"],
+                        use_presolve=cli_args["Presolve"],
+                        jobs=cli_args["Jobs"],
+                        cache=problem_cache,
+                        solver_parameters=cli_args["Solver Parameters"],
+                        on_event=on_event,
+                        time_budget=cli_args["Time Budget"],
+                        engine=cli_args["Engine"],
+                        warm_start_json=warm_start_json,
+                        diagnostics=run_diagnostics,
+                        formulation=cli_args["Formulation"],
+                        polish=cli_args["Polish"],
+                        memo=goal_memo)
+
+    if data_json is not sys.stdin and not isinstance(data_json, str):
+        data_json.close()
+    if events_file is not None and events_file is not sys.stderr:
+        events_file.close()
 
     print(results)
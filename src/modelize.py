@@ -2,15 +2,28 @@
 
 
 import math
+import os
+import threading
+import time
 from ortools.sat.python import cp_model
 
 
+# Formulations of the cost and coverage of the scans:
+# - Minimum: scan_cost[j] is the minimum over the covering indexes i of the cost of i if x[i], or the
+#   sequential cost otherwise, and is_covered[j] is reified from the sum of their x[i].
+# - Assignment: each scan is assigned to at most one selected covering index (y[i][j] <= x[i]),
+#   scan_cost[j] being linear in the assignments, and is_covered[j] a BoolOr of the x[i]. It has
+#   more variables, but a tighter relaxation, which helps proving the optimality of cost goals.
+FORMULATIONS = ("Minimum", "Assignment")
+
+
 def build_basic_model(problem, settings):
     """Build the basic model, without any special constraints or objectives, using the Reader data.
 
     Args:
       problem: The problem data.
-      settings: The optimizer settings.
+      settings: The optimizer settings (its "Formulation", one of FORMULATIONS, being Minimum if
+        missing).
 
     Returns:
       A clean model.
@@ -23,17 +36,24 @@ def build_basic_model(problem, settings):
     # Scans
     model.cost_read = problem["Sequential Scan Costs"]
     model.num_scans = len(model.cost_read)
+    model.always_covered = problem.get("Always Covered Scans",
+                                       [False for _ in range(model.num_scans)])
 
     # Indexes
-    model.cost_indexes_b = problem["Index Costs (B)"]
-    model.cost_indexes_r = problem["Index Costs (R)"]
+    model.costs = problem["Index Costs"]
     model.index_iwo = problem["Index IWOs"]
     model.num_indexes = len(model.index_iwo)
+    model.num_existing_indexes = problem["Number of Existing Indexes"]
+
+    # Constant values of the goals that are not part of the model (see presolve.reduce_problem())
+    model.offsets = problem.get("Offsets", {"Cost": 0, "Coverage": 0, "IWO": 0, "Indexes": 0})
 
     # Misc.
+    model.formulation = settings.get("Formulation", "Minimum")
+    assert model.formulation in FORMULATIONS, f"Unknown formulation: {model.formulation}"
     model.max_num_indexes = settings["Maximum Number of Possible Indexes"] + \
         problem["Number of Existing Indexes"]  # Since einds are fixed, they must be included here
-    model.max_iwo = settings["Maximum IWO"]
+    model.max_iwo = settings["Maximum IWO"] - model.offsets["IWO"]
 
     ### Objective
 
@@ -58,68 +78,464 @@ def build_basic_model(problem, settings):
     model.scan_cost = [model.NewIntVar(0, model.cost_read[j], f"scan_cost_{j}")
                        for j in range(model.num_scans)]
 
+    # With the Assignment formulation, assignment[j] holds the indexes covering scan j, their
+    # costs, and the variables assigning the scan to them
+    model.assignment = [None for _ in range(model.num_scans)]
+
     ### Constraints
 
-    for j in range(model.num_scans):
-        # is_covered
-        model.Add(cp_model.LinearExpr.Sum([model.x[i] * model.cost_indexes_b[i][j]
-                                           for i in range(model.num_indexes)])
-                  >= 1).OnlyEnforceIf(model.is_covered[j])
-        model.Add(cp_model.LinearExpr.Sum([model.x[i] * model.cost_indexes_b[i][j]
-                                           for i in range(model.num_indexes)])
-                  < 1).OnlyEnforceIf(model.is_covered[j].Not())
-
-    # scan_cost
-    for j in range(model.num_scans):
-        # Lowest cost offered by an index (or the sequential cost if there is no index coverage)
-        model.AddMinEquality(model.scan_cost[j],
-                             [model.cost_indexes_r[i][j] * model.x[i] +
-                              (1 - model.x[i]) * model.cost_read[j]
-                              for i in range(model.num_indexes)])
+    # Positions of the constraints of each scan, so that they can be replaced (see set_scan())
+    model.scan_constraints = [_add_scan_constraints(model, j, *model.costs.get_scan_entries(j))
+                              for j in range(model.num_scans)]
 
     ### Hard constraints (optimizer settings)
 
+    model.rule_constraints = _add_rule_constraints(model)
+
+    # Number of constraints removed from the model (see _clear_constraints())
+    model.num_cleared = 0
+
+    return model
+
+
+def _add_scan_constraints(model, j, covering, covering_costs):
+    """Add the constraints defining is_covered[j] and scan_cost[j], given the indexes covering
+    scan j and their costs, and return the positions of the constraints."""
+    constraints = []
+
+    # Only the indexes covering a scan take part in its constraints: any other index would only
+    # offer the sequential cost, which is already the upper bound of scan_cost
+    if len(covering) == 0:
+        constraints.append(model.Add(model.is_covered[j] == int(model.always_covered[j])))
+        constraints.append(model.Add(model.scan_cost[j] == model.cost_read[j]))
+        return [constraint.Index() for constraint in constraints]
+
+    if model.formulation == "Assignment":
+        _add_assignment_constraints(model, j, covering, covering_costs, constraints)
+        return [constraint.Index() for constraint in constraints]
+
+    # is_covered
+    if model.always_covered[j]:
+        constraints.append(model.Add(model.is_covered[j] == 1))
+    else:
+        constraints.append(model.Add(cp_model.LinearExpr.Sum([model.x[i] for i in covering]) >= 1))
+        constraints[-1].OnlyEnforceIf(model.is_covered[j])
+        constraints.append(model.Add(cp_model.LinearExpr.Sum([model.x[i] for i in covering]) < 1))
+        constraints[-1].OnlyEnforceIf(model.is_covered[j].Not())
+
+    # scan_cost: lowest cost offered by an index (or the sequential cost if there is no index
+    # coverage)
+    constraints.append(model.AddMinEquality(model.scan_cost[j],
+                                            [cost * model.x[i] + (1 - model.x[i]) * model.cost_read[j]
+                                             for i, cost in zip(covering, covering_costs)]))
+
+    return [constraint.Index() for constraint in constraints]
+
+
+def _add_assignment_constraints(model, j, covering, covering_costs, constraints):
+    """Add the constraints of the Assignment formulation defining is_covered[j] and scan_cost[j]
+    (see FORMULATIONS) to a list of constraints."""
+    # is_covered: any selected covering index covers the scan
+    if model.always_covered[j]:
+        constraints.append(model.Add(model.is_covered[j] == 1))
+    else:
+        constraints.append(model.AddBoolOr([model.x[i] for i in covering]))
+        constraints[-1].OnlyEnforceIf(model.is_covered[j])
+        for i in covering:
+            constraints.append(model.AddImplication(model.x[i], model.is_covered[j]))
+
+    # scan_cost: the sequential cost, minus the saving of the index the scan is assigned to (if
+    # any). Minimizing the cost assigns the scan to its best selected index
+    y = [model.NewBoolVar(f"y_{i}_{j}") for i in covering]
+    model.assignment[j] = (covering, covering_costs, y)
+    constraints.append(model.AddAtMostOne(y))
+    for i, y_i in zip(covering, y):
+        constraints.append(model.AddImplication(y_i, model.x[i]))
+    constraints.append(model.Add(model.scan_cost[j] ==
+                                 model.cost_read[j] -
+                                 cp_model.LinearExpr.WeightedSum(y, [model.cost_read[j] - cost
+                                                                     for cost in covering_costs])))
+
+
+def _add_rule_constraints(model):
+    """Add the constraints of the rules, and return their positions."""
     # Maximum Number of Possible Indexes
-    model.Add(sum(model.x) <= model.max_num_indexes)
+    num_indexes = model.Add(cp_model.LinearExpr.Sum(model.x) <= model.max_num_indexes)
 
     # Maximum IWO
-    model.Add(cp_model.LinearExpr.WeightedSum(model.x, model.index_iwo)
-              <= model.max_iwo)
+    iwo = model.Add(cp_model.LinearExpr.WeightedSum(model.x, model.index_iwo)
+                    <= model.max_iwo)
+
+    return [num_indexes.Index(), iwo.Index()]
+
+
+def _clear_constraints(model, constraints):
+    """Remove constraints (their positions) from the model, leaving empty constraints in their
+    place so that the positions of the others do not change."""
+    proto = model.Proto()
+    for position in constraints:
+        constraint = proto.constraints[position]
+        if hasattr(constraint, "Clear"):
+            constraint.Clear()
+        else:
+            constraint.copy_from(type(constraint)())
+    model.num_cleared += len(constraints)
+
+
+def get_num_constraints(model):
+    """Return the number of constraints of the model (including the removed ones)."""
+    return len(model.Proto().constraints)
+
+
+def remove_constraints(model, constraints):
+    """Remove constraints (their positions, see get_num_constraints()) from the model, e.g., those
+    of the goals."""
+    _clear_constraints(model, constraints)
+
+
+def solve_goal(model, gl, time_limit, warm_start=None, parameters=None):
+    """Optimize a goal on the model, then remove the definition of its objective.
+
+    The objective variable is reused by each goal rather than replaced (see reset_objective()), so
+    that a model solved many times (e.g., by a session or a sweep) does not keep growing.
+
+    Args:
+      model: The model returned by build_basic_model(), possibly augmented.
+      gl: The goal.Goal to optimize.
+      time_limit: The time limit in seconds.
+      warm_start: Solution to warm start from.
+      parameters: Dictionary of solver parameters (see solve_model()).
+
+    Returns:
+      The results of solve_model().
+    """
+    start = get_num_constraints(model)
+    model.ClearObjective()
+    gl.add_as_objective(model)
+
+    results = solve_model(model, time_limit, warm_start, parameters)
+
+    _clear_constraints(model, range(start, get_num_constraints(model)))
+    return results
+
+
+def add_goal_constraint(model, gl):
+    """Add an optimized goal as a constraint to the model, and return the positions of the
+    constraints added (see remove_constraints())."""
+    start = get_num_constraints(model)
+    gl.add_as_constraint(model)
+    return range(start, get_num_constraints(model))
+
+
+def set_scan(model, j, read_cost, covering, covering_costs):
+    """Replace the variables and constraints of scan j after its costs changed, or add scan j if
+    it is the next position.
+
+    Args:
+      model: The model returned by build_basic_model().
+      j: The position of the scan.
+      read_cost: The sequential cost of the scan.
+      covering: The indexes covering the scan.
+      covering_costs: The costs they offer to the scan.
+    """
+    if j == model.num_scans:
+        model.cost_read.append(read_cost)
+        model.always_covered.append(False)
+        model.is_covered.append(None)
+        model.scan_cost.append(None)
+        model.assignment.append(None)
+        model.scan_constraints.append([])
+        model.num_scans += 1
+    else:
+        _clear_constraints(model, model.scan_constraints[j])
+        model.cost_read[j] = read_cost
+
+    # The variables are replaced too, as the domain of scan_cost depends on the sequential cost
+    model.is_covered[j] = model.NewBoolVar(f"is_covered_{j}")
+    model.scan_cost[j] = model.NewIntVar(0, read_cost, f"scan_cost_{j}")
+    model.assignment[j] = None
+    model.scan_constraints[j] = _add_scan_constraints(model, j, covering, covering_costs)
+
+
+def add_index(model):
+    """Add a possible index to the model, and return its position.
+
+    The scans it covers are set with set_scan(), and its IWO with set_rules().
+    """
+    model.x.append(model.NewBoolVar(f"x_{model.num_indexes}"))
+    model.index_iwo.append(0)
+    model.num_indexes += 1
+    return model.num_indexes - 1
 
-    return model
 
+def remove_index(model, i):
+    """Prevent index i from being selected."""
+    model.Add(model.x[i] == 0)
 
-def solve_model(model, time_limit, warm_start=None):
+
+def set_rules(model, max_num_indexes, max_iwo, index_iwo):
+    """Replace the constraints of the rules, after a rule, an IWO or the indexes changed.
+
+    Args:
+      model: The model returned by build_basic_model().
+      max_num_indexes: The maximum number of possible indexes.
+      max_iwo: The maximum IWO.
+      index_iwo: The IWO of each index.
+    """
+    _clear_constraints(model, model.rule_constraints)
+    model.max_num_indexes = max_num_indexes + model.num_existing_indexes
+    model.max_iwo = max_iwo - model.offsets["IWO"]
+    model.index_iwo = list(index_iwo)
+    model.rule_constraints = _add_rule_constraints(model)
+
+
+def reset_objective(model):
+    """Replace the objective variable of the model, so that a new goal can be optimized.
+
+    The previous objective variable stays linked to its goal as long as the constraints defining
+    it are in the model, along with any bound put on it (see Goal.add_as_objective()): they must
+    be removed (see remove_constraints()) for the goal to be only constrained by its strictness.
+    """
+    model.objective = model.NewIntVar(-model.infinity, model.infinity, 'objective')
+    model.ClearObjective()
+
+
+def _has_constraint(constraint, kind):
+    """Return a boolean indicating if a constraint proto is of the given kind (e.g., "linear")."""
+    if hasattr(constraint, "HasField"):
+        return constraint.HasField(kind)
+    return getattr(constraint, f"has_{kind}")()
+
+
+def get_model_size(model):
+    """Return the size of the model.
+
+    Returns:
+      A dictionary of the model size, in the form:
+      - Variables: The number of variables.
+      - Constraints: The number of constraints.
+      - Terms: The number of variable occurrences in the constraints (including enforcement
+        literals).
+    """
+    proto = model.Proto()
+
+    terms = 0
+    for constraint in proto.constraints:
+        terms += len(constraint.enforcement_literal)
+        if _has_constraint(constraint, "linear"):
+            terms += len(constraint.linear.vars)
+        elif _has_constraint(constraint, "lin_max"):
+            terms += len(constraint.lin_max.target.vars)
+            terms += sum(len(expression.vars) for expression in constraint.lin_max.exprs)
+        elif _has_constraint(constraint, "bool_or"):
+            terms += len(constraint.bool_or.literals)
+        elif _has_constraint(constraint, "bool_and"):
+            terms += len(constraint.bool_and.literals)
+        elif _has_constraint(constraint, "at_most_one"):
+            terms += len(constraint.at_most_one.literals)
+        elif _has_constraint(constraint, "exactly_one"):
+            terms += len(constraint.exactly_one.literals)
+
+    return {"Variables": len(proto.variables),
+            "Constraints": len(proto.constraints),
+            "Terms": terms}
+
+
+def get_num_cpus():
+    """Return the number of CPUs this process may run on (its CPU affinity, where the system
+    supports it), the default number of solver workers and of processes."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count()
+
+
+def _set_solver_parameters(solver, parameters):
+    """Set the parameters of a CP-SAT solver from solver parameters (see solve_model())."""
+    solver.parameters.random_seed = parameters.get("Seed", 0)
+    solver.parameters.num_search_workers = parameters.get("Workers", 16)
+
+    if "Relative Gap" in parameters:
+        solver.parameters.relative_gap_limit = parameters["Relative Gap"]
+    if "Absolute Gap" in parameters:
+        solver.parameters.absolute_gap_limit = parameters["Absolute Gap"]
+
+    if "Presolve Level" in parameters:
+        solver.parameters.cp_model_presolve = parameters["Presolve Level"] > 0
+        if parameters["Presolve Level"] > 0:
+            solver.parameters.cp_model_probing_level = parameters["Presolve Level"] - 1
+
+    if "Linearization Level" in parameters:
+        solver.parameters.linearization_level = parameters["Linearization Level"]
+
+
+class _SolutionCallback(cp_model.CpSolverSolutionCallback):
+    """Report the improving solutions found by the solver."""
+
+    def __init__(self, on_solution):
+        super().__init__()
+        self._on_solution = on_solution
+
+    def on_solution_callback(self):
+        """Called by the solver on each improving solution."""
+        self._on_solution({"Objective Value": round(self.ObjectiveValue()),
+                           "Best Bound": self.BestObjectiveBound(),
+                           "Time": self.WallTime()})
+
+
+def _solve_interruptibly(solver, model, on_solution, interrupt, stall_time):
+    """Solve the model in a separate thread, stopping the search as soon as `interrupt` is set, or
+    once no better solution has been found for `stall_time` seconds (if not None).
+
+    Returns:
+      A tuple (status of the solver, boolean indicating if the search was stopped by a stall).
+
+    Waiting in the calling thread rather than in the solver lets the signal handlers of the main
+    thread run (e.g., to set `interrupt` on SIGINT).
+    """
+    last_solution_time = [None]
+
+    def _on_solution(solution):
+        last_solution_time[0] = time.perf_counter()
+        if on_solution is not None:
+            on_solution(solution)
+
+    statuses = []
+    callback = _SolutionCallback(_on_solution)
+    thread = threading.Thread(target=lambda: statuses.append(solver.Solve(model, callback)))
+    thread.start()
+    stalled = False
+    while thread.is_alive():
+        thread.join(0.1)
+        stalled = stall_time is not None and last_solution_time[0] is not None \
+            and time.perf_counter() - last_solution_time[0] > stall_time
+        if interrupt.is_set() or stalled:
+            solver.StopSearch()
+            break
+    thread.join()
+    return statuses[0], stalled
+
+
+def _add_assignment_hints(model, solution):
+    """With the Assignment formulation, hint the assignment of each scan to its best selected
+    index in a solution."""
+    if model.formulation != "Assignment":
+        return
+
+    for j in range(model.num_scans):
+        if model.assignment[j] is None:
+            continue
+        covering, covering_costs, y = model.assignment[j]
+        best = None
+        for k, (i, cost) in enumerate(zip(covering, covering_costs)):
+            if solution[i] and (best is None or cost < covering_costs[best]):
+                best = k
+        for k, y_k in enumerate(y):
+            model.AddHint(y_k, int(k == best))
+
+
+def _evaluate_solution(model, solution):
+    """Return the objective value of a solution of the model, found by fixing its x variables."""
+    model.ClearHints()
+    for i in range(model.num_indexes):
+        model.AddHint(model.x[i], solution[i])
+
+    solver = cp_model.CpSolver()
+    solver.parameters.fix_variables_to_their_hinted_value = True
+    solver.parameters.num_search_workers = 1
+    status = solver.Solve(model)
+    assert solver.StatusName(status).capitalize() in ("Feasible", "Optimal")
+
+    return round(solver.ObjectiveValue())
+
+
+def solve_model(model,
+                time_limit,
+                warm_start=None,
+                parameters=None,
+                on_solution=None,
+                interrupt=None,
+                stall_time=None):
     """Solve the model and return the results.
 
+    When the solver is stopped (by the time limit or by `interrupt`) before finding a solution, the
+    warm start (or the solution selecting only the existing indexes, if there is no warm start) is
+    returned instead, so that a solution is always known.
+
     Args:
       model: The model returned by build_basic_model(), possibly augmented.
       time_limit: The time limit in seconds.
       warm_start: Solution to warm start from.
+      parameters: Dictionary of solver parameters, the solver defaults being used for the missing
+        ones:
+        - Workers: Number of parallel search workers (16 if missing).
+        - Seed: Random seed (0 if missing).
+        - Relative Gap: Stop once the objective is proven within this ratio of the optimum.
+        - Absolute Gap: Stop once the objective is proven within this value of the optimum (in the
+          units of the model).
+        - Presolve Level: 0 disables the presolve of the solver, 1 to 3 enable it with an
+          increasing amount of probing (3 being the solver default).
+        - Linearization Level: 0 to 2, how much of the model is linearized for the relaxation.
+      on_solution: Function called with a dictionary (Objective Value, Best Bound, Time) on each
+        improving solution, from a thread of the solver.
+      interrupt: threading.Event stopping the search once set, the best solution found so far
+        being returned.
+      stall_time: Stop the search once no better solution has been found for this many seconds
+        (no such limit if None).
 
     Returns:
       A dictionary of the results, in the form:
       - Indexes: A 0-1 array of resulting values for x.
-      - Status: The solver status (one of Optimal, Feasible).
-      - Objective Value: The objective value found by the solver.
+      - Status: The solver status (one of Optimal, Feasible, Unknown if no solution was found).
+      - Objective Value: The objective value of the solution.
+      - Best Bound: The best bound on the objective value proven by the solver.
       - Time: The wall time in seconds.
+      - Branches: The number of branches explored by the solver.
+      - Conflicts: The number of conflicts met by the solver.
+      - Stalled: A boolean indicating if the search was stopped by `stall_time`.
     """
+    model.ClearHints()
     if warm_start is not None:
         for i in range(model.num_indexes):
             model.AddHint(model.x[i], warm_start[i])
+        _add_assignment_hints(model, warm_start)
 
     solver = cp_model.CpSolver()
-    solver.parameters.random_seed = 0
-    solver.parameters.num_search_workers = 16
+    _set_solver_parameters(solver, parameters or {})
     solver.parameters.max_time_in_seconds = time_limit
-    status = solver.Solve(model)
+
+    stalled = False
+    if interrupt is None and stall_time is None:
+        callback = None if on_solution is None else _SolutionCallback(on_solution)
+        status = solver.Solve(model, callback)
+    else:
+        # SIGINT is left to the caller, which can set `interrupt` instead
+        solver.parameters.catch_sigint_signal = interrupt is None
+        status, stalled = _solve_interruptibly(solver,
+                                               model,
+                                               on_solution,
+                                               interrupt or threading.Event(),
+                                               stall_time)
+
     status_name = solver.StatusName(status).capitalize()
-    assert status_name in ("Feasible", "Optimal")
-    objective_value = round(solver.ObjectiveValue())  # round() prevents some numerical issues
+    assert status_name in ("Feasible", "Optimal", "Unknown")
     wall_time = solver.WallTime()
-    x_vars = [solver.Value(model.x[i]) for i in range(model.num_indexes)]
+    best_bound = solver.BestObjectiveBound()
+
+    if status_name == "Unknown":
+        x_vars = warm_start
+        if x_vars is None:
+            x_vars = [int(i < model.num_existing_indexes) for i in range(model.num_indexes)]
+        x_vars = list(x_vars)
+        objective_value = _evaluate_solution(model, x_vars)
+    else:
+        objective_value = round(solver.ObjectiveValue())  # round() prevents some numerical issues
+        x_vars = [solver.Value(model.x[i]) for i in range(model.num_indexes)]
 
     return {"Indexes": x_vars,
             "Status": status_name,
             "Objective Value": objective_value,
-            "Time": wall_time}
+            "Best Bound": best_bound,
+            "Time": wall_time,
+            "Branches": solver.NumBranches(),
+            "Conflicts": solver.NumConflicts(),
+            "Stalled": stalled}
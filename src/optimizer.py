@@ -1,24 +1,259 @@
 """Index selection optimizer."""
 
 
+import contextlib
+import signal
+import threading
+import time
+
+import decompose
 import goal
+import heuristic
 import modelize
+import presolve
 import stats
 
 
+# With a time budget: share of the budget kept for the work after the last goal (e.g., writing the
+# results), minimum share of the budget kept for each goal that follows the current one, and share
+# of the time limit of a goal after which the search stops if the solution does not improve
+_BUDGET_MARGIN = 0.05
+_MINIMUM_GOAL_SHARE = 0.1
+_STALL_SHARE = 0.5
+_MINIMUM_STALL_TIME = 1.0
+
+# With the hybrid engine: share of the time limit of the first goal given to the heuristic
+_HYBRID_SHARE = 0.1
+
+# With groups: share of the time limit of the first goal given to the local search moving the
+# budgets of the rules between the groups
+_DIVISION_SHARE = 0.1
+
+
 class Optimizer:
     """Index selection optimizer."""
 
-    def __init__(self, rdr, log_level):
+    def __init__(self,
+                 rdr,
+                 log_level,
+                 incremental=True,
+                 use_presolve=True,
+                 jobs=None,
+                 on_event=None,
+                 time_budget=None,
+                 engine="exact",
+                 warm_start=None,
+                 diagnostics=None,
+                 polish=False,
+                 memo=None):
         """Initialize the optimizer.
 
         Args:
           rdr: Previously-initialized Reader object.
           log_level = Integer indicating printing level (0 = silent, 1 = normal, 2 = verbose).
+          incremental: If the model should be built once and reused by all the goals (otherwise, a
+            new model is built for each goal).
+          use_presolve: If the problem should be reduced before being modeled (also needed to split
+            it into independent sub-problems).
+          jobs: Number of processes solving independent sub-problems (the number of CPUs if None).
+          on_event: Function called with a dictionary for each event of the solving process (see
+            _emit()), possibly from a thread of the solver.
+          time_budget: Wall time in seconds for the whole solving process (None if only the time
+            limit of each goal applies). The time is divided between the goals as they are
+            optimized: a goal stopping early leaves its time to the next ones.
+          engine: How the goals are optimized: "exact" (CP-SAT model), "heuristic" (greedy
+            construction and local search, see heuristic.solve_goals(), for problems too large to
+            be modeled in time) or "hybrid" (the heuristic solution of the first goal warm starts
+            the exact optimization).
+          warm_start: A 0-1 sequence of the indexes the first goal starts from (e.g., the selection
+            of a previous run, see Reader.read_warm_start()). It is ignored if it breaks the rules.
+          diagnostics: Diagnostics object recording the phases, the models and the statistics of
+            each goal of the solving process (nothing recorded if None).
+          polish: If the solutions of the solver that are not proven optimal should be improved by
+            a local search (see heuristic.polish()), which gets a share of the time limit of each
+            goal.
+          memo: GoalMemo storing the goals optimized on the problem (see cache.py), so that the
+            goals already optimized by a previous run with the same first goals are not optimized
+            again (no memo if None, or if the Reader has no key for the problem).
         """
+        assert engine in ("exact", "heuristic", "hybrid"), f"Unknown engine: {engine}"
         self._reader = rdr
         self._log_level = log_level
-        self._solve()
+        self._incremental = incremental
+        self._use_presolve = use_presolve
+        self._jobs = modelize.get_num_cpus() if jobs is None else jobs
+        self._on_event = on_event
+        self._time_budget = time_budget
+        self._engine = engine
+        self._warm_start = warm_start
+        self._diagnostics = diagnostics
+        self._polish = polish
+        self._memo = memo
+        self._memo_keys = []  # Key of each goal in the memo (none if there is no memo)
+
+        # Set on SIGINT or SIGTERM: the current goal keeps its best solution, the next ones are
+        # skipped
+        self._interrupt = threading.Event()
+
+        self._start = time.perf_counter()
+        previous_handlers = self._catch_signals()
+        try:
+            self._solve()
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+
+    def _catch_signals(self):
+        """Interrupt the solving process on SIGINT and SIGTERM, return the previous handlers."""
+        # Signal handlers can only be set from the main thread
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+
+        previous_handlers = {}
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous_handlers[signum] = signal.signal(signum, lambda *_: self._interrupt.set())
+        return previous_handlers
+
+    def _get_time_limit(self, goal, num_goals):
+        """Return the time limit of a goal (its position), within the time budget if there is one.
+
+        The goal gets whatever remains of the budget, except for a minimum share kept for each of
+        the next goals, or its fair share of the remaining time if that is more.
+        """
+        time_limit = self._reader.get_time_limit()
+        if self._time_budget is None:
+            return time_limit
+
+        remaining = self._get_remaining_time()
+        num_next_goals = num_goals - goal - 1
+        allocated = max(remaining / (num_next_goals + 1),
+                        remaining - num_next_goals * _MINIMUM_GOAL_SHARE * self._time_budget)
+
+        return max(0.0, min(time_limit, allocated))
+
+    def _get_shared_time_limit(self, num_goals, num_solves=1):
+        """Return the time limit of each of `num_goals` goals optimized at once (e.g., all the goals
+        of each sub-problem), within the time budget if there is one.
+
+        What remains of the budget is divided evenly between the goals, and between the
+        `num_solves` successive solves of them.
+        """
+        time_limit = self._reader.get_time_limit()
+        if self._time_budget is None:
+            return time_limit
+
+        return max(0.0, min(time_limit, self._get_remaining_time() / (num_goals * num_solves)))
+
+    def _get_remaining_time(self):
+        """Return the time remaining in the time budget (less its safety margin)."""
+        return self._time_budget * (1 - _BUDGET_MARGIN) - (time.perf_counter() - self._start)
+
+    def _get_stall_time(self, time_limit):
+        """Return the time without improvement after which the search of a goal stops."""
+        if self._time_budget is None:
+            return None
+        return max(_MINIMUM_STALL_TIME, _STALL_SHARE * time_limit)
+
+    def _emit(self, event, step, goal_name, objective_value, best_bound, **details):
+        """Report an event of the solving process, if a function was provided for that.
+
+        The event is a dictionary in the form:
+        - Event: The kind of event ("Solution" for each improving solution of a goal, "Goal" once a
+          goal is optimized).
+        - Step: The position of the goal (starting from 1).
+        - Goal: The name of the goal.
+        - Objective Value: The value of the best solution found.
+        - Best Bound: The best bound proven on the value of the goal.
+        - Gap: The relative difference between the value and the bound.
+        - Time: The wall time in seconds since the beginning of the solving process.
+        as well as the details (e.g., the Status of the solver for "Goal" events, and Memoized if
+        the goal was optimized by a previous run, see _load_memoized()).
+        """
+        if self._on_event is None:
+            return
+
+        event = {"Event": event,
+                 "Step": step,
+                 "Goal": goal_name,
+                 "Objective Value": stats.to_real_objective(self._reader,
+                                                            goal_name,
+                                                            objective_value),
+                 "Best Bound": stats.to_real_objective(self._reader, goal_name, best_bound),
+                 "Gap": abs(objective_value - best_bound) / max(1, abs(objective_value)),
+                 "Time": time.perf_counter() - self._start}
+        event.update(details)
+        self._on_event(event)
+
+    def _measure(self, phase):
+        """Return a context manager recording the time spent in a phase, if diagnostics are
+        collected."""
+        if self._diagnostics is None:
+            return contextlib.nullcontext()
+        return self._diagnostics.measure(phase)
+
+    def _record_solution(self,
+                         step,
+                         gl,
+                         status,
+                         objective_value,
+                         best_bound,
+                         solution,
+                         evaluation=None,
+                         statistics=None,
+                         memoized=False,
+                         time_limit=None,
+                         stall_time=None):
+        """Store the solution of a goal and report it, with the statistics of the solver (Time,
+        Branches, Conflicts, and Stalled if the search stopped early, see modelize.solve_model())
+        if provided.
+
+        The goal is also stored in the memo with the time limit of its search (and the stall time
+        after which it stopped, if it did), unless it was `memoized` already or its optimization
+        was cut short (see _load_memoized()).
+        """
+        if self._interrupt.is_set() and status != "Optimal":
+            status = "Interrupted"
+
+        if self._memo_keys and not memoized and status in ("Optimal", "Feasible"):
+            assert time_limit is not None
+            stalled = bool((statistics or {}).get("Stalled"))
+            self._memo.store(self._memo_keys[step - 1],
+                             {"Objective Value": objective_value,
+                              "Best Bound": best_bound,
+                              "Status": status,
+                              "Time Limit": time_limit,
+                              "Stalled": stalled,
+                              "Stall Time": stall_time if stalled else None,
+                              "Selected": [index for index, used in enumerate(solution) if used]})
+
+        self._reader.add_solution(gl.get_name(),
+                                  {"Objective Value": objective_value,
+                                   "Objective Value (Real)": stats.compute_objective(self._reader,
+                                                                                     gl.get_name(),
+                                                                                     solution,
+                                                                                     evaluation),
+                                   "Best Bound (Real)": stats.to_real_objective(self._reader,
+                                                                                gl.get_name(),
+                                                                                best_bound),
+                                   "Status": status,
+                                   "x": solution})
+        details = {"Status": status}
+        if memoized:
+            details["Memoized"] = True
+        self._emit("Goal", step, gl.get_name(), objective_value, best_bound, **details)
+
+        if self._diagnostics is not None:
+            statistics = statistics or {}
+            self._diagnostics.add_goal(step,
+                                       gl.get_name(),
+                                       status,
+                                       stats.to_real_objective(self._reader,
+                                                               gl.get_name(),
+                                                               objective_value),
+                                       stats.to_real_objective(self._reader, gl.get_name(), best_bound),
+                                       statistics.get("Time"),
+                                       statistics.get("Branches"),
+                                       statistics.get("Conflicts"))
 
     def _vprint(self, string='', highlight=False):
         """Print the string according to the log level."""
@@ -32,9 +267,12 @@ class Optimizer:
         """Solves the multi-objective problem."""
         indent = "   "
 
+        problem = self._reader.get_problem()
+        settings = self._reader.get_settings()
+
         # Extract all goals in order
         goals = []
-        for gl in self._reader.get_settings()["Goals"]:
+        for gl in settings["Goals"]:
             if "Strictness" not in gl:
                 gl["Strictness"] = 1
             goals.append(goal.Goal(gl["Name"],
@@ -48,49 +286,595 @@ class Optimizer:
         self._vprint(f"Maximum IWO: {self._reader.get_maximum_iwo()}")
         self._vprint()
 
-        i = 0
+        if self._use_presolve:
+            with self._measure("Presolve"):
+                problem, report = presolve.reduce_problem(problem)
+            self._vprint("Presolve", highlight=True)
+            for kind in ("Possible Indexes", "Scans", "Entries"):
+                details = ", ".join(f"{name.lower()}: {value}" for name, value in report[kind].items())
+                self._vprint(f"{kind}: {details}")
+            self._vprint(f"Time: {report['Time']:.3f}s")
+            self._vprint()
+
+        warm_start = self._get_warm_start(problem, settings)
+
+        self._memo_keys = self._get_memo_keys(settings)
+        with self._measure("Memo"):
+            memoized = self._load_memoized()
+        if len(memoized) == len(goals):
+            self._reuse_memoized(goals, memoized)
+            self._vprint(f"End of the solving process", highlight=True)
+            return
+
+        # The heuristic does not need the (exact) decomposition
+        if self._use_presolve and self._engine != "heuristic":
+            if len(self._reader.get_groups()) > 1:
+                with self._measure("Groups"):
+                    self._solve_grouped(problem, settings, goals, warm_start)
+                self._vprint(f"End of the solving process", highlight=True)
+                return
+
+            with self._measure("Decomposition"):
+                decomposed = self._solve_decomposed(problem, settings, goals, warm_start)
+            if decomposed:
+                self._vprint(f"End of the solving process", highlight=True)
+                return
+
+        # From here, the goals are optimized one at a time: the memoized ones are not optimized
+        # again, the next goal starting from their solution (the sub-problems above optimize all
+        # the goals at once, so only the memo of all the goals spares them)
+        first = len(memoized)
+        if memoized:
+            warm_start = self._reuse_memoized(goals, memoized)
+            if self._use_presolve:
+                warm_start = presolve.reduce_solution(problem, warm_start)
+
+        if self._engine == "heuristic":
+            with self._measure("Heuristic"):
+                self._solve_heuristically(problem, settings, goals, warm_start, first)
+            self._vprint(f"End of the solving process", highlight=True)
+            return
+
+        i = first
+        model = None
+        model_solution = warm_start  # Solution of the model (of the reduced problem, if presolved)
+        if self._engine == "hybrid" and first == 0:
+            with self._measure("Heuristic"):
+                model_solution = self._get_heuristic_warm_start(problem,
+                                                                settings,
+                                                                len(goals),
+                                                                warm_start)
         current_solution = None
+        evaluation = None
         while i < len(goals):
             self._vprint(f"Step {i + 1}", highlight=True)
 
-            self._vprint("1. Creating a new basic model\n")
-            model = modelize.build_basic_model(self._reader.get_problem(),
-                                               self._reader.get_settings())
+            bound = None
+            if model is None or not self._incremental:
+                self._vprint("1. Creating a new basic model")
+                with self._measure("Build"):
+                    model = modelize.build_basic_model(problem, settings)
+                model_size = modelize.get_model_size(model)
+                if self._diagnostics is not None:
+                    self._diagnostics.add_model(i + 1, model_size)
+                self._vprint(f"{indent}Model size: {model_size['Variables']} variables, "
+                             f"{model_size['Constraints']} constraints, {model_size['Terms']} terms")
+                self._vprint()
 
-            self._vprint("2. Adding previously-optimized goals")
-            if i == 0:
-                self._vprint(f"{indent}(No goals have yet been optimized)")
+                self._vprint("2. Adding previously-optimized goals")
+                if i == 0:
+                    self._vprint(f"{indent}(No goals have yet been optimized)")
+                else:
+                    for j in range(i):
+                        self._vprint(f"{indent}{goals[j].get_constraint_description()}")
+                        goals[j].add_as_constraint(model)
+                self._vprint()
             else:
-                for j in range(i):
-                    self._vprint(f"{indent}{goals[j].get_constraint_description()}")
-                    goals[j].add_as_constraint(model)
-            self._vprint()
+                self._vprint("1. Reusing the model of the previous step")
+                modelize.reset_objective(model)
+                self._vprint()
+
+                # The goals before the previous one are already part of the model
+                self._vprint("2. Adding the previously-optimized goal")
+                self._vprint(f"{indent}{goals[i - 1].get_constraint_description()}")
+                goals[i - 1].add_as_constraint(model)
+                self._vprint()
+
+                # The previous solution satisfies the constraints of all the previous goals, so its
+                # value for the current goal can seed the objective
+                bound = stats.compute_model_objective(self._reader,
+                                                      goals[i].get_name(),
+                                                      current_solution,
+                                                      evaluation)
 
             self._vprint("3. Optimize the current goal")
             self._vprint(f"{indent}{goals[i].get_objective_description()}")
-            goals[i].add_as_objective(model)
+            if bound is not None:
+                self._vprint(f"{indent}(The previous solution has value: {bound})")
+            objective_constraints = modelize.get_num_constraints(model)
+            goals[i].add_as_objective(model, bound)
+            objective_constraints = range(objective_constraints, modelize.get_num_constraints(model))
             self._vprint()
 
             self._vprint("4. Solve the model")
-            results = modelize.solve_model(model,
-                                           time_limit=self._reader.get_time_limit(),
-                                           warm_start=current_solution)
+
+            def _on_solution(solution, step=i + 1, name=goals[i].get_name()):
+                self._emit("Solution",
+                           step,
+                           name,
+                           solution["Objective Value"],
+                           solution["Best Bound"])
+
+            time_limit = self._get_time_limit(i, len(goals))
+            if self._time_budget is not None:
+                self._vprint(f"{indent}Time allocated: {time_limit:.3f}s")
+            search_time_limit = self._get_search_time_limit(time_limit, i)
+            stall_time = self._get_stall_time(time_limit)
+
+            with self._measure("Search"):
+                results = modelize.solve_model(model,
+                                               time_limit=search_time_limit,
+                                               warm_start=model_solution,
+                                               parameters=self._reader.get_solver_parameters(i),
+                                               on_solution=_on_solution if self._on_event else None,
+                                               interrupt=self._interrupt,
+                                               stall_time=stall_time)
+            if self._polish and results["Status"] != "Optimal" and not self._interrupt.is_set():
+                with self._measure("Polish"):
+                    results = self._polish_solution(problem, settings, goals[:i + 1], results,
+                                                    heuristic.POLISH_SHARE * time_limit)
+
+            # The seed of the objective only holds for this goal: the next goals are constrained
+            # by its value with its strictness (see Goal.add_as_constraint())
+            modelize.remove_constraints(model, objective_constraints)
+
             objective_value = results["Objective Value"]
-            current_solution = tuple(results["Indexes"])
-            self._reader.add_solution(goals[i].get_name(),
-                                      {"Objective Value": objective_value,
-                                       "Objective Value (Real)": stats.compute_objective(self._reader,
-                                                                                         goals[i].get_name(),
-                                                                                         current_solution),
-                                       "x": tuple(results["Indexes"])})
-            self._vprint(f"{indent}The solution found has value: {objective_value}")
+            model_solution = tuple(results["Indexes"])
+            if self._use_presolve:
+                current_solution = presolve.restore_solution(problem, model_solution)
+            else:
+                current_solution = model_solution
+            evaluation = stats.evaluate(self._reader, current_solution)
+            self._record_solution(i + 1,
+                                  goals[i],
+                                  results["Status"],
+                                  objective_value,
+                                  results["Best Bound"],
+                                  current_solution,
+                                  evaluation,
+                                  results,
+                                  time_limit=search_time_limit,
+                                  stall_time=stall_time)
+            self._vprint(f"{indent}The solution found has value: {objective_value} "
+                         f"({results['Status'].lower()})")
             goals[i].update_value(objective_value)
             self._vprint()
 
+            if self._interrupt.is_set():
+                self._vprint("Interrupted: the remaining goals are not optimized")
+                break
+
             i += 1
 
         self._vprint(f"End of the solving process", highlight=True)
 
+    def _polish_solution(self, problem, settings, goals, results, time_limit):
+        """Improve the solution of the solver for the last of the goals with a local search, and
+        return the results of the solver updated with it."""
+        step = len(goals)
+        polished = heuristic.polish_results(problem,
+                                            settings,
+                                            goals,
+                                            results,
+                                            time_limit,
+                                            self._reader.get_solver_parameters(step - 1)["Seed"])
+        if polished is not results:
+            self._vprint(f"   Polished solution has value: {polished['Objective Value']}")
+            self._emit("Solution",
+                       step,
+                       goals[-1].get_name(),
+                       polished["Objective Value"],
+                       polished["Best Bound"])
+        return polished
+
+    def _get_search_time_limit(self, time_limit, goal=None):
+        """Return the time limit of the search of a goal given its time limit, the rest being kept
+        for polishing its solution (if the solutions of the solver are polished) and, for the first
+        goal with the hybrid engine, for the heuristic warm starting it (see
+        _get_heuristic_warm_start()). `goal` is the position of the goal when the goals are
+        optimized one at a time."""
+        search_time_limit = time_limit
+        if self._engine == "hybrid" and goal == 0:
+            search_time_limit -= _HYBRID_SHARE * time_limit
+        if self._polish and self._engine != "heuristic":
+            search_time_limit -= heuristic.POLISH_SHARE * time_limit
+        return search_time_limit
+
+    def _get_memo_keys(self, settings):
+        """Return the key of each goal in the memo, or an empty list if there is no memo.
+
+        Besides the problem and the goals up to it (with their strictness and solver parameters),
+        the optimization of a goal depends on the rules, the formulation of the model, how the
+        goals are optimized and the warm start.
+        """
+        problem_key = self._reader.get_problem_key()
+        if self._memo is None or problem_key is None:
+            return []
+
+        warm_start = None
+        if self._warm_start is not None:
+            warm_start = [index for index, used in enumerate(self._warm_start) if used]
+        context = {"Rules": [settings["Maximum Number of Possible Indexes"], settings["Maximum IWO"]],
+                   "Formulation": settings["Formulation"],
+                   "Engine": self._engine,
+                   "Presolve": self._use_presolve,
+                   "Polish": self._polish,
+                   "Warm Start": warm_start}
+        return self._memo.get_keys(problem_key,
+                                   context,
+                                   [[gl["Name"], gl["Strictness"], self._reader.get_solver_parameters(i)]
+                                    for i, gl in enumerate(settings["Goals"])])
+
+    def _load_memoized(self):
+        """Return the first goals that are memoized, as long as each one was proven optimal or
+        could not be improved by optimizing it now.
+
+        A goal not proven optimal is reused if its search had at least the time limit it would get
+        now (at most that of _get_time_limit(), whichever way the goals are optimized), and if it
+        did not stop on a stall sooner than it would now: its search lasted at least its stall
+        time, and would now stop on a stall after at most as long.
+        """
+        memoized = []
+        for i, key in enumerate(self._memo_keys):
+            step = self._memo.load(key)
+            if step is None:
+                break
+            if step["Status"] != "Optimal":
+                time_limit = self._get_time_limit(i, len(self._memo_keys))
+                search_time_limit = self._get_search_time_limit(time_limit, i)
+                stall_time = self._get_stall_time(time_limit)
+                if step["Time Limit"] < search_time_limit:
+                    break
+                if step["Stalled"] and search_time_limit > step["Stall Time"] and \
+                        (stall_time is None or stall_time > step["Stall Time"]):
+                    break
+            memoized.append(step)
+        return memoized
+
+    def _reuse_memoized(self, goals, memoized):
+        """Record the memoized goals (see _load_memoized()) as optimized, and return the solution
+        of the last one."""
+        self._vprint("Memo", highlight=True)
+        solution = None
+        for i, (gl, step) in enumerate(zip(goals, memoized)):
+            solution = [0 for _ in range(self._reader.get_num_indexes())]
+            for index in step["Selected"]:
+                solution[index] = 1
+            solution = tuple(solution)
+            self._record_solution(i + 1,
+                                  gl,
+                                  step["Status"],
+                                  step["Objective Value"],
+                                  step["Best Bound"],
+                                  solution,
+                                  memoized=True)
+            self._vprint(f"Step {i + 1}: {gl.get_objective_description()}")
+            self._vprint(f"   The memoized solution has value: {step['Objective Value']} "
+                         f"({step['Status'].lower()})")
+            gl.update_value(step["Objective Value"])
+        self._vprint()
+        return solution
+
+    def _get_warm_start(self, problem, settings):
+        """Return the warm start of the first goal as a solution of the (possibly reduced) problem,
+        or None if there is none or if it breaks the rules."""
+        if self._warm_start is None:
+            return None
+
+        warm_start = tuple(self._warm_start)
+        if self._use_presolve:
+            warm_start = presolve.reduce_solution(problem, warm_start)
+
+        offsets = problem.get("Offsets", {"Cost": 0, "Coverage": 0, "IWO": 0, "Indexes": 0})
+        num_pind = sum(warm_start) - problem["Number of Existing Indexes"]
+        iwo = sum(index_iwo for index_iwo, used in zip(problem["Index IWOs"], warm_start) if used)
+
+        self._vprint("Warm start", highlight=True)
+        if num_pind > settings["Maximum Number of Possible Indexes"] or \
+                iwo + offsets["IWO"] > settings["Maximum IWO"]:
+            self._vprint("(The previous selection breaks the rules: it is ignored)\n")
+            return None
+        self._vprint(f"Possible indexes selected: {num_pind}\n")
+        return warm_start
+
+    def _solve_grouped(self, problem, settings, goals, warm_start=None):
+        """Solve the reduced problem one group of the input (e.g., one table) at a time.
+
+        The groups are solved in parallel. When a rule binds, its budget is divided between the
+        groups from the marginal benefits of their indexes for the first goal measuring the cost or
+        the coverage (see decompose.divide_budgets()), and each group is warm started from its
+        share of the greedy selection. The division is not proven optimal, so the goals are then
+        Feasible at best, with the bounds of the heuristic (see heuristic.get_bound()). Likewise,
+        a goal with a strictness below 100% constrains each group, which is more than needed.
+        """
+        groups = self._reader.get_groups()
+        index_groups = [self._reader.get_index_group(index) for index in problem["Original Indexes"]]
+        components = decompose.find_groups(problem, index_groups, len(groups))
+        # Positions of the groups left with possible indexes, the others being solved by presolve
+        positions = [position for position, (indexes, _) in enumerate(components) if indexes]
+        sub_problems = [decompose.split_problem(problem, components[position])
+                        for position in positions]
+
+        self._vprint("Groups", highlight=True)
+        self._vprint(f"Groups: {len(groups)} ({len(sub_problems)} with possible indexes left)")
+
+        maximum_num_indexes = settings["Maximum Number of Possible Indexes"]
+        maximum_iwo = settings["Maximum IWO"] - problem["Offsets"]["IWO"]
+        binding = (maximum_num_indexes < problem["Number of Possible Indexes"],
+                   maximum_iwo < sum(problem["Index IWOs"]))
+        budgets = [(None, None) for _ in sub_problems]
+        warm_starts = None
+        if warm_start is not None:
+            warm_starts = [tuple(warm_start[index] for index in sub_problem["Original Indexes"])
+                           for sub_problem in sub_problems]
+
+        measured = [gl for gl in goals if gl.get_measure() in ("Cost", "Coverage")]
+        if any(binding):
+            self._vprint("Dividing the rules between the groups from their marginal benefits")
+            weights = (1 / maximum_num_indexes if binding[0] else 0,
+                       1 / maximum_iwo if binding[1] else 0)
+            curves = [[] for _ in sub_problems]
+            if measured:
+                curves = [heuristic.get_benefit_curve(sub_problem,
+                                                      measured[0],
+                                                      weights,
+                                                      (maximum_num_indexes, maximum_iwo))
+                          for sub_problem in sub_problems]
+            num_steps = decompose.divide_budgets(curves, weights, maximum_num_indexes, maximum_iwo)
+
+            # The selection of the steps taken is improved by swapping indexes, including between
+            # groups, and the budget of each group is what it then uses
+            solution = [0 for _ in range(problem["Number of Possible Indexes"])]
+            for sub_problem, curve, size in zip(sub_problems, curves, num_steps):
+                for index, _, _ in curve[:size]:
+                    solution[sub_problem["Original Indexes"][index]] = 1
+            if measured:
+                solution, _ = heuristic.polish(problem,
+                                               settings,
+                                               measured[:1],
+                                               solution,
+                                               _DIVISION_SHARE * self._get_time_limit(0, len(goals)),
+                                               self._reader.get_solver_parameters(0)["Seed"])
+
+            budgets = []
+            warm_starts = []
+            for sub_problem in sub_problems:
+                warm_starts.append(tuple(solution[index] for index in sub_problem["Original Indexes"]))
+                budgets.append((sum(warm_starts[-1]) if binding[0] else None,
+                                sum(iwo for iwo, used in zip(sub_problem["Index IWOs"], warm_starts[-1])
+                                    if used) if binding[1] else None))
+        self._vprint()
+
+        # An absolute gap is divided between the groups, so that it holds for their sum
+        parameters = []
+        for i in range(len(goals)):
+            goal_parameters = self._reader.get_solver_parameters(i)
+            goal_parameters["Absolute Gap"] /= max(1, len(sub_problems))
+            parameters.append(goal_parameters)
+
+        # Each group optimizes all the goals, so the time budget is divided evenly
+        time_limit = self._get_shared_time_limit(len(goals))
+        sub_results = decompose.solve_with_budgets(sub_problems,
+                                                   settings,
+                                                   budgets,
+                                                   time_limit,
+                                                   self._jobs,
+                                                   parameters,
+                                                   warm_starts,
+                                                   self._polish,
+                                                   self._interrupt,
+                                                   self._get_stall_time(time_limit))
+
+        # Each goal is exact if no rule binds and the previous goals leave no slack to the groups
+        bounds = []
+        for i, gl in enumerate(goals):
+            if any(binding) or not decompose.is_separable(settings["Goals"][:i + 1]):
+                bounds.append(heuristic.get_bound(problem, settings, gl))
+            else:
+                bounds.append(None)
+        self._combine_sub_results(problem, goals, sub_problems, sub_results, time_limit, bounds)
+
+        # The budget of a group is all of its indexes for the rules that do not bind
+        for position, sub_problem, budget, steps in zip(positions,
+                                                        sub_problems,
+                                                        budgets,
+                                                        sub_results):
+            num_indexes, iwo = budget
+            if num_indexes is None:
+                num_indexes = sub_problem["Number of Possible Indexes"]
+            if iwo is None:
+                iwo = sum(sub_problem["Index IWOs"])
+            self._reader.add_group_solution(
+                position,
+                {"Budget": {"Maximum Number of Possible Indexes": num_indexes,
+                            "Maximum IWO": stats.to_real_objective(self._reader, "Minimal IWO", iwo)},
+                 "Solver Status": [{"Goal": gl.get_name(), "Status": step["Status"]}
+                                   for gl, step in zip(goals, steps)]})
+        self._vprint()
+
+    def _solve_decomposed(self, problem, settings, goals, warm_start=None):
+        """Solve the reduced problem one connected component at a time, when it is exact to do so.
+
+        Returns:
+          A boolean indicating if the problem was solved (otherwise, it must be solved as a whole).
+        """
+        components = decompose.find_components(problem)
+        if len(components) <= 1:
+            return False
+
+        self._vprint("Decomposition", highlight=True)
+        self._vprint(f"Independent sub-problems: {len(components)}")
+
+        if not decompose.is_separable(settings["Goals"]):
+            self._vprint("(Goals with a strictness below 100% couple the sub-problems)\n")
+            return False
+
+        if settings["Maximum IWO"] - problem["Offsets"]["IWO"] < sum(problem["Index IWOs"]):
+            self._vprint("(The Maximum IWO rule couples the sub-problems)\n")
+            return False
+
+        parameters = [self._reader.get_solver_parameters(i) for i in range(len(goals))]
+        if any(goal_parameters["Absolute Gap"] > 0 for goal_parameters in parameters):
+            self._vprint("(An absolute gap would apply to each sub-problem rather than to the sum)\n")
+            return False
+
+        budget = settings["Maximum Number of Possible Indexes"]
+        sub_problems = [decompose.split_problem(problem, component) for component in components]
+
+        # Each sub-problem optimizes all the goals, so the time budget is divided evenly
+        if budget < problem["Number of Possible Indexes"]:
+            self._vprint(f"Dividing a budget of {budget} possible indexes between them\n")
+            # The trade-off tables solve the sub-problems twice (without and with the budget)
+            time_limit = self._get_shared_time_limit(len(goals), num_solves=2)
+            tables = decompose.build_tradeoff_tables(sub_problems,
+                                                     settings,
+                                                     time_limit,
+                                                     budget,
+                                                     self._jobs,
+                                                     parameters,
+                                                     self._polish,
+                                                     self._interrupt,
+                                                     self._get_stall_time(time_limit))
+            allocation = decompose.allocate_budget(tables, settings["Goals"], budget)
+            sub_results = [table[num_indexes] for table, num_indexes in zip(tables, allocation)]
+        else:
+            self._vprint()
+            time_limit = self._get_shared_time_limit(len(goals))
+            warm_starts = None
+            if warm_start is not None:
+                warm_starts = [tuple(warm_start[index] for index in sub_problem["Original Indexes"])
+                               for sub_problem in sub_problems]
+            sub_results = decompose.solve_components(sub_problems,
+                                                     settings,
+                                                     time_limit,
+                                                     self._jobs,
+                                                     parameters,
+                                                     warm_starts,
+                                                     self._polish,
+                                                     self._interrupt,
+                                                     self._get_stall_time(time_limit))
+
+        self._combine_sub_results(problem, goals, sub_problems, sub_results, time_limit)
+        self._vprint()
+        return True
+
+    def _combine_sub_results(self,
+                             problem,
+                             goals,
+                             sub_problems,
+                             sub_results,
+                             time_limit,
+                             bounds=None):
+        """Combine the solutions of the sub-problems of a reduced problem after each goal, and
+        record them.
+
+        Args:
+          problem: The reduced problem.
+          goals: The goals (Goal objects).
+          sub_problems: The sub-problems (see decompose.split_problem()).
+          sub_results: The result of decompose.solve_goals() for each sub-problem.
+          time_limit: The time limit of each goal, shared by the sub-problems.
+          bounds: For each goal, None if the sum of the bounds of the sub-problems is a bound of
+            the problem (and the status of the sub-problems holds), otherwise a bound of the
+            problem, the status being Feasible at best.
+        """
+        if bounds is None:
+            bounds = [None for _ in goals]
+
+        for i, gl in enumerate(goals):
+            objective_value = gl.get_offset(problem["Offsets"])
+            best_bound = objective_value
+            statuses = set()
+            statistics = {"Time": 0, "Branches": 0, "Conflicts": 0}  # Summed over the sub-problems
+            model_solution = [0 for _ in range(problem["Number of Possible Indexes"])]
+            for sub_problem, steps in zip(sub_problems, sub_results):
+                objective_value += steps[i]["Objective Value"]
+                best_bound += steps[i]["Best Bound"]
+                statuses.add(steps[i]["Status"])
+                for name in statistics:
+                    statistics[name] += steps[i][name]
+                for index, used in zip(sub_problem["Original Indexes"], steps[i]["Indexes"]):
+                    model_solution[index] = used
+
+            # The least conclusive status of the sub-problems
+            if bounds[i] is not None:
+                best_bound = bounds[i]
+                statuses.discard("Optimal")
+                statuses.add("Feasible")
+            status = next(status for status in ("Unknown", "Feasible", "Optimal")
+                          if status in statuses)
+
+            current_solution = presolve.restore_solution(problem, model_solution)
+            self._record_solution(i + 1,
+                                  gl,
+                                  status,
+                                  objective_value,
+                                  best_bound,
+                                  current_solution,
+                                  statistics=statistics,
+                                  time_limit=self._get_search_time_limit(time_limit))
+            self._vprint(f"Step {i + 1}: {gl.get_objective_description()}")
+            self._vprint(f"   The solution found has value: {objective_value}")
+            gl.update_value(objective_value)
+
+    def _get_heuristic_warm_start(self, problem, settings, num_goals, warm_start=None):
+        """Return a solution of the (possibly reduced) problem found by the heuristic for the first
+        goal (starting from `warm_start`, if provided), to warm start the exact optimization."""
+        time_limit = _HYBRID_SHARE * self._get_time_limit(0, num_goals)
+        steps = heuristic.solve_goals(problem,
+                                      dict(settings, Goals=settings["Goals"][:1]),
+                                      time_limit,
+                                      warm_start)
+
+        self._vprint("Heuristic warm start", highlight=True)
+        self._vprint(f"The solution found has value: {steps[0]['Objective Value']} "
+                     f"(bound: {steps[0]['Best Bound']})")
+        self._vprint()
+        return steps[0]["Indexes"]
+
+    def _solve_heuristically(self, problem, settings, goals, warm_start=None, first=0):
+        """Optimize the goals with the heuristic rather than with a model, starting from
+        `warm_start` (if provided) and from the goal at position `first` (the previous ones being
+        already optimized)."""
+        self._vprint("Heuristic", highlight=True)
+
+        # Each goal gets the same time limit, so the time budget is divided evenly
+        time_limit = self._get_shared_time_limit(len(goals) - first)
+
+        steps = heuristic.solve_goals(problem,
+                                      settings,
+                                      time_limit,
+                                      warm_start,
+                                      [gl.get_value() for gl in goals[:first]])
+        for i, (gl, step) in enumerate(zip(goals[first:], steps), first):
+            if self._use_presolve:
+                current_solution = presolve.restore_solution(problem, step["Indexes"])
+            else:
+                current_solution = step["Indexes"]
+            self._record_solution(i + 1,
+                                  gl,
+                                  step["Status"],
+                                  step["Objective Value"],
+                                  step["Best Bound"],
+                                  current_solution,
+                                  time_limit=time_limit)
+            self._vprint(f"Step {i + 1}: {gl.get_objective_description()}")
+            self._vprint(f"   The solution found has value: {step['Objective Value']} "
+                         f"(bound: {step['Best Bound']})")
+            gl.update_value(step["Objective Value"])
+
+        self._vprint()
+
     def get_results(self):
         """Return the results of the solving process."""
         return self._reader.get_results()
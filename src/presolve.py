@@ -0,0 +1,163 @@
+"""Exact reductions of the problem data before modeling."""
+
+
+from array import array
+import time
+
+import costs
+
+
+def reduce_problem(problem):
+    """Reduce the problem without changing the value any goal can reach.
+
+    The reductions are the following:
+    - Existing indexes are always selected, so they are folded into the scans: the sequential cost
+      of a scan becomes the best cost offered by an existing index, and their IWO and number become
+      constant offsets.
+    - A possible index cost that is not strictly better than this new sequential cost is dropped.
+    - Possible indexes that no longer cover any scan are dropped (useless).
+    - Possible indexes with the same costs as another one are collapsed into the one with the
+      lowest IWO (duplicate).
+    - Possible indexes whose scans are all covered at an equal or lower cost by another possible
+      index with an equal or lower IWO are dropped (dominated).
+    - Scans that are no longer covered by any possible index are dropped, their cost and coverage
+      become constant offsets.
+
+    Args:
+      problem: The problem data (as returned by Reader.get_problem()).
+
+    Returns:
+      A tuple (reduced problem, report). The reduced problem has the same format as the problem,
+      with the following additional keys:
+      - Always Covered Scans: For each scan, a boolean indicating if it is covered by an existing
+        index.
+      - Offsets: Values to add to the Cost, Coverage, IWO and Indexes measured on the reduced
+        problem to obtain the values of the problem.
+      - Original Indexes: The position in the problem of each index of the reduced problem.
+      - Number of Original Existing Indexes: The number of existing indexes in the problem.
+      - Number of Original Indexes: The number of indexes in the problem.
+    """
+    start_time = time.time()
+
+    num_eind = problem["Number of Existing Indexes"]
+    num_indexes = num_eind + problem["Number of Possible Indexes"]
+    read_costs = problem["Sequential Scan Costs"]
+    index_iwo = problem["Index IWOs"]
+    matrix = problem["Index Costs"]
+    num_scans = len(read_costs)
+
+    # Best cost of every scan with the existing indexes only
+    base_costs = list(read_costs)
+    for eind in range(num_eind):
+        scans, scan_costs = matrix.get_index_entries(eind)
+        for scan, cost in zip(scans, scan_costs):
+            base_costs[scan] = min(base_costs[scan], cost)
+
+    # Entries of the possible indexes that improve on the existing indexes
+    entries = {}
+    useless = 0
+    for pind in range(num_eind, num_indexes):
+        scans, scan_costs = matrix.get_index_entries(pind)
+        improving = tuple((scan, cost) for scan, cost in zip(scans, scan_costs)
+                          if cost < base_costs[scan])
+        if improving:
+            entries[pind] = improving
+        else:
+            useless += 1
+
+    # Collapse the possible indexes with the same costs (lowest IWO first, then lowest position)
+    representatives = {}
+    duplicate = 0
+    for pind in sorted(entries, key=lambda pind: (index_iwo[pind], pind)):
+        if entries[pind] in representatives:
+            duplicate += 1
+        else:
+            representatives[entries[pind]] = pind
+    candidates = sorted(representatives.values())
+
+    # Drop the dominated possible indexes
+    covering = [[] for _ in range(num_scans)]
+    for pind in candidates:
+        for scan, cost in entries[pind]:
+            covering[scan].append((pind, cost))
+    candidate_costs = {pind: dict(entries[pind]) for pind in candidates}
+
+    kept = []
+    for pind in candidates:
+        # Any dominating index must cover the least covered scan of this index
+        scan, cost = min(entries[pind], key=lambda entry: len(covering[entry[0]]))
+        dominated = False
+        for other, other_cost in covering[scan]:
+            if other == pind or other_cost > cost or index_iwo[other] > index_iwo[pind]:
+                continue
+            other_costs = candidate_costs[other]
+            if all(s in other_costs and other_costs[s] <= c for s, c in entries[pind]):
+                dominated = True
+                break
+        if not dominated:
+            kept.append(pind)
+
+    # Drop the scans that can no longer be improved
+    kept_scans = sorted({scan for pind in kept for scan, _ in entries[pind]})
+    scan_position = {scan: position for position, scan in enumerate(kept_scans)}
+    removed_scans = set(range(num_scans)) - set(kept_scans)
+
+    entry_indexes = array("I")
+    entry_scans = array("I")
+    entry_costs = array("q")
+    for position, pind in enumerate(kept):
+        for scan, cost in entries[pind]:
+            entry_indexes.append(position)
+            entry_scans.append(scan_position[scan])
+            entry_costs.append(cost)
+
+    reduced = {}
+    reduced["Number of Existing Indexes"] = 0
+    reduced["Number of Possible Indexes"] = len(kept)
+    reduced["Sequential Scan Costs"] = [base_costs[scan] for scan in kept_scans]
+    reduced["Always Covered Scans"] = [base_costs[scan] < read_costs[scan] for scan in kept_scans]
+    reduced["Index IWOs"] = [index_iwo[pind] for pind in kept]
+    reduced["Index Costs"] = costs.CostMatrix(len(kept),
+                                              len(kept_scans),
+                                              entry_indexes,
+                                              entry_scans,
+                                              entry_costs)
+    reduced["Index Costs (B)"] = costs.CostMatrixView(reduced["Index Costs"], "B")
+    reduced["Index Costs (R)"] = costs.CostMatrixView(reduced["Index Costs"],
+                                                      "R",
+                                                      reduced["Sequential Scan Costs"])
+    reduced["Offsets"] = {"Cost": sum(base_costs[scan] for scan in removed_scans),
+                          "Coverage": sum(1 for scan in removed_scans
+                                          if base_costs[scan] < read_costs[scan]),
+                          "IWO": sum(index_iwo[:num_eind]),
+                          "Indexes": num_eind}
+    reduced["Original Indexes"] = array("I", kept)
+    reduced["Number of Original Existing Indexes"] = num_eind
+    reduced["Number of Original Indexes"] = num_indexes
+
+    report = {"Possible Indexes": {"Useless": useless,
+                                   "Duplicate": duplicate,
+                                   "Dominated": len(candidates) - len(kept),
+                                   "Remaining": len(kept)},
+              "Scans": {"Removed": len(removed_scans),
+                        "Remaining": len(kept_scans)},
+              "Entries": {"Removed": matrix.get_num_entries() - len(entry_costs),
+                          "Remaining": len(entry_costs)},
+              "Time": time.time() - start_time}
+
+    return reduced, report
+
+
+def restore_solution(reduced, solution):
+    """Return the solution of the problem corresponding to a solution of the reduced problem."""
+    restored = [0 for _ in range(reduced["Number of Original Indexes"])]
+    for eind in range(reduced["Number of Original Existing Indexes"]):
+        restored[eind] = 1
+    for index, used in zip(reduced["Original Indexes"], solution):
+        restored[index] = used
+    return tuple(restored)
+
+
+def reduce_solution(reduced, solution):
+    """Return the solution of the reduced problem corresponding to a solution of the problem."""
+    return tuple(solution[index] for index in reduced["Original Indexes"])
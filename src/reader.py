@@ -1,36 +1,88 @@
 """Read and write the problem data and the optimizer settings."""
 
 
+from array import array
 import copy
 import json
+
+import costs
+import jsonstream
+import modelize
 import stats
 
 
 class Reader:
     """Read, store, and write the problem data and the optimizer settings."""
 
-    _problem = {}       # Problem data
-    _settings = {}      # Optimizer settings
-    _solutions = {}     # All intermediary solutions
-    _translation = {}   # Correspondence between string IDs and their associated integer indices
-
     _multiplier = 100
 
     # Default optimizer settings
     _maximum_num_indexes = None  # Maximum number of indexes allowed
     _maximum_iwo = None          # Maximum IWO allowed
 
-    def __init__(self, problem, time_limit, settings=None):
+    # Default solver parameters ("Workers" defaults to the number of CPUs available)
+    _solver_parameters = {"Seed": 0,
+                          "Relative Gap": 0.0,
+                          "Absolute Gap": 0.0,
+                          "Presolve Level": 3,
+                          "Linearization Level": 1}
+
+    def __init__(self,
+                 problem,
+                 time_limit,
+                 settings=None,
+                 cache=None,
+                 solver_parameters=None,
+                 formulation=None):
         """Read and store the problem data and the optimizer settings from serialized JSON objects.
 
-        Default optimizer settings will be provided if some are missing from the settings.
+        The problem can also be a text file object, in which case it is streamed: its scans and
+        indexes are read one at a time instead of parsing the whole document first.
+
+        If a ProblemCache is provided (see cache.py), a problem that was read before is loaded from
+        it instead of being read again.
+
+        Default optimizer settings will be provided if some are missing from the settings. The
+        solver parameters provided separately (e.g., from the CLI) take precedence over the
+        "Solver Parameters" of the settings, but not over those of the goals. The same goes for
+        the formulation of the model (see modelize.FORMULATIONS) over the "Formulation" of the
+        settings.
         """
-        self._read_problem(json.loads(problem))
+        # The state is kept per instance, so that several Readers can live in the same process
+        self._problem = {}       # Problem data
+        self._settings = {}      # Optimizer settings
+        self._solutions = {}     # All intermediary solutions
+        self._group_solutions = {}  # Details of the solution of each group, if solved separately
+        self._translation = {}   # Correspondence between string IDs and their associated integer indices
+
+        key = None
+        cached = None
+        if cache is not None:
+            key = cache.get_key(problem, self._multiplier)
+            if key is not None:
+                cached = cache.load(key)
+
+        if cached is not None:
+            self._load_cached_problem(*cached)
+        elif isinstance(problem, str):
+            self._read_problem(json.loads(problem))
+        else:
+            self._read_problem_stream(problem)
+
+        # Key of the data as read, no longer valid once it is changed (see _make_mutable())
+        self._key = key
+
+        if key is not None and cached is None:
+            cache.store(key,
+                        self._problem,
+                        self._translation["Scan IDs"],
+                        self._translation["Index OIDs"],
+                        self._get_group_arrays())
 
         # _read_problem() must be first, because _read_settings() uses data from the problem
         if settings is None:
             settings = json.dumps({})
-        self._read_settings(json.loads(settings))
+        self._read_settings(json.loads(settings), solver_parameters, formulation)
 
         self._time_limit = time_limit
 
@@ -46,7 +98,7 @@ class Reader:
             pretty += f"{' '*8}{' '.join(str({self._downscale(x)}) for x in row)}\n"
         pretty += f"\n{' '*8}Goals:\n"
         for goal in self._settings["Goals"]:
-            pretty += f"{' '*8}{goal['Name']}: {goal['Strictness']}\n"
+            pretty += f"{' '*8}{goal['Name']}: {goal.get('Strictness', 1)}\n"
         pretty += f"\n{' '*8}Rules:\n"
         for rule, value in self._settings["Rules"].items():
             pretty += f"{' '*8}{rule}: {value}\n"
@@ -60,6 +112,15 @@ class Reader:
         """Downscale the value w.r.t. the multiplier."""
         return value / self._multiplier
 
+    def get_multiplier(self):
+        """Return the multiplier used to upscale the costs and IWOs to integers."""
+        return self._multiplier
+
+    def get_problem_key(self):
+        """Return the key of the problem in the cache (see ProblemCache.get_key()), or None if it
+        was not hashed or if it changed since."""
+        return self._key
+
     def get_scan_id(self, scan):
         """Return the ID of a scan."""
         return self._translation["Scan IDs"][scan]
@@ -70,6 +131,33 @@ class Reader:
             return self._translation["Index OIDs"][index]
         return None
 
+    def get_scan_position(self, scan_id):
+        """Return the position of a scan from its ID, None if the scan is unknown."""
+        return self._translation["Scan Positions"].get(scan_id)
+
+    def get_index_position(self, index_oid):
+        """Return the position of an index from its OID, None if the index is unknown."""
+        return self._translation["Index Positions"].get(index_oid)
+
+    def get_groups(self):
+        """Return the names of the groups (e.g., tables) of the scans and indexes, an empty list if
+        the problem is not grouped (None names the scans and indexes without a group)."""
+        if self._translation["Group Names"] is None:
+            return []
+        return list(self._translation["Group Names"])
+
+    def get_scan_group(self, scan):
+        """Return the position of the group of a scan in get_groups(), None if not grouped."""
+        if self._translation["Group Names"] is None:
+            return None
+        return self._translation["Scan Groups"][scan]
+
+    def get_index_group(self, index):
+        """Return the position of the group of an index in get_groups(), None if not grouped."""
+        if self._translation["Group Names"] is None:
+            return None
+        return self._translation["Index Groups"][index]
+
     def get_num_scans(self):
         """Return the number of scans."""
         return len(self._translation['Scan IDs'])
@@ -78,6 +166,10 @@ class Reader:
         """Return the scan read costs."""
         return tuple(self._problem['Sequential Scan Costs'])
 
+    def get_read_cost(self, scan):
+        """Return the read cost of a scan."""
+        return self._problem['Sequential Scan Costs'][scan]
+
     def get_num_indexes(self):
         """Return the number of indexes (possible and existing)."""
         return len(self._translation['Index OIDs'])
@@ -95,8 +187,8 @@ class Reader:
         return tuple(self._problem["Index IWOs"])
 
     def get_index_costs(self):
-        """Return the costs of the existing indexes (None if a scan is not covered by the index)."""
-        return tuple(tuple(index) for index in self._problem["Index Costs"])
+        """Return the sparse costs of the indexes (CostMatrix, only the covered scans are stored)."""
+        return self._problem["Index Costs"]
 
     def get_maximum_num_indexes(self):
         """Return the maximum number of indexes constraint value."""
@@ -118,6 +210,16 @@ class Reader:
         """Return a deep copy of the optimizer solutions."""
         return copy.deepcopy(self._solutions)
 
+    def get_solver_parameters(self, goal):
+        """Return the solver parameters of a goal (its position), in the units of the model.
+
+        See modelize.solve_model() for their meaning.
+        """
+        parameters = dict(self._settings["Goal Solver Parameters"][goal])
+        if self._settings["Goals"][goal]["Name"] in ("Minimal IWO", "Minimal Cost"):
+            parameters["Absolute Gap"] = self._upscale(parameters["Absolute Gap"])
+        return parameters
+
     def get_time_limit(self):
         """Return the time limit."""
         return self._time_limit
@@ -133,21 +235,20 @@ class Reader:
             results["Goals"].append({goal:
                                      solutions[goal]["Objective Value (Real)"]})
 
+        evaluation = stats.evaluate(self, last_solution)
+
+        # Removed scans and indexes (see _make_mutable()) are left out
         scans = []
         for scan in range(self.get_num_scans()):
+            if self.get_scan_id(scan) is None:
+                continue
             new_scan = {}
 
             new_scan["Scan ID"] = self.get_scan_id(scan)
 
-            new_scan["Cost"] = self._downscale(stats.cost_of_scan(self,
-                                                                  last_solution,
-                                                                  scan))
+            new_scan["Cost"] = self._downscale(evaluation["Scan Costs"][scan])
 
-            index = stats.best_covered_by(self,
-                                          last_solution,
-                                          scan)
-
-            new_scan["Best Covered By"] = self.get_index_oid(index)
+            new_scan["Best Covered By"] = self.get_index_oid(evaluation["Best Covered By"][scan])
 
             scans.append(new_scan)
 
@@ -157,6 +258,8 @@ class Reader:
         results["Indexes"]["Existing Indexes"] = []
         results["Indexes"]["Possible Indexes"] = []
         for index, used in enumerate(last_solution):
+            if self.get_index_oid(index) is None:
+                continue
             new_index = {}
             new_index["Index OID"] = self.get_index_oid(index)
             new_index["Selected"] = used == 1
@@ -168,134 +271,469 @@ class Reader:
         statistics = {}
 
         # Coverage
-        statistics["Coverage"] = {}
-        statistics["Coverage"]["Total"] = stats.total_coverage(self, last_solution)
-
-        eind_coverage = 0
-        pind_coverage = 0
-        for scan in range(self.get_num_scans()):
-            covered_by = stats.best_covered_by(self,
-                                               last_solution,
-                                               scan)
-            if covered_by is not None and covered_by < self.get_num_eind():
-                eind_coverage += 1
-            elif covered_by is not None and covered_by >= self.get_num_eind():
-                pind_coverage += 1
-        statistics["Coverage"]["Existing"] = eind_coverage
-        statistics["Coverage"]["Possible"] = pind_coverage
-
-        statistics["Coverage"]["Uncovered"] = self.get_num_scans() - \
-            stats.total_coverage(self,
-                                 last_solution)
+        statistics["Coverage"] = dict(evaluation["Coverage"])
+        statistics["Coverage"]["Uncovered"] -= self.get_num_scans() - len(scans)
 
         # Cost
         statistics["Cost"] = {}
-        statistics["Cost"]["Total"] = self._downscale(stats.total_cost(self, last_solution))
-        statistics["Cost"]["Maximum"] = self._downscale(stats.maximum_cost(self, last_solution))
+        statistics["Cost"]["Total"] = self._downscale(evaluation["Cost"]["Total"])
+        statistics["Cost"]["Maximum"] = self._downscale(evaluation["Cost"]["Maximum"])
 
         # Indexes
-        statistics["Indexes Used"] = {}
-        statistics["Indexes Used"]["Total"] = stats.num_indexes_used(last_solution)
-        statistics["Indexes Used"]["Existing"] = sum(last_solution[:self.get_num_eind()])
-        statistics["Indexes Used"]["Possible"] = sum(last_solution[self.get_num_eind():])
+        statistics["Indexes Used"] = dict(evaluation["Indexes Used"])
 
         # IWO
         statistics["Index Write Overhead"] = {}
-        statistics["Index Write Overhead"]["Total"] = \
-            self._downscale(stats.total_iwo(self, last_solution))
-        statistics["Index Write Overhead"]["Existing"] = \
-            self._downscale(stats.eind_iwo(self, last_solution))
-        statistics["Index Write Overhead"]["Possible"] = \
-            self._downscale(stats.pind_iwo(self, last_solution))
+        for kind, value in evaluation["Index Write Overhead"].items():
+            statistics["Index Write Overhead"][kind] = self._downscale(value)
 
         results["Statistics"] = statistics
 
+        if self.get_groups():
+            results["Groups"] = self._get_group_results(evaluation, last_solution)
+
+        # The goals that were not optimized (e.g., after an interruption) have no status
+        results["Solver Status"] = []
+        for goal in solutions:
+            results["Solver Status"].append({"Goal": goal,
+                                             "Status": solutions[goal]["Status"],
+                                             "Best Bound": solutions[goal]["Best Bound (Real)"]})
+
+        results["Solver Parameters"] = []
+        for goal, parameters in zip(self._settings["Goals"],
+                                    self._settings["Goal Solver Parameters"]):
+            results["Solver Parameters"].append({"Goal": goal["Name"], **parameters})
+
         return results
 
+    def _get_group_results(self, evaluation, solution):
+        """Return the statistics of each group of a solution (see get_groups()), along with the
+        details of the solution of the group if it was solved separately (see
+        add_group_solution())."""
+        groups = []
+        for name in self.get_groups():
+            groups.append({"Group": name,
+                           "Scans": 0,
+                           "Coverage": 0,
+                           "Cost": 0,
+                           "Indexes Used": {"Existing": 0, "Possible": 0},
+                           "Index Write Overhead": 0})
+
+        for scan in range(self.get_num_scans()):
+            if self.get_scan_id(scan) is None:
+                continue
+            group = groups[self.get_scan_group(scan)]
+            group["Scans"] += 1
+            group["Coverage"] += evaluation["Best Covered By"][scan] is not None
+            group["Cost"] += evaluation["Scan Costs"][scan]
+
+        for index, used in enumerate(solution):
+            if not used or self.get_index_oid(index) is None:
+                continue
+            group = groups[self.get_index_group(index)]
+            group["Indexes Used"]["Existing" if index < self.get_num_eind() else "Possible"] += 1
+            group["Index Write Overhead"] += self._problem["Index IWOs"][index]
+
+        for position, group in enumerate(groups):
+            group["Cost"] = self._downscale(group["Cost"])
+            group["Index Write Overhead"] = self._downscale(group["Index Write Overhead"])
+            group.update(self._group_solutions.get(position, {}))
+
+        return groups
+
     def get_translation(self):
         """Return a deep copy of the translation between string IDs and their associated indices."""
         return copy.deepcopy(self._translation)
 
+    def read_warm_start(self, results):
+        """Return the solution selected in previous results, to warm start the solving process.
+
+        The indexes are matched by OID: those that are no longer part of the problem are ignored,
+        and the new ones are not selected. The existing indexes are always selected.
+
+        Args:
+          results: The serialized results JSON object of a previous run (only its "Indexes" section
+            is used).
+
+        Returns:
+          A 0-1 tuple of the indexes.
+        """
+        indexes = json.loads(results)["Indexes"]
+
+        solution = [int(index < self.get_num_eind()) for index in range(self.get_num_indexes())]
+        for section in ("Existing Indexes", "Possible Indexes"):
+            for element in indexes.get(section, []):
+                index = self.get_index_position(element["Index OID"])
+                if element["Selected"] and index is not None:
+                    solution[index] = 1
+
+        return tuple(solution)
+
+    def _make_mutable(self):
+        """Prepare the problem data for changes (see the add_*(), remove_*() and set_*() methods).
+
+        The positions of the scans and indexes never change: a removed scan or index is left in
+        place, without any ID, cost or IWO.
+        """
+        if isinstance(self._problem["Index Costs"], costs.PatchedCostMatrix):
+            return
+
+        self._key = None
+
+        self._problem["Sequential Scan Costs"] = list(self._problem["Sequential Scan Costs"])
+        self._problem["Index IWOs"] = list(self._problem["Index IWOs"])
+        self._problem["Index Costs"] = costs.PatchedCostMatrix(self._problem["Index Costs"])
+        self._problem["Index Costs (B)"] = costs.CostMatrixView(self._problem["Index Costs"], "B")
+        self._problem["Index Costs (R)"] = costs.CostMatrixView(self._problem["Index Costs"],
+                                                                "R",
+                                                                self._problem["Sequential Scan Costs"])
+        self._translation["Scan IDs"] = list(self._translation["Scan IDs"])
+        self._translation["Index OIDs"] = list(self._translation["Index OIDs"])
+        if self._translation["Group Names"] is not None:
+            self._translation["Group Names"] = list(self._translation["Group Names"])
+
+    def _append_group(self, kind, group):
+        """Record the group of a new scan or index ("Scan Groups" or "Index Groups"), before it is
+        added.
+
+        The scans and indexes of a problem that was not grouped become part of the None group.
+        """
+        if self._translation["Group Names"] is None:
+            if group is None:
+                return
+            self._translation["Group Names"] = [None]
+            self._translation["Scan Groups"] = array("I", [0] * self.get_num_scans())
+            self._translation["Index Groups"] = array("I", [0] * self.get_num_indexes())
+
+        names = self._translation["Group Names"]
+        if group not in names:
+            names.append(group)
+        self._translation[kind].append(names.index(group))
+
+    def _get_known_scan(self, scan_id):
+        """Return the position of a scan from its ID, which must be known."""
+        scan = self.get_scan_position(scan_id)
+        assert scan is not None, f"Unknown scan: {scan_id}"
+        return scan
+
+    def _get_known_index(self, index_oid):
+        """Return the position of an index from its OID, which must be known."""
+        index = self.get_index_position(index_oid)
+        assert index is not None, f"Unknown index: {index_oid}"
+        return index
+
+    def add_scan(self, scan_id, sequential_cost, index_costs, group=None):
+        """Add a scan to the problem.
+
+        Args:
+          scan_id: The ID of the new scan.
+          sequential_cost: Its sequential cost.
+          index_costs: Dictionary of the costs offered by known indexes to the scan, by OID.
+          group: The name of its group (e.g., its table), None if it has none.
+
+        Returns:
+          The position of the scan.
+        """
+        assert self.get_scan_position(scan_id) is None, f"Known scan: {scan_id}"
+        self._make_mutable()
+
+        self._append_group("Scan Groups", group)
+        scan = self._problem["Index Costs"].add_scan()
+        self._translation["Scan IDs"].append(scan_id)
+        self._translation["Scan Positions"][scan_id] = scan
+        self._problem["Sequential Scan Costs"].append(self._upscale(sequential_cost))
+        for index_oid, cost in index_costs.items():
+            self.set_index_cost(index_oid, scan_id, cost)
+
+        return scan
+
+    def remove_scan(self, scan_id):
+        """Remove a scan from the problem, and return its position."""
+        scan = self._get_known_scan(scan_id)
+        self._make_mutable()
+
+        matrix = self._problem["Index Costs"]
+        for index in matrix.get_scan_entries(scan)[0]:
+            matrix.set_cost(index, scan, None)
+        self._problem["Sequential Scan Costs"][scan] = 0
+        self._translation["Scan IDs"][scan] = None
+        del self._translation["Scan Positions"][scan_id]
+
+        return scan
+
+    def set_scan_cost(self, scan_id, sequential_cost):
+        """Change the sequential cost of a scan, and return its position.
+
+        The index costs that are no longer better than the new sequential cost are dropped (those
+        already dropped when the problem was read are not restored if the cost increases).
+        """
+        scan = self._get_known_scan(scan_id)
+        self._make_mutable()
+
+        read_cost = self._upscale(sequential_cost)
+        self._problem["Sequential Scan Costs"][scan] = read_cost
+        matrix = self._problem["Index Costs"]
+        for index, cost in zip(*matrix.get_scan_entries(scan)):
+            if cost >= read_cost:
+                matrix.set_cost(index, scan, None)
+
+        return scan
+
+    def set_index_cost(self, index_oid, scan_id, cost):
+        """Change the cost offered by an index to a scan, and return the position of the scan.
+
+        A cost of None (or not better than the sequential cost of the scan) means that the index
+        does not cover the scan.
+        """
+        scan = self._get_known_scan(scan_id)
+        index = self._get_known_index(index_oid)
+        assert cost is None or self.get_index_group(index) == self.get_scan_group(scan), \
+            f"Index {index_oid} covers scan {scan_id} of another group"
+        self._make_mutable()
+
+        if cost is not None:
+            cost = self._upscale(cost)
+            if cost >= self._problem["Sequential Scan Costs"][scan]:
+                cost = None
+        self._problem["Index Costs"].set_cost(index, scan, cost)
+
+        return scan
+
+    def add_index(self, index_oid, iwo, scan_costs, group=None):
+        """Add a possible index to the problem.
+
+        Args:
+          index_oid: The OID of the new index.
+          iwo: Its index write overhead.
+          scan_costs: Dictionary of the costs it offers to known scans, by scan ID.
+          group: The name of its group (e.g., its table), None if it has none.
+
+        Returns:
+          The position of the index.
+        """
+        assert self.get_index_position(index_oid) is None, f"Known index: {index_oid}"
+        self._make_mutable()
+
+        self._append_group("Index Groups", group)
+        index = self._problem["Index Costs"].add_index()
+        self._translation["Index OIDs"].append(index_oid)
+        self._translation["Index Positions"][index_oid] = index
+        self._problem["Index IWOs"].append(self._upscale(iwo))
+        self._problem["Number of Possible Indexes"] += 1
+        for scan_id, cost in scan_costs.items():
+            self.set_index_cost(index_oid, scan_id, cost)
+
+        self._read_rules(self._settings["Rules"])
+        return index
+
+    def remove_index(self, index_oid):
+        """Remove a possible index from the problem, and return its position."""
+        index = self._get_known_index(index_oid)
+        assert index >= self.get_num_eind(), f"Existing index: {index_oid}"
+        self._make_mutable()
+
+        matrix = self._problem["Index Costs"]
+        for scan in matrix.get_index_entries(index)[0]:
+            matrix.set_cost(index, scan, None)
+        self._problem["Index IWOs"][index] = 0
+        self._translation["Index OIDs"][index] = None
+        del self._translation["Index Positions"][index_oid]
+
+        self._read_rules(self._settings["Rules"])
+        return index
+
+    def set_index_iwo(self, index_oid, iwo):
+        """Change the index write overhead of an index, and return its position."""
+        index = self._get_known_index(index_oid)
+        self._make_mutable()
+
+        self._problem["Index IWOs"][index] = self._upscale(iwo)
+
+        self._read_rules(self._settings["Rules"])
+        return index
+
+    def set_rule(self, name, value):
+        """Change the value of a rule (None to remove the rule)."""
+        assert name in ("Maximum Number of Possible Indexes", "Maximum IWO"), f"Unknown rule: {name}"
+
+        rules = dict(self._settings["Rules"])
+        if value is None:
+            rules.pop(name, None)
+        else:
+            rules[name] = value
+        self._read_rules(rules)
+
     def add_solution(self, goal, solution):
         """Add the solution of a goal to the list of solutions."""
         self._solutions[goal] = solution
 
+    def add_group_solution(self, group, solution):
+        """Add the details of the solution of a group solved separately (its position in
+        get_groups()), reported with the statistics of the group."""
+        self._group_solutions[group] = solution
+
     def _read_problem(self, problem):
         """Read the problem data from a serialized JSON object."""
-        self._build_translation(problem)
-
-        self._problem["Number of Existing Indexes"] = len(problem["Existing Indexes"])
-        self._problem["Number of Possible Indexes"] = len(problem["Possible Indexes"])
+        self._load_problem((section, element)
+                           for section in ("Scans", "Existing Indexes", "Possible Indexes")
+                           for element in problem[section])
 
-        self._problem["Sequential Scan Costs"] = \
-            [None for _ in range(len(self._translation["Scan IDs"]))]
-        self._problem["Index Costs"] = \
-            [[None for _ in range(len(self._translation["Scan IDs"]))]
-             for _ in range(len(self._translation["Index OIDs"]))]
-        self._problem["Index IWOs"] = \
-            [None for _ in range(len(self._translation["Index OIDs"]))]
+    def _read_problem_stream(self, file):
+        """Read the problem data from a text file object containing a serialized JSON object."""
+        self._load_problem(jsonstream.iter_arrays(file))
 
-        # There must be at least one possible index, otherwise there is no problem to solve
-        assert len(self._problem["Index IWOs"]) > self.get_num_eind()
+    def _load_problem(self, elements):
+        """Load the problem data from its elements, in any order.
 
-        # Extract relevant data from the scans
-        for scan in problem["Scans"]:
-            scan_idx = self._translation["Scan IDs"].index(scan["Scan ID"])
-            scan_sequential_cost = self._upscale(scan["Sequential Scan Cost"])
-            self._problem["Sequential Scan Costs"][scan_idx] = scan_sequential_cost
+        Scans and indexes may name their "Group" (e.g., their table or database), an index only
+        covering the scans of its own group.
 
-            for index in scan["Existing Index Costs"] + scan["Possible Index Costs"]:
-                index_idx = self._translation["Index OIDs"].index(index["Index OID"])
+        Args:
+          elements: An iterable of tuples (section, element), where section is one of "Scans",
+            "Existing Indexes" or "Possible Indexes" (other sections are ignored).
+        """
+        scan_ids = []
+        sequential_costs = []
+        index_oids = {"Existing Indexes": [], "Possible Indexes": []}
+        index_iwos = {"Existing Indexes": [], "Possible Indexes": []}
+
+        # Position of each group name, in the order encountered (None for the elements without one)
+        group_codes = {}
+        scan_groups = array("I")
+        index_groups = {"Existing Indexes": array("I"), "Possible Indexes": array("I")}
+
+        # Index costs entries (scan, index, cost), only kept if the index covers the scan. The
+        # indexes may only be listed after the scans, so entries first refer to the order in which
+        # the OIDs are encountered.
+        entry_scans = array("I")
+        entry_oids = array("I")
+        entry_costs = array("q")
+        oid_order = {}
+
+        for section, element in elements:
+            if section == "Scans":
+                # Ignore scans that have no sequential cost
+                if element["Sequential Scan Cost"] is None:
+                    continue
 
-                cost = self._upscale(index["Cost"])
+                scan_idx = len(scan_ids)
+                scan_ids.append(element["Scan ID"])
+                scan_groups.append(group_codes.setdefault(element.get("Group"), len(group_codes)))
+                scan_sequential_cost = self._upscale(element["Sequential Scan Cost"])
+                sequential_costs.append(scan_sequential_cost)
+
+                scan_costs = {}
+                for index in element["Existing Index Costs"] + element["Possible Index Costs"]:
+                    cost = self._upscale(index["Cost"])
+
+                    # If the index cost is not better than the sequential scan cost, ignore it
+                    if cost >= scan_sequential_cost:
+                        continue
+
+                    # If we reach this point, the cost offered by the index is good for this scan
+                    scan_costs[oid_order.setdefault(index["Index OID"], len(oid_order))] = cost
+
+                entry_scans.extend([scan_idx] * len(scan_costs))
+                entry_oids.extend(scan_costs.keys())
+                entry_costs.extend(scan_costs.values())
+
+            elif section in index_oids:
+                index_oids[section].append(element["Index"]["Index OID"])
+                index_iwos[section].append(self._upscale(element["Index Write Overhead"]))
+                index_groups[section].append(group_codes.setdefault(element.get("Group"),
+                                                                    len(group_codes)))
+
+        groups = None
+        if any(name is not None for name in group_codes):
+            groups = (list(group_codes),
+                      scan_groups,
+                      index_groups["Existing Indexes"] + index_groups["Possible Indexes"])
+        self._build_translation(scan_ids,
+                                index_oids["Existing Indexes"] + index_oids["Possible Indexes"],
+                                groups)
+
+        self._problem["Number of Existing Indexes"] = len(index_oids["Existing Indexes"])
+        self._problem["Number of Possible Indexes"] = len(index_oids["Possible Indexes"])
+        self._problem["Sequential Scan Costs"] = sequential_costs
+        self._problem["Index IWOs"] = index_iwos["Existing Indexes"] + index_iwos["Possible Indexes"]
 
-                # If the index cost is not better than the sequential scan cost, ignore it
-                if cost >= scan_sequential_cost:
-                    continue
+        # There must be at least one possible index, otherwise there is no problem to solve
+        assert len(self._problem["Index IWOs"]) > self.get_num_eind()
 
-                # If we reach this point, the cost offered by the index is good for this scan
-                self._problem["Index Costs"][index_idx][scan_idx] = cost
-
-        # Extract relevant data from the indexes
-        for index in problem["Existing Indexes"] + problem["Possible Indexes"]:
-            index_idx = self._translation["Index OIDs"].index(index["Index"]["Index OID"])
-            self._problem["Index IWOs"][index_idx] = self._upscale(index["Index Write Overhead"])
-
-        # Build the index cost matrices of type B (a covered scan has a cost of 1, an uncovered scan
-        # has a cost of 0)
-        self._problem["Index Costs (B)"] = \
-            copy.deepcopy(self._problem["Index Costs"])
-        for i, row in enumerate(self._problem["Index Costs (B)"]):
-            for j, value in enumerate(row):
-                if value is not None:
-                    self._problem["Index Costs (B)"][i][j] = 1
-                else:
-                    self._problem["Index Costs (B)"][i][j] = 0
-
-        # Build the index cost matrices of type R (a covered scan has the cost provided by the
-        # index, an uncovered scan has the sequential cost)
-        self._problem["Index Costs (R)"] = \
-            copy.deepcopy(self._problem["Index Costs"])
-        for i, row in enumerate(self._problem["Index Costs (R)"]):
-            for j, value in enumerate(row):
-                if value is None:
-                    self._problem["Index Costs (R)"][i][j] = \
-                        self._problem["Sequential Scan Costs"][j]
-
-    def _build_translation(self, problem):
+        # Every index referenced by a scan must be listed
+        oid_positions = array("I", bytes(entry_oids.itemsize * len(oid_order)))
+        for oid, order in oid_order.items():
+            oid_positions[order] = self._translation["Index Positions"][oid]
+        entry_indexes = array("I", (oid_positions[order] for order in entry_oids))
+        del entry_oids
+
+        if groups is not None:
+            for index, scan in zip(entry_indexes, entry_scans):
+                assert groups[2][index] == groups[1][scan], \
+                    f"Index {self.get_index_oid(index)} covers scan {scan_ids[scan]} of another group"
+
+        self._problem["Index Costs"] = costs.CostMatrix(len(self._translation["Index OIDs"]),
+                                                        len(self._translation["Scan IDs"]),
+                                                        entry_indexes,
+                                                        entry_scans,
+                                                        entry_costs)
+
+        # Views of the index costs of type B (a covered scan has a cost of 1, an uncovered scan has
+        # a cost of 0) and of type R (a covered scan has the cost provided by the index, an
+        # uncovered scan has the sequential cost)
+        self._problem["Index Costs (B)"] = costs.CostMatrixView(self._problem["Index Costs"], "B")
+        self._problem["Index Costs (R)"] = costs.CostMatrixView(self._problem["Index Costs"],
+                                                                "R",
+                                                                self._problem["Sequential Scan Costs"])
+
+    def _load_cached_problem(self, problem, scan_ids, index_oids, groups=None):
+        """Load the problem data as previously stored in a ProblemCache."""
+        self._build_translation(scan_ids, index_oids, groups)
+
+        self._problem.update(problem)
+        self._problem["Index Costs (B)"] = costs.CostMatrixView(self._problem["Index Costs"], "B")
+        self._problem["Index Costs (R)"] = costs.CostMatrixView(self._problem["Index Costs"],
+                                                                "R",
+                                                                self._problem["Sequential Scan Costs"])
+
+    def _build_translation(self, scan_ids, index_oids, groups=None):
         """Build the correspondence between string IDs and their associated integer indices.
 
         self._translation["Scan IDs"] = ["012-345-6789", "987-654-3210", ...]
         self._translation["Indexes OIDs"] = [00001, 00002, ...]
+
+        The reverse lookups (e.g., self._translation["Scan Positions"]["987-654-3210"] == 1) are
+        hashed so that reading the problem is linear in the number of cost entries.
+
+        The groups, if any, are a tuple (group names, group of each scan, group of each index), the
+        groups being positions in the names (see _get_group_arrays()).
         """
-        # Ignore scans that have no sequential cost
-        self._translation["Scan IDs"] = tuple(scan["Scan ID"] for scan in problem["Scans"]
-                                              if scan["Sequential Scan Cost"] is not None)
-        self._translation["Index OIDs"] = tuple(index["Index"]["Index OID"]
-                                                for index in problem["Existing Indexes"] +
-                                                problem["Possible Indexes"])
-
-    def _read_settings(self, settings):
+        self._translation["Scan IDs"] = tuple(scan_ids)
+        self._translation["Index OIDs"] = tuple(index_oids)
+
+        self._translation["Group Names"] = None
+        if groups is not None:
+            self._translation["Group Names"] = tuple(groups[0])
+            self._translation["Scan Groups"] = array("I", groups[1])
+            self._translation["Index Groups"] = array("I", groups[2])
+
+        self._translation["Scan Positions"] = {scan_id: scan
+                                               for scan, scan_id
+                                               in enumerate(self._translation["Scan IDs"])}
+        self._translation["Index Positions"] = {index_oid: index
+                                                for index, index_oid
+                                                in enumerate(self._translation["Index OIDs"])}
+
+    def _get_group_arrays(self):
+        """Return the groups as a tuple (group names, group of each scan, group of each index), None
+        if the problem is not grouped."""
+        if self._translation["Group Names"] is None:
+            return None
+        return (list(self._translation["Group Names"]),
+                self._translation["Scan Groups"],
+                self._translation["Index Groups"])
+
+    def _read_settings(self, settings, solver_parameters=None, formulation=None):
         """Read the optimizer settings from a serialized JSON object.
 
         Provides default values if necessary.
@@ -310,11 +748,30 @@ class Reader:
                                         "Strictness": 1}]
 
         # Rules
-        if "Rules" in settings:
-            rules = settings["Rules"]
-        else:
-            rules = {}
+        self._read_rules(settings.get("Rules", {}))
+
+        # Formulation of the model (see modelize.FORMULATIONS)
+        self._settings["Formulation"] = formulation or settings.get("Formulation", "Minimum")
+        assert self._settings["Formulation"] in ("Minimum", "Assignment"), \
+            f"Unknown formulation: {self._settings['Formulation']}"
+
+        # Solver parameters: the defaults, then the settings, then the caller, then each goal
+        parameters = {"Workers": modelize.get_num_cpus()}
+        parameters.update(self._solver_parameters)
+        parameters.update(settings.get("Solver Parameters", {}))
+        parameters.update(solver_parameters or {})
+        self._check_solver_parameters(parameters)
+        self._settings["Solver Parameters"] = parameters
+
+        self._settings["Goal Solver Parameters"] = []
+        for goal in self._settings["Goals"]:
+            goal_parameters = dict(parameters)
+            goal_parameters.update(goal.get("Solver Parameters", {}))
+            self._check_solver_parameters(goal_parameters)
+            self._settings["Goal Solver Parameters"].append(goal_parameters)
 
+    def _read_rules(self, rules):
+        """Read the rules of the optimizer settings, with default values for those omitted."""
         # Default rules if omitted (unconstrained)
         if "Maximum Number of Possible Indexes" in rules:
             # If the maximum number of possible indexes is <= 0, there is no solution
@@ -327,9 +784,19 @@ class Reader:
         if "Maximum IWO" in rules:
             # If the maximum IWO is lower than the combined IWO of the existing indexes, no solution
             # exists
-            assert self._upscale(rules["Maximum IWO"]) > sum(self._problem["Index IWOs"][self.get_num_eind()])
+            assert self._upscale(rules["Maximum IWO"]) > sum(self._problem["Index IWOs"][:self.get_num_eind()])
             self._settings["Maximum IWO"] = self._upscale(rules["Maximum IWO"])
         else:
             self._settings["Maximum IWO"] = sum(self._problem["Index IWOs"])
 
         self._settings["Rules"] = rules
+
+    def _check_solver_parameters(self, parameters):
+        """Check that the solver parameters are known and valid."""
+        assert set(parameters) <= set(self._solver_parameters) | {"Workers"}
+        assert isinstance(parameters["Workers"], int) and parameters["Workers"] >= 1
+        assert isinstance(parameters["Seed"], int)
+        assert parameters["Relative Gap"] >= 0
+        assert parameters["Absolute Gap"] >= 0
+        assert parameters["Presolve Level"] in (0, 1, 2, 3)
+        assert parameters["Linearization Level"] in (0, 1, 2)
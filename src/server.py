@@ -0,0 +1,223 @@
+"""Long-running solver service, answering requests read as JSON lines.
+
+Each line read from the standard input is a request in the form:
+
+    {"ID": 1, "Data": {...}, "Settings": {...}, "Time Limit": 10, "Time Budget": 30}
+
+where "Data" and "Settings" are the usual data and settings JSON objects (or their serializations),
+and "Settings", "Time Limit" (for each goal) and "Time Budget" (for the whole request, once a
+worker starts solving it) are optional. Each request is answered by one line on the standard
+output, in the order the requests complete:
+
+    {"ID": 1, "Status": "OK", "Results": {...}, "Time": 0.42}
+    {"ID": 2, "Status": "Error", "Error": "...", "Time": 0.01}
+
+The requests are solved by a pool of worker processes that import OR-Tools once and live as long as
+the server, so that a request only pays for its own solving.
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import json
+import sys
+import threading
+import time
+
+import cache
+import cli
+import modelize
+
+
+def _initialize_worker():
+    """Prepare a worker process (the standard output is reserved for the responses)."""
+    sys.stdout = sys.stderr
+
+    # Loaded once per worker rather than once per request
+    import optimizer  # noqa: F401
+    import reader  # noqa: F401
+
+
+def _serialize(value):
+    """Return a JSON object serialized, unless it already is."""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def solve_request(request, time_limit, jobs=1, problem_cache=None, num_workers=None):
+    """Solve one request and return the results.
+
+    Args:
+      request: The request (dictionary), see the module documentation.
+      time_limit: The time limit in seconds for each goal, unless the request provides one.
+      jobs: Number of processes solving independent sub-problems of the request.
+      problem_cache: ProblemCache used to avoid reading the same data again (no caching if None).
+      num_workers: Number of solver workers (as set by the settings of the request if None).
+
+    Returns:
+      The results of the solving process (dictionary).
+    """
+    import optimizer
+    import reader
+
+    start = time.perf_counter()
+
+    assert "Data" in request, "Missing data"
+    time_limit = float(request.get("Time Limit", time_limit))
+    assert time_limit >= 0, "Invalid time limit"
+    time_budget = request.get("Time Budget")
+    assert time_budget is None or time_budget > 0, "Invalid time budget"
+
+    settings_json = None
+    if request.get("Settings") is not None:
+        settings_json = _serialize(request["Settings"])
+
+    solver_parameters = None
+    if num_workers is not None:
+        solver_parameters = {"Workers": num_workers}
+
+    rdr = reader.Reader(_serialize(request["Data"]),
+                        time_limit,
+                        settings_json,
+                        problem_cache,
+                        solver_parameters)
+    if time_budget is not None:
+        time_budget -= time.perf_counter() - start
+
+    opt = optimizer.Optimizer(rdr,
+                              0,
+                              jobs=jobs,
+                              time_budget=time_budget)
+
+    return opt.get_results()
+
+
+def _respond(request_id, start, results=None, error=None):
+    """Return the response to a request."""
+    response = {"ID": request_id}
+    if error is None:
+        response["Status"] = "OK"
+        response["Results"] = results
+    else:
+        response["Status"] = "Error"
+        response["Error"] = error
+    response["Time"] = round(time.perf_counter() - start, 3)
+    return response
+
+
+class Server:
+    """Solver service reading requests from a file and writing the responses to another."""
+
+    def __init__(self, time_limit, concurrency=None, jobs=1, problem_cache=None):
+        """Initialize the server.
+
+        Args:
+          time_limit: The default time limit in seconds for each goal of a request.
+          concurrency: Maximum number of requests solved at the same time (the number of CPUs if
+            None).
+          jobs: Number of processes solving independent sub-problems of each request.
+          problem_cache: ProblemCache used to avoid reading the same data again (no caching if None).
+        """
+        self._time_limit = time_limit
+        self._concurrency = modelize.get_num_cpus() if concurrency is None else concurrency
+        self._jobs = jobs
+        self._cache = problem_cache
+
+        assert self._concurrency >= 1
+
+        # The cores are divided between the requests solved at the same time
+        self._num_workers = max(1, modelize.get_num_cpus() // self._concurrency)
+
+        # Requests waiting for a worker count too, so that a fast client cannot pile them up
+        self._slots = threading.BoundedSemaphore(2 * self._concurrency)
+        self._output_lock = threading.Lock()
+        self._executor = None
+
+    def _start_executor(self):
+        """Start (or restart, if a worker died) the pool of worker processes."""
+        # A broken pool has already failed its requests and stopped its processes: shutting it
+        # down only waits for them to be reaped
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = ProcessPoolExecutor(max_workers=self._concurrency,
+                                             initializer=_initialize_worker)
+
+    def _write(self, output, response):
+        """Write a response as a single line."""
+        line = json.dumps(response)
+        with self._output_lock:
+            output.write(line + "\n")
+            output.flush()
+
+    def _submit(self, line, output):
+        """Submit the request of a line to the workers, or answer it directly if it is invalid."""
+        start = time.perf_counter()
+
+        try:
+            request = json.loads(line)
+            assert isinstance(request, dict), "A request must be a JSON object"
+        except (ValueError, AssertionError) as e:
+            self._write(output, _respond(None, start, error=f"Invalid request: {e}"))
+            return
+
+        request_id = request.get("ID")
+
+        def _done(future):
+            try:
+                try:
+                    response = _respond(request_id, start, results=future.result())
+                except BrokenProcessPool:
+                    response = _respond(request_id, start, error="The worker solving the request died")
+                except Exception as e:
+                    response = _respond(request_id, start, error=f"{type(e).__name__}: {e}")
+                self._write(output, response)
+            finally:
+                self._slots.release()
+
+        def _submit_request():
+            return self._executor.submit(solve_request,
+                                         request,
+                                         self._time_limit,
+                                         self._jobs,
+                                         self._cache,
+                                         self._num_workers)
+
+        self._slots.acquire()
+        try:
+            try:
+                future = _submit_request()
+            except BrokenProcessPool:
+                self._start_executor()
+                future = _submit_request()
+        except Exception as e:
+            self._slots.release()
+            self._write(output, _respond(request_id,
+                                         start,
+                                         error=f"The request could not be submitted: "
+                                               f"{type(e).__name__}: {e}"))
+            return
+        future.add_done_callback(_done)
+
+    def serve(self, input_file, output_file):
+        """Answer the requests read from a file, one per line, until the end of the file."""
+        self._start_executor()
+        try:
+            for line in input_file:
+                if line.strip():
+                    self._submit(line, output_file)
+        finally:
+            self._executor.shutdown(wait=True)
+
+
+if __name__ == "__main__":
+    cli_args = cli.get_server_args()
+
+    problem_cache = None
+    if cli_args["Cache Directory"] is not None:
+        problem_cache = cache.ProblemCache(cli_args["Cache Directory"],
+                                           round(cli_args["Cache Size"] * 1024 * 1024))
+
+    server = Server(cli_args["Time Limit"],
+                    cli_args["Concurrency"],
+                    cli_args["Jobs"],
+                    problem_cache)
+    server.serve(sys.stdin, sys.stdout)
@@ -0,0 +1,207 @@
+"""Incremental solving session, for workloads that change a few scans or indexes at a time.
+
+The problem data and its model stay in memory between solves, and are updated by small changes
+(deltas) rather than read and built again: a change costs as much as the entries of the scans and
+indexes it touches, and each solve starts from the previous solution. Deltas can also be given as
+dictionaries (e.g., read from JSON lines), in the form:
+
+    {"Action": "Add Scan", "Scan ID": "s-7", "Sequential Scan Cost": 120.5,
+     "Index Costs": [{"Index OID": 12, "Cost": 4.2}], "Group": "orders"}
+    {"Action": "Remove Scan", "Scan ID": "s-7"}
+    {"Action": "Set Scan Cost", "Scan ID": "s-3", "Sequential Scan Cost": 80.0}
+    {"Action": "Set Index Cost", "Index OID": 12, "Scan ID": "s-3", "Cost": 4.2}
+    {"Action": "Add Index", "Index OID": 31, "Index Write Overhead": 0.4,
+     "Scan Costs": [{"Scan ID": "s-3", "Cost": 2.5}]}
+    {"Action": "Remove Index", "Index OID": 31}
+    {"Action": "Set Index IWO", "Index OID": 12, "Index Write Overhead": 0.2}
+    {"Action": "Set Rule", "Rule": "Maximum IWO", "Value": 3.5}
+
+where a "Cost" of null means that the index does not cover the scan, a "Value" of null removes the
+rule, and the "Group" of an added scan or index is optional (see Reader.add_scan()).
+"""
+
+
+import goal
+import modelize
+import reader
+import stats
+
+
+# The model is built again once the constraints removed from it (after changes of the scans and
+# between solves) outnumber the constraints it still uses
+_REBUILD_RATIO = 1.0
+
+
+class Session:
+    """Problem, model and last solution kept between solves."""
+
+    def __init__(self, problem, time_limit, settings=None, solver_parameters=None):
+        """Read the problem data and the optimizer settings (see reader.Reader()).
+
+        Args:
+          problem: The serialized "Explain" JSON object (string), or a text file object to stream it
+            from.
+          time_limit: The time limit in seconds for each goal.
+          settings: The serialized optimizer settings JSON object (string).
+          solver_parameters: Solver parameters taking precedence over those of the settings (see
+            modelize.solve_model()).
+        """
+        self._reader = reader.Reader(problem, time_limit, settings, solver_parameters=solver_parameters)
+        self._model = None          # Built by the first solve
+        self._solution = None       # Last solution, which the next solve starts from
+        self._stale_rules = False   # If the rule constraints of the model must be replaced
+
+    def _update_scan(self, scan):
+        """Replace the constraints of a scan (its position) in the model, after it changed."""
+        if self._model is not None:
+            modelize.set_scan(self._model,
+                              scan,
+                              self._reader.get_read_cost(scan),
+                              *self._reader.get_index_costs().get_scan_entries(scan))
+
+    def add_scan(self, scan_id, sequential_cost, index_costs, group=None):
+        """Add a scan (see Reader.add_scan())."""
+        self._update_scan(self._reader.add_scan(scan_id, sequential_cost, index_costs, group))
+
+    def remove_scan(self, scan_id):
+        """Remove a scan."""
+        self._update_scan(self._reader.remove_scan(scan_id))
+
+    def set_scan_cost(self, scan_id, sequential_cost):
+        """Change the sequential cost of a scan (see Reader.set_scan_cost())."""
+        self._update_scan(self._reader.set_scan_cost(scan_id, sequential_cost))
+
+    def set_index_cost(self, index_oid, scan_id, cost):
+        """Change the cost offered by an index to a scan (None if it does not cover the scan)."""
+        self._update_scan(self._reader.set_index_cost(index_oid, scan_id, cost))
+
+    def add_index(self, index_oid, iwo, scan_costs, group=None):
+        """Add a possible index (see Reader.add_index())."""
+        index = self._reader.add_index(index_oid, iwo, scan_costs, group)
+        if self._model is not None:
+            modelize.add_index(self._model)
+            for scan in self._reader.get_index_costs().get_index_entries(index)[0]:
+                self._update_scan(scan)
+        self._stale_rules = True
+
+    def remove_index(self, index_oid):
+        """Remove a possible index."""
+        index = self._reader.remove_index(index_oid)
+        if self._model is not None:
+            modelize.remove_index(self._model, index)
+        self._stale_rules = True
+
+    def set_index_iwo(self, index_oid, iwo):
+        """Change the index write overhead of an index."""
+        self._reader.set_index_iwo(index_oid, iwo)
+        self._stale_rules = True
+
+    def set_rule(self, name, value):
+        """Change the value of a rule (None to remove the rule)."""
+        self._reader.set_rule(name, value)
+        self._stale_rules = True
+
+    def apply(self, delta):
+        """Apply a delta given as a dictionary (see the module documentation)."""
+        action = delta["Action"]
+        if action == "Add Scan":
+            self.add_scan(delta["Scan ID"],
+                          delta["Sequential Scan Cost"],
+                          {entry["Index OID"]: entry["Cost"] for entry in delta.get("Index Costs", [])},
+                          delta.get("Group"))
+        elif action == "Remove Scan":
+            self.remove_scan(delta["Scan ID"])
+        elif action == "Set Scan Cost":
+            self.set_scan_cost(delta["Scan ID"], delta["Sequential Scan Cost"])
+        elif action == "Set Index Cost":
+            self.set_index_cost(delta["Index OID"], delta["Scan ID"], delta["Cost"])
+        elif action == "Add Index":
+            self.add_index(delta["Index OID"],
+                           delta["Index Write Overhead"],
+                           {entry["Scan ID"]: entry["Cost"] for entry in delta.get("Scan Costs", [])},
+                           delta.get("Group"))
+        elif action == "Remove Index":
+            self.remove_index(delta["Index OID"])
+        elif action == "Set Index IWO":
+            self.set_index_iwo(delta["Index OID"], delta["Index Write Overhead"])
+        elif action == "Set Rule":
+            self.set_rule(delta["Rule"], delta["Value"])
+        else:
+            raise ValueError(f"Unknown action: {action}")
+
+    def _prepare_model(self):
+        """Build the model, or bring the one of the previous solve up to date."""
+        model = self._model
+        if model is not None:
+            num_used = modelize.get_num_constraints(model) - model.num_cleared
+            if model.num_cleared > _REBUILD_RATIO * num_used:
+                model = None
+
+        if model is None:
+            self._model = modelize.build_basic_model(self._reader.get_problem(),
+                                                     self._reader.get_settings())
+        elif self._stale_rules:
+            modelize.set_rules(model,
+                               self._reader.get_maximum_num_indexes(),
+                               self._reader.get_maximum_iwo(),
+                               self._reader.get_index_iwo())
+        self._stale_rules = False
+
+    def _get_warm_start(self):
+        """Return the previous solution, as a solution of the current problem (None if there is no
+        previous solution, or if it breaks the current rules)."""
+        if self._solution is None:
+            return None
+
+        # The indexes added since are not selected, the removed ones no longer can be
+        num_indexes = self._reader.get_num_indexes()
+        solution = list(self._solution) + [0] * (num_indexes - len(self._solution))
+        for index in range(self._reader.get_num_eind(), num_indexes):
+            if self._reader.get_index_oid(index) is None:
+                solution[index] = 0
+
+        num_pind = sum(solution) - self._reader.get_num_eind()
+        if num_pind > self._reader.get_maximum_num_indexes() or \
+                stats.total_iwo(self._reader, solution) > self._reader.get_maximum_iwo():
+            return None
+        return tuple(solution)
+
+    def solve(self):
+        """Optimize the goals on the current problem, starting from the previous solution.
+
+        Returns:
+          The results of the solving process (see Reader.get_results()).
+        """
+        self._prepare_model()
+        model = self._model
+
+        settings = self._reader.get_settings()
+        goals = [goal.Goal(gl["Name"], gl.get("Strictness", 1)) for gl in settings["Goals"]]
+        solution = self._get_warm_start()
+        goal_constraints = []  # Only hold for this solve
+        for i, gl in enumerate(goals):
+            if i > 0:
+                goal_constraints.extend(modelize.add_goal_constraint(model, goals[i - 1]))
+
+            results = modelize.solve_goal(model,
+                                          gl,
+                                          self._reader.get_time_limit(),
+                                          solution,
+                                          self._reader.get_solver_parameters(i))
+            solution = tuple(results["Indexes"])
+            gl.update_value(results["Objective Value"])
+            self._reader.add_solution(gl.get_name(),
+                                      {"Objective Value": results["Objective Value"],
+                                       "Objective Value (Real)": stats.compute_objective(self._reader,
+                                                                                         gl.get_name(),
+                                                                                         solution),
+                                       "Best Bound (Real)": stats.to_real_objective(self._reader,
+                                                                                    gl.get_name(),
+                                                                                    results["Best Bound"]),
+                                       "Status": results["Status"],
+                                       "x": solution})
+
+        modelize.remove_constraints(model, goal_constraints)
+        self._solution = solution
+
+        return self._reader.get_results()
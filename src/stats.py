@@ -1,42 +1,89 @@
 """Infer statistics from a solution."""
 
 
-def total_coverage(rdr,
-                   solution):
-    """Return the number of scans covered by indexes in the solution."""
-    num_scans = rdr.get_num_scans()
-    scan_read_costs = rdr.get_read_costs()
+def evaluate(rdr,
+             solution):
+    """Evaluate a solution in a single pass over the scans covered by its selected indexes.
+
+    Args:
+      rdr: The Reader holding the problem data.
+      solution: A 0-1 sequence indicating which indexes are selected.
+
+    Returns:
+      A dictionary of the evaluation (costs and IWO are upscaled), in the form:
+      - Scan Costs: The cost of each scan.
+      - Best Covered By: The index offering the best cost to each scan (None if not covered).
+      - Coverage: Number of scans covered (Total, Existing, Possible, Uncovered).
+      - Cost: Combined (Total) and highest (Maximum) costs of the scans.
+      - Indexes Used: Number of indexes selected (Total, Existing, Possible).
+      - Index Write Overhead: Combined IWO of the selected indexes (Total, Existing, Possible).
+    """
+    num_eind = rdr.get_num_eind()
+    index_costs = rdr.get_index_costs()
+    index_iwo = rdr.get_index_iwo()
 
-    coverage = 0
-    for scan in range(num_scans):
-        scan_cost = cost_of_scan(rdr,
-                                 solution,
-                                 scan)
+    scan_costs = list(rdr.get_read_costs())
+    best_covered = [None for _ in range(len(scan_costs))]
 
-        # If the scan cost is lower than the reading cost, then the scan is covered
-        if scan_cost < scan_read_costs[scan]:
-            coverage += 1
+    # Indexes are visited in increasing order, so ties go to the lowest index
+    for idx, used in enumerate(solution):
+        if used == 0:
+            continue
+        scans, costs = index_costs.get_index_entries(idx)
+        for scan, cost in zip(scans, costs):
+            if cost < scan_costs[scan]:
+                scan_costs[scan] = cost
+                best_covered[scan] = idx
+
+    # The costs stored are strictly better than the read costs, so any best index covers its scan
+    eind_coverage = sum(1 for idx in best_covered if idx is not None and idx < num_eind)
+    pind_coverage = sum(1 for idx in best_covered if idx is not None and idx >= num_eind)
+
+    eind_iwo = sum(used * index_iwo[idx] for idx, used in enumerate(solution[:num_eind]))
+    pind_iwo = sum(used * index_iwo[idx] for idx, used in enumerate(solution) if idx >= num_eind)
+
+    return {"Scan Costs": scan_costs,
+            "Best Covered By": best_covered,
+            "Coverage": {"Total": eind_coverage + pind_coverage,
+                         "Existing": eind_coverage,
+                         "Possible": pind_coverage,
+                         "Uncovered": len(scan_costs) - eind_coverage - pind_coverage},
+            "Cost": {"Total": sum(scan_costs),
+                     "Maximum": max(scan_costs)},
+            "Indexes Used": {"Total": sum(solution),
+                             "Existing": sum(solution[:num_eind]),
+                             "Possible": sum(solution[num_eind:])},
+            "Index Write Overhead": {"Total": eind_iwo + pind_iwo,
+                                     "Existing": eind_iwo,
+                                     "Possible": pind_iwo}}
 
-    return coverage
+
+def total_coverage(rdr,
+                   solution):
+    """Return the number of scans covered by indexes in the solution."""
+    return evaluate(rdr, solution)["Coverage"]["Total"]
 
 
 def total_iwo(rdr,
               solution):
     """Return the index write overhead of the solution."""
-    return sum(used * rdr.get_index_iwo()[idx] for idx, used in enumerate(solution))
+    index_iwo = rdr.get_index_iwo()
+    return sum(used * index_iwo[idx] for idx, used in enumerate(solution))
 
 
 def eind_iwo(rdr,
              solution):
     """Return the index write overhead of the solution (existing indexes)."""
-    return sum(used * rdr.get_index_iwo()[idx]
+    index_iwo = rdr.get_index_iwo()
+    return sum(used * index_iwo[idx]
                for idx, used in enumerate(solution[:rdr.get_num_eind()]))
 
 
 def pind_iwo(rdr,
              solution):
     """Return the index write overhead of the solution (possible indexes)."""
-    return sum(used * rdr.get_index_iwo()[idx]
+    index_iwo = rdr.get_index_iwo()
+    return sum(used * index_iwo[idx]
                for idx, used in enumerate(solution) if idx >= rdr.get_num_eind())
 
 
@@ -48,15 +95,7 @@ def num_indexes_used(solution):
 def total_cost(rdr,
                solution):
     """Return the total cost of the solution."""
-    num_scans = rdr.get_num_scans()
-
-    min_costs = [None for _ in range(num_scans)]
-    for scan in range(num_scans):
-        min_costs[scan] = cost_of_scan(rdr,
-                                       solution,
-                                       scan)
-
-    return sum(min_costs[i] for i in range(num_scans))
+    return evaluate(rdr, solution)["Cost"]["Total"]
 
 
 def best_covered_by(rdr,
@@ -64,18 +103,16 @@ def best_covered_by(rdr,
                     scan):
     """Return the index that offers the best coverage for the scan."""
     read_cost = rdr.get_read_costs()[scan]
-    index_costs = rdr.get_index_costs()
+    indexes, index_costs = rdr.get_index_costs().get_scan_entries(scan)
 
     min_value = read_cost
     best_coverage = None
 
-    for idx, used in enumerate(solution):
-        if used == 0:
+    for idx, cost in zip(indexes, index_costs):
+        if solution[idx] == 0:
             continue
-        if index_costs[idx][scan] is None:
-            continue
-        if index_costs[idx][scan] < min_value:
-            min_value = index_costs[idx][scan]
+        if cost < min_value:
+            min_value = cost
             best_coverage = idx
 
     return best_coverage  # None if the scan is not covered in the solution
@@ -86,15 +123,13 @@ def cost_of_scan(rdr,
                  scan):
     """Return the cost of a given scan in the solution."""
     read_cost = rdr.get_read_costs()[scan]
-    index_costs = rdr.get_index_costs()
+    indexes, index_costs = rdr.get_index_costs().get_scan_entries(scan)
 
     min_value = read_cost
-    for idx, used in enumerate(solution):
-        if used == 0:
-            continue
-        if index_costs[idx][scan] is None:
+    for idx, cost in zip(indexes, index_costs):
+        if solution[idx] == 0:
             continue
-        min_value = min(min_value, index_costs[idx][scan])
+        min_value = min(min_value, cost)
 
     return min_value
 
@@ -102,29 +137,49 @@ def cost_of_scan(rdr,
 def maximum_cost(rdr,
                  solution):
     """Return the highest cost found among the scans."""
-    num_scans = rdr.get_num_scans()
+    return evaluate(rdr, solution)["Cost"]["Maximum"]
 
-    min_costs = [None for _ in range(num_scans)]
-    for scan in range(num_scans):
-        min_costs[scan] = cost_of_scan(rdr,
-                                       solution,
-                                       scan)
 
-    return max(min_costs)
+def compute_model_objective(rdr,
+                            goal_name,
+                            solution,
+                            evaluation=None):
+    """Compute and return the objective value of a solution, as measured in the model.
+
+    A previous evaluate() of the solution can be passed to avoid evaluating it again.
+    """
+    if goal_name == "Minimal Indexes":
+        return num_indexes_used(solution)
 
+    if evaluation is None:
+        evaluation = evaluate(rdr, solution)
 
-def compute_objective(rdr,
-                      goal_name,
-                      solution):
-    """Compute and return the objective value of a solution."""
     if goal_name == "Maximal Coverage":
-        return total_coverage(rdr, solution)
+        return evaluation["Coverage"]["Total"]
 
     if goal_name == "Minimal IWO":
-        return total_iwo(rdr, solution) / 100  # TODO: Directly get the multiplier instead
-
-    if goal_name == "Minimal Indexes":
-        return num_indexes_used(solution)
+        return evaluation["Index Write Overhead"]["Total"]
 
     if goal_name == "Minimal Cost":
-        return total_cost(rdr, solution) / 100  # TODO: Directly get the multiplier instead
+        return evaluation["Cost"]["Total"]
+
+
+def compute_objective(rdr,
+                      goal_name,
+                      solution,
+                      evaluation=None):
+    """Compute and return the objective value of a solution.
+
+    A previous evaluate() of the solution can be passed to avoid evaluating it again.
+    """
+    return to_real_objective(rdr,
+                             goal_name,
+                             compute_model_objective(rdr, goal_name, solution, evaluation))
+
+
+def to_real_objective(rdr, goal_name, value):
+    """Return an objective value (or bound) of the model in the units of the problem."""
+    if goal_name in ("Minimal IWO", "Minimal Cost"):
+        return value / rdr.get_multiplier()
+
+    return value
@@ -0,0 +1,254 @@
+"""Trade-off curves computed in one process, rather than with one run per setting.
+
+Two kinds of sweeps are available:
+- Strictness: the first goal is optimized once, then the next goals are optimized for each
+  strictness of the first goal, from the strictest to the loosest.
+- Rule: all the goals are optimized for each value of a rule ("Maximum Number of Possible
+  Indexes" or "Maximum IWO"), from the lowest to the highest.
+
+The problem is read, reduced and modeled once. Each point starts from the solution of the previous
+one, which satisfies its constraints since they only get looser from point to point. The points can
+also be divided into runs of neighbors, each solved by a process with its own model.
+"""
+
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+
+import cli
+import goal
+import modelize
+import presolve
+import reader
+import stats
+
+
+_RULES = ("Maximum Number of Possible Indexes", "Maximum IWO")
+
+
+def _optimize_goals(model, goals, time_limit, parameters, warm_start=None):
+    """Optimize goals in order on the model, each one constraining the next ones, then remove
+    these constraints from the model.
+
+    Returns:
+      A list with the results of modelize.solve_model() for each goal.
+    """
+    constraints = []
+    steps = []
+    solution = warm_start
+    for i, gl in enumerate(goals):
+        if i > 0:
+            constraints.extend(modelize.add_goal_constraint(model, goals[i - 1]))
+        results = modelize.solve_goal(model, gl, time_limit, solution, parameters[i])
+        solution = tuple(results["Indexes"])
+        gl.update_value(results["Objective Value"])
+        steps.append(results)
+
+    modelize.remove_constraints(model, constraints)
+    return steps
+
+
+def _get_goals(settings):
+    """Return the goals of the settings."""
+    return [goal.Goal(gl["Name"], gl.get("Strictness", 1)) for gl in settings["Goals"]]
+
+
+def _summarize(steps):
+    """Return the solution and the least conclusive status of the goals of a point."""
+    statuses = {results["Status"] for results in steps}
+    status = next(status for status in ("Unknown", "Feasible", "Optimal") if status in statuses)
+    return {"Indexes": steps[-1]["Indexes"], "Status": status}
+
+
+def _solve_strictness_points(model, settings, first_value, strictnesses, time_limit, parameters,
+                             warm_start):
+    """Optimize the goals after the first one for each strictness of the first goal, whose optimal
+    value is already known."""
+    name = settings["Goals"][0]["Name"]
+
+    points = []
+    solution = warm_start
+    for strictness in strictnesses:
+        first = goal.Goal(name, strictness)
+        first.update_value(first_value)
+        constraints = modelize.add_goal_constraint(model, first)
+
+        steps = _optimize_goals(model, _get_goals(settings)[1:], time_limit, parameters[1:], solution)
+        points.append(_summarize(steps))
+        solution = points[-1]["Indexes"]
+
+        modelize.remove_constraints(model, constraints)
+
+    return points
+
+
+def _solve_rule_points(model, settings, rule, values, time_limit, parameters, warm_start):
+    """Optimize all the goals for each value of a rule (in the units of the model)."""
+    points = []
+    solution = warm_start
+    for value in values:
+        rules = {"Maximum Number of Possible Indexes": settings["Maximum Number of Possible Indexes"],
+                 "Maximum IWO": settings["Maximum IWO"]}
+        rules[rule] = value
+        modelize.set_rules(model,
+                           rules["Maximum Number of Possible Indexes"],
+                           rules["Maximum IWO"],
+                           model.index_iwo)
+
+        steps = _optimize_goals(model, _get_goals(settings), time_limit, parameters, solution)
+        points.append(_summarize(steps))
+        solution = points[-1]["Indexes"]
+
+    return points
+
+
+def _solve_run(arguments):
+    """Build a model, then solve a run of neighbor points on it (for process pools)."""
+    function, problem, settings, *function_arguments = arguments
+    model = modelize.build_basic_model(problem, settings)
+    return function(model, settings, *function_arguments)
+
+
+def sweep(rdr, kind, values, jobs=1, use_presolve=True):
+    """Compute the trade-off curve of a sweep.
+
+    Args:
+      rdr: Previously-initialized Reader object.
+      kind: "Strictness" (of the first goal) or the name of a rule.
+      values: The values taken by the strictness or the rule (in the units of the settings), one
+        per point.
+      jobs: Number of processes solving the points, each one solving a run of neighbor points.
+      use_presolve: If the problem should be reduced before being modeled.
+
+    Returns:
+      A list with, for each point (from the strictest to the loosest), a dictionary in the form:
+      - Strictness (or the name of the rule): The value of the point.
+      - Goals: The value of each goal for the indexes selected, in the form [{goal: value}, ...].
+      - Status: The least conclusive solver status of the goals.
+      - Pareto: A boolean indicating if no other point is at least as good for every goal (and
+        better for one).
+      - Selected Indexes: The OIDs of the possible indexes selected.
+    """
+    assert kind == "Strictness" or kind in _RULES, f"Unknown sweep: {kind}"
+
+    problem = rdr.get_problem()
+    settings = rdr.get_settings()
+    time_limit = rdr.get_time_limit()
+    parameters = [rdr.get_solver_parameters(i) for i in range(len(settings["Goals"]))]
+    if use_presolve:
+        problem, _ = presolve.reduce_problem(problem)
+
+    # The looser the constraints, the later the point
+    if kind == "Strictness":
+        assert len(settings["Goals"]) >= 2, "A strictness sweep needs at least two goals"
+        assert all(0 <= value <= 1 for value in values)
+        values = sorted(values, reverse=True)
+        model_values = values
+    elif kind == "Maximum Number of Possible Indexes":
+        assert all(value >= 1 for value in values)
+        values = sorted(values)
+        model_values = values
+    else:
+        values = sorted(values)
+        model_values = [round(value * rdr.get_multiplier()) for value in values]
+        assert all(value > sum(rdr.get_index_iwo()[:rdr.get_num_eind()]) for value in model_values)
+
+    jobs = max(1, min(jobs, len(values)))
+    if jobs > 1:
+        # The solver workers are divided between the processes
+        parameters = [dict(goal_parameters, Workers=max(1, goal_parameters["Workers"] // jobs))
+                      for goal_parameters in parameters]
+
+    model = modelize.build_basic_model(problem, settings)
+    if kind == "Strictness":
+        # The first goal is optimized once for all the points
+        first = _optimize_goals(model, _get_goals(settings)[:1], time_limit, parameters)[0]
+        function = _solve_strictness_points
+        function_arguments = (first["Objective Value"],)
+        warm_start = tuple(first["Indexes"])
+    else:
+        function = _solve_rule_points
+        function_arguments = (kind,)
+        warm_start = None
+
+    if jobs == 1:
+        points = function(model, settings, *function_arguments, model_values, time_limit,
+                          parameters, warm_start)
+    else:
+        # Runs of neighbor points, so that most points still start from their neighbor
+        size = -(-len(values) // jobs)
+        runs = [(function, problem, settings, *function_arguments, model_values[start:start + size],
+                 time_limit, parameters, warm_start)
+                for start in range(0, len(values), size)]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            points = [point for run in executor.map(_solve_run, runs) for point in run]
+
+    frontier = []
+    for value, point in zip(values, points):
+        solution = point["Indexes"]
+        if use_presolve:
+            solution = presolve.restore_solution(problem, solution)
+        evaluation = stats.evaluate(rdr, solution)
+        frontier.append({kind: value,
+                         "Goals": [{gl["Name"]: stats.compute_objective(rdr, gl["Name"], solution,
+                                                                        evaluation)}
+                                   for gl in settings["Goals"]],
+                         "Status": point["Status"],
+                         "Selected Indexes": [rdr.get_index_oid(index)
+                                              for index in range(rdr.get_num_eind(), len(solution))
+                                              if solution[index]]})
+
+    _mark_pareto(frontier, [goal.Goal(gl["Name"]).is_maximized() for gl in settings["Goals"]])
+    return frontier
+
+
+def _mark_pareto(frontier, maximized):
+    """Set the Pareto flag of each point of a frontier."""
+    def _key(point):
+        # The lower, the better
+        return [-value if is_maximized else value
+                for value, is_maximized in zip((list(gl.values())[0] for gl in point["Goals"]),
+                                               maximized)]
+
+    keys = [_key(point) for point in frontier]
+    for point, key in zip(frontier, keys):
+        point["Pareto"] = not any(other != key and all(o <= k for o, k in zip(other, key))
+                                  for other in keys)
+
+
+def format_frontier(frontier):
+    """Return a frontier as a text table, one point per line."""
+    kind = next(iter(frontier[0]))
+    header = [kind] + [list(gl)[0] for gl in frontier[0]["Goals"]] + ["Indexes", "Status"]
+    rows = [[f"{point[kind]:g}"]
+            + [f"{list(gl.values())[0]:g}" for gl in point["Goals"]]
+            + [str(len(point["Selected Indexes"])),
+               point["Status"] + ("" if point["Pareto"] else " (dominated)")]
+            for point in frontier]
+
+    widths = [max(len(row[column]) for row in [header] + rows) for column in range(len(header))]
+    return "\n".join("  ".join(cell.rjust(width) if column < len(header) - 1 else cell
+                               for column, (cell, width) in enumerate(zip(row, widths)))
+                     for row in [header] + rows)
+
+
+if __name__ == "__main__":
+    cli_args = cli.get_sweep_args()
+
+    with open(cli_args["Data JSON"], "r", encoding="utf-8") as data_json:
+        settings_json = None
+        if cli_args["Settings JSON"] is not None:
+            with open(cli_args["Settings JSON"], "r", encoding="utf-8") as f:
+                settings_json = f.read()
+        rdr = reader.Reader(data_json, cli_args["Time Limit"], settings_json)
+
+    frontier = sweep(rdr,
+                     cli_args["Sweep"],
+                     cli_args["Values"],
+                     cli_args["Jobs"],
+                     cli_args["Presolve"])
+
+    if cli_args["JSON"]:
+        print(json.dumps(frontier, indent=2))
+    else:
+        print(format_frontier(frontier))
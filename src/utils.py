@@ -2,6 +2,8 @@
 
 
 import json
+import threading
+import time
 
 import optimizer
 import reader
@@ -11,30 +13,114 @@ def run(data_json,
         time_limit,
         settings_json=None,
         print_input_data=False,
-        log_level=0):
+        log_level=0,
+        incremental=True,
+        use_presolve=True,
+        jobs=None,
+        cache=None,
+        solver_parameters=None,
+        timings=None,
+        on_event=None,
+        time_budget=None,
+        engine="exact",
+        warm_start_json=None,
+        diagnostics=None,
+        formulation=None,
+        polish=False,
+        memo=None):
     """Run the model and return the results of the solving process.
 
     Args:
-      data_json: The serialized "Explain" JSON object (string).
+      data_json: The serialized "Explain" JSON object (string), or a text file object to stream it
+        from.
       time_limit: The time limit in seconds.
       settings_json: The serialized optimizer settings JSON object (string).
       print_input_data: If we should print the data.
       log_level: Integer indicating printing level (0 = silent, 1 = normal, 2 = verbose).
+      incremental: If the model should be built once and reused by all the goals.
+      use_presolve: If the problem should be reduced before being modeled.
+      jobs: Number of processes solving independent sub-problems (the number of CPUs if None).
+      cache: ProblemCache used to avoid reading the same data again (no caching if None).
+      solver_parameters: Solver parameters taking precedence over those of the settings (see
+        modelize.solve_model()).
+      timings: If a dictionary is provided, the time in seconds spent in each phase ("Read",
+        "Solve", "Output") is stored in it.
+      on_event: Function called with a dictionary for each event of the solving process (e.g.,
+        each improving solution, see Optimizer._emit()).
+      time_budget: Wall time in seconds for the whole run, divided between the goals (None if only
+        the time limit of each goal applies).
+      engine: How the goals are optimized ("exact", "heuristic" or "hybrid", see
+        Optimizer.__init__()).
+      warm_start_json: The serialized results JSON object of a previous run, whose selection the
+        first goal starts from (see Reader.read_warm_start()).
+      diagnostics: Diagnostics object recording the phases of the run (Read, then those of the
+        solving process, then Results), whose report is added to the results as "Diagnostics"
+        (no diagnostics if None).
+      formulation: The formulation of the model, taking precedence over that of the settings (see
+        modelize.FORMULATIONS).
+      polish: If the solutions of the solver that are not proven optimal should be improved by a
+        local search (see Optimizer.__init__()).
+      memo: GoalMemo used to start after the first goals already optimized on the problem by a
+        previous run (see Optimizer.__init__()), which needs the key of the problem in the cache (no
+        memo if None).
 
     Returns:
       A serialized JSON object of the results (string).
     """
+    start = time.perf_counter()
     rdr = reader.Reader(data_json,
                         time_limit,
-                        settings_json)
+                        settings_json,
+                        cache,
+                        solver_parameters,
+                        formulation)
+    warm_start = None
+    if warm_start_json is not None:
+        warm_start = rdr.read_warm_start(warm_start_json)
+    read_end = time.perf_counter()
+    if diagnostics is not None:
+        diagnostics.add_phase("Read", read_end - start)
 
     if print_input_data:
         print("Problem data:")
         print(rdr)
 
     opt = optimizer.Optimizer(rdr,
-                              log_level)
+                              log_level,
+                              incremental,
+                              use_presolve,
+                              jobs,
+                              on_event,
+                              None if time_budget is None else time_budget - (read_end - start),
+                              engine,
+                              warm_start,
+                              diagnostics,
+                              polish,
+                              memo)
+    solve_end = time.perf_counter()
 
     results = opt.get_results()
+    if diagnostics is not None:
+        diagnostics.add_phase("Results", time.perf_counter() - solve_end)
+        results["Diagnostics"] = diagnostics.get_report()
+    results = json.dumps(results, indent=2)
 
-    return json.dumps(results, indent=2)
+    if timings is not None:
+        timings["Read"] = read_end - start
+        timings["Solve"] = solve_end - read_end
+        timings["Output"] = time.perf_counter() - solve_end
+
+    return results
+
+
+def write_events(file):
+    """Return a function writing the events of the solving process to a file, as JSON lines."""
+    lock = threading.Lock()
+
+    def _write_event(event):
+        line = json.dumps(event)
+        with lock:
+            file.write(line + "\n")
+            file.flush()
+
+    return _write_event
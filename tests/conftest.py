@@ -0,0 +1,8 @@
+"""Make the modules of src/ importable by the tests, as they are by the scripts run from it."""
+
+
+import os
+import sys
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
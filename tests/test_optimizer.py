@@ -0,0 +1,36 @@
+"""Tests of the Optimizer."""
+
+
+import json
+
+import pytest
+
+import datagen
+import optimizer
+import reader
+
+
+# Goals relaxed by their strictness, so that the later goals depend on the relaxation
+SETTINGS = json.dumps({"Goals": [{"Name": "Minimal Cost", "Strictness": 0},
+                                 {"Name": "Maximal Coverage", "Strictness": 0.3},
+                                 {"Name": "Minimal IWO"}]})
+
+
+def _optimize(data_json, incremental):
+    """Return the values of the goals on a problem."""
+    rdr = reader.Reader(data_json, 10.0, SETTINGS)
+    opt = optimizer.Optimizer(rdr, 0, incremental=incremental)
+    results = opt.get_results()
+    return [value for gl in results["Goals"] for value in gl.values()]
+
+
+@pytest.mark.parametrize("seed", range(12))
+def test_incremental_model_matches_rebuilt_models(tmp_path, seed):
+    """Reusing the model for all the goals reaches the same optimal values as building a new model
+    for each goal."""
+    path = tmp_path / "data.json"
+    datagen.generate_instance(str(path), seed, 8, 12, 0.1, 50.0, 50.0, 100.0, 8, 12, 1, 3, 0.1, 1.0,
+                              0.2, 0.6)
+    data_json = path.read_text(encoding="utf-8")
+
+    assert _optimize(data_json, incremental=True) == _optimize(data_json, incremental=False)
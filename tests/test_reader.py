@@ -0,0 +1,53 @@
+"""Tests of the Reader."""
+
+
+import datagen
+import reader
+
+
+def _read_generated(path, num_scans, num_possible_indexes, coverage, seed=0):
+    """Generate an instance of a given size in a file, and read it."""
+    datagen.generate_instance(str(path),
+                              seed,
+                              num_scans,
+                              num_scans,
+                              0.1,
+                              50.0,
+                              50.0,
+                              100.0,
+                              num_possible_indexes,
+                              num_possible_indexes,
+                              5,
+                              5,
+                              0.1,
+                              1.0,
+                              coverage,
+                              coverage)
+
+    with open(path, "r", encoding="utf-8") as f:
+        return reader.Reader(f.read(), 1.0)
+
+
+def test_position_lookups_are_hashed(tmp_path):
+    """The positions of the scans and indexes are looked up in dicts, so that reading the problem
+    is linear in the number of cost entries rather than in entries times IDs."""
+    rdr = _read_generated(tmp_path / "data.json", 200, 40, 0.1)
+
+    assert isinstance(rdr._translation["Scan Positions"], dict)
+    assert isinstance(rdr._translation["Index Positions"], dict)
+
+
+def test_positions_match_the_ids(tmp_path):
+    """The position of each scan ID and index OID is the one they are translated from, and unknown
+    IDs have no position."""
+    rdr = _read_generated(tmp_path / "data.json", 200, 40, 0.1)
+
+    assert rdr.get_num_scans() > 0
+    assert rdr.get_num_indexes() > 0
+    for scan in range(rdr.get_num_scans()):
+        assert rdr.get_scan_position(rdr.get_scan_id(scan)) == scan
+    for index in range(rdr.get_num_indexes()):
+        assert rdr.get_index_position(rdr.get_index_oid(index)) == index
+
+    assert rdr.get_scan_position("unknown") is None
+    assert rdr.get_index_position(-1) is None